@@ -0,0 +1,105 @@
+import hashlib
+import io
+import os
+from PIL import Image, ImageOps
+import config
+from portrait_cache import variant_name, encode_image, image_extension_for, convert_for_display
+from safe_writer import atomic_write
+
+def content_key(data):
+    """
+    Mã băm BLAKE2b của nội dung ảnh, dùng làm tên file (ảnh giống nhau dùng chung file)
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def avatar_path(user, size=None):
+    """
+    Đường dẫn ảnh đại diện của người dùng: bản thu nhỏ theo kích thước nếu có,
+    ngược lại là ảnh gốc (người dùng tải ảnh trước khi có kho ảnh chỉ có ảnh gốc)
+    """
+    if size is not None:
+        path = user.get("picture_thumbnails", {}).get(variant_name(size))
+        if path:
+            return path
+    return user.get("picture", "")
+
+def avatar_files(user):
+    """
+    Tập đường dẫn các file ảnh đại diện mà người dùng đang tham chiếu (ảnh gốc và bản thu nhỏ)
+    """
+    paths = set(user.get("picture_thumbnails", {}).values())
+    if user.get("picture"):
+        paths.add(user["picture"])
+    return paths
+
+def remove_unused_avatars(paths, users, directory=None):
+    """
+    Xóa các file ảnh trong kho (thư mục directory) không còn người dùng nào tham chiếu
+    (nhiều người dùng có thể dùng chung file khi tải lên cùng một ảnh)
+    File nằm ngoài kho ảnh không bị xóa; trả về danh sách file đã xóa
+    """
+    directory = os.path.abspath(directory or config.USER_IMAGES_DIR)
+    referenced = set()
+    for user in users:
+        referenced |= avatar_files(user)
+    removed = []
+    for path in paths:
+        if path in referenced or os.path.dirname(os.path.abspath(path)) != directory:
+            continue
+        try:
+            os.remove(path)
+            removed.append(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Lỗi khi xóa ảnh đại diện {path}: {e}")
+    return removed
+
+class AvatarStore:
+    def __init__(self, directory=None, max_size=None, thumbnail_sizes=None):
+        """
+        Kho ảnh đại diện của người dùng, lưu theo mã băm nội dung
+        Khi tải ảnh lên, ảnh chỉ được giải mã một lần (JPEG dùng draft để giải mã ngay
+        ở độ phân giải nhỏ), thu nhỏ về tối đa max_size, nén lại và tạo sẵn các bản thu nhỏ
+        kích thước cố định, nên khi hiển thị chỉ cần mở một file nhỏ đúng kích thước
+        """
+        self.directory = directory or config.USER_IMAGES_DIR
+        self.max_size = tuple(max_size or config.AVATAR_MAX_SIZE)
+        self.thumbnail_sizes = [tuple(size) for size in (thumbnail_sizes or config.AVATAR_THUMBNAIL_SIZES)]
+
+    def save(self, source_path):
+        """
+        Lưu ảnh đại diện từ file nguồn, trả về các trường cần ghi vào thông tin người dùng:
+        {"picture": đường dẫn ảnh gốc đã thu nhỏ, "picture_thumbnails": {biến thể: đường dẫn}}
+        """
+        with open(source_path, 'rb') as file:
+            data = file.read()
+        key = content_key(data)
+
+        image = Image.open(io.BytesIO(data))
+        if image.format == "JPEG":
+            # Giải mã JPEG ở tỉ lệ 1/2, 1/4 hoặc 1/8 nhưng vẫn không nhỏ hơn max_size
+            image.draft("RGB", self.max_size)
+        image = convert_for_display(image)
+        # thumbnail dùng reduce (gộp điểm ảnh) trước khi lọc LANCZOS nên nhanh với ảnh lớn
+        image.thumbnail(self.max_size, Image.LANCZOS, reducing_gap=2.0)
+
+        record = {"picture": self.write(key, None, image), "picture_thumbnails": {}}
+        for size in self.thumbnail_sizes:
+            # Cắt phần giữa theo tỉ lệ của bản thu nhỏ để ảnh không bị kéo méo
+            thumbnail = ImageOps.fit(image, size, Image.LANCZOS)
+            record["picture_thumbnails"][variant_name(size)] = self.write(key, size, thumbnail)
+        return record
+
+    def write(self, key, size, image):
+        """
+        Ghi một biến thể ảnh (ghi file an toàn), bỏ qua nếu đã có file cùng nội dung
+        Trả về đường dẫn file
+        """
+        extension = image_extension_for(image)
+        filename = f"{key}.{extension}" if size is None else f"{key}_{variant_name(size)}.{extension}"
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            data = encode_image(image)
+            atomic_write(path, lambda file: file.write(data), binary=True)
+        return path
@@ -0,0 +1,167 @@
+import random
+import sys
+import tempfile
+import os
+import time
+import tracemalloc
+import config
+from customer_record import CustomerRecord
+from customer_manager import CustomerManager
+from safe_writer import atomic_write_json
+
+FIRST_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Clarence", "Pamela", "Soham", "Cherly", "Đặng"]
+LAST_NAMES = ["Văn An", "Thị Bình", "Đức Cường", "Payne", "Peters", "Torres", "Washington", "Quốc Huy"]
+STATES = ["Colorado", "Alabama", "Missouri", "South Dakota", "Hà Nội", "Đà Nẵng", "Hồ Chí Minh"]
+
+def make_customers(count, seed=42):
+    """
+    Tạo danh sách khách hàng giả lập để đo hiệu năng
+    """
+    rng = random.Random(seed)
+    customers = []
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        customers.append({
+            "id": f"KH{i + 1:04d}",
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{i}@gmail.com",
+            "phone": f"09{rng.randint(0, 99999999):08d}",
+            "address": f"{rng.randint(1, 9999)} Main St, {rng.choice(STATES)}, United States",
+            "gender": rng.choice(["Nam", "Nữ"]),
+            "age": rng.randint(18, 90),
+            "picture": f"https://randomuser.me/api/portraits/men/{i % 100}.jpg",
+            "created_at": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 11:24:40",
+        })
+    return customers
+
+def make_manager(customers):
+    """
+    Tạo CustomerManager trong thư mục tạm và nạp sẵn danh sách khách hàng
+    """
+    data_file = os.path.join(tempfile.mkdtemp(), "customers.json")
+    manager = CustomerManager(data_file)
+    manager.customers = customers
+    manager.rebuild_index()
+    return manager
+
+def legacy_search(customers, keyword):
+    """
+    Cách tìm kiếm cũ: chuẩn hóa lại mọi trường của mọi khách hàng ở mỗi lần tìm
+    """
+    results = []
+    keyword = keyword.lower().strip()
+
+    def normalize_text(text):
+        if not text:
+            return ""
+        text = text.lower()
+        text = text.replace('à', 'a').replace('á', 'a').replace('ả', 'a').replace('ã', 'a').replace('ạ', 'a')
+        text = text.replace('ă', 'a').replace('ằ', 'a').replace('ắ', 'a').replace('ẳ', 'a').replace('ẵ', 'a').replace('ặ', 'a')
+        text = text.replace('â', 'a').replace('ầ', 'a').replace('ấ', 'a').replace('ẩ', 'a').replace('ẫ', 'a').replace('ậ', 'a')
+        text = text.replace('đ', 'd')
+        text = text.replace('è', 'e').replace('é', 'e').replace('ẻ', 'e').replace('ẽ', 'e').replace('ẹ', 'e')
+        text = text.replace('ê', 'e').replace('ề', 'e').replace('ế', 'e').replace('ể', 'e').replace('ễ', 'e').replace('ệ', 'e')
+        text = text.replace('ì', 'i').replace('í', 'i').replace('ỉ', 'i').replace('ĩ', 'i').replace('ị', 'i')
+        text = text.replace('ò', 'o').replace('ó', 'o').replace('ỏ', 'o').replace('õ', 'o').replace('ọ', 'o')
+        text = text.replace('ô', 'o').replace('ồ', 'o').replace('ố', 'o').replace('ổ', 'o').replace('ỗ', 'o').replace('ộ', 'o')
+        text = text.replace('ơ', 'o').replace('ờ', 'o').replace('ớ', 'o').replace('ở', 'o').replace('ỡ', 'o').replace('ợ', 'o')
+        text = text.replace('ù', 'u').replace('ú', 'u').replace('ủ', 'u').replace('ũ', 'u').replace('ụ', 'u')
+        text = text.replace('ư', 'u').replace('ừ', 'u').replace('ứ', 'u').replace('ử', 'u').replace('ữ', 'u').replace('ự', 'u')
+        text = text.replace('ỳ', 'y').replace('ý', 'y').replace('ỷ', 'y').replace('ỹ', 'y').replace('ỵ', 'y')
+        return text
+
+    normalized_keyword = normalize_text(keyword)
+    for customer in customers:
+        customer_id = str(customer.get("id", "")).lower()
+        if keyword == customer_id:
+            return [customer]
+        if (normalized_keyword in normalize_text(customer.get("name", "")) or
+            normalized_keyword in normalize_text(customer.get("email", "")) or
+            normalized_keyword in normalize_text(customer.get("phone", "")) or
+            normalized_keyword in normalize_text(customer.get("address", "")) or
+            normalized_keyword in customer_id):
+            results.append(customer)
+    return results
+
+def time_call(function, *args, repeat=3):
+    """
+    Đo thời gian chạy nhanh nhất (ms) của một hàm
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_search(sizes=(10_000, 100_000, 1_000_000), keywords=("nguyen", "colorado", "xyz not found")):
+    """
+    So sánh thời gian mỗi lần tìm kiếm giữa cách cũ và chỉ mục tìm kiếm
+    """
+    print(f"{'Số KH':>10} {'Từ khóa':>15} {'Cũ (ms)':>12} {'Mới (ms)':>12}")
+    for size in sizes:
+        customers = make_customers(size)
+        manager = make_manager(customers)
+        build_time = time_call(manager.search_index.build_postings, repeat=1)
+        print(f"{size:>10} {'(dựng trigram)':>15} {'':>12} {build_time:>12.1f}")
+        for keyword in keywords:
+            before = time_call(legacy_search, customers, keyword, repeat=1)
+            after = time_call(manager.search_customers, keyword)
+            print(f"{size:>10} {keyword:>15} {before:>12.1f} {after:>12.1f}")
+
+def bench_cold_start(size=500_000):
+    """
+    So sánh thời gian khởi tạo CustomerManager (đọc file + dựng chỉ mục) khi đọc JSON và khi dùng cache nhị phân
+    """
+    data_file = os.path.join(tempfile.mkdtemp(), "customers.json")
+    atomic_write_json(data_file, make_customers(size))
+    print(f"Kích thước file: {os.path.getsize(data_file) / 1024 / 1024:.1f} MB")
+
+    config.SNAPSHOT_CACHE = False
+    before = time_call(CustomerManager, data_file, repeat=1)
+    config.SNAPSHOT_CACHE = True
+    first = time_call(CustomerManager, data_file, repeat=1)
+    after = time_call(CustomerManager, data_file, repeat=1)
+
+    print(f"{'Số KH':>10} {'JSON (ms)':>12} {'Lần đầu + ghi cache (ms)':>26} {'Cache (ms)':>12}")
+    print(f"{size:>10} {before:>12.1f} {first:>26.1f} {after:>12.1f}")
+
+def traced_bytes(build):
+    """
+    Đo số byte bộ nhớ còn giữ lại sau khi gọi build() (dùng tracemalloc)
+    """
+    tracemalloc.start()
+    try:
+        result = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current, result
+
+def bench_memory(sizes=(100_000, 1_000_000)):
+    """
+    So sánh bộ nhớ mỗi khách hàng giữa dict và CustomerRecord (kể cả các chuỗi giá trị)
+    """
+    print(f"{'Số KH':>10} {'dict (B/KH)':>14} {'CustomerRecord (B/KH)':>24}")
+    for size in sizes:
+        dict_bytes, customers = traced_bytes(lambda: make_customers(size))
+        del customers
+        record_bytes, records = traced_bytes(
+            lambda: [CustomerRecord.from_mapping(customer) for customer in make_customers(size)])
+        del records
+        print(f"{size:>10} {dict_bytes / size:>14.1f} {record_bytes / size:>24.1f}")
+
+BENCHMARKS = {
+    "search": bench_search,
+    "cold_start": bench_cold_start,
+    "memory": bench_memory,
+}
+
+if __name__ == "__main__":
+    # Cách dùng: python benchmark.py [tên_benchmark ...]
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
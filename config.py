@@ -0,0 +1,79 @@
+import os
+
+# Kiểu lưu trữ dữ liệu khách hàng: "json" (mặc định), "jsonl" (JSON Lines) hoặc "sqlite"
+# Có thể đổi qua biến môi trường QLKH_CUSTOMER_STORAGE
+CUSTOMER_STORAGE = os.environ.get("QLKH_CUSTOMER_STORAGE", "json").lower()
+
+# File dữ liệu khách hàng cho từng kiểu lưu trữ
+CUSTOMER_DATA_FILE = "customers.json"
+CUSTOMER_JSONL_FILE = "customers.jsonl"
+CUSTOMER_DB_FILE = "customers.db"
+
+# Lưu khách hàng trong bộ nhớ bằng CustomerRecord (__slots__) thay cho dict để tiết kiệm bộ nhớ
+CUSTOMER_COMPACT_RECORDS = True
+
+# Lưu cache nhị phân (file .cache cạnh file dữ liệu) để khởi động không phải đọc lại JSON
+SNAPSHOT_CACHE = True
+
+# Thời gian chờ (ms) sau lần gõ phím cuối cùng trước khi tìm kiếm
+SEARCH_DEBOUNCE_MS = 250
+
+# Danh sách khách hàng dạng ảo: chỉ tạo item cho các dòng đang nhìn thấy
+CUSTOMER_VIRTUAL_LIST = True
+
+# Số khách hàng xử lý mỗi bước khi xóa/sửa hàng loạt, lựa chọn lớn hơn sẽ hiện thanh tiến trình
+BULK_CHUNK_SIZE = 500
+
+# Ghi dữ liệu trên luồng nền: thao tác trên giao diện cập nhật bộ nhớ ngay,
+# việc ghi file do luồng ghi riêng đảm nhận. Đặt False để ghi đồng bộ
+SAVE_ASYNC = True
+
+# Thời gian (ms) gộp các lần ghi liên tiếp thành một lần ghi file (group commit)
+# Đặt 0 để ghi đồng bộ ngay sau mỗi thay đổi
+SAVE_GROUP_COMMIT_MS = 50
+
+# Số khách hàng lấy mỗi trang khi tìm bằng truy vấn có cấu trúc (nút "Xem thêm" lấy trang tiếp theo)
+QUERY_PAGE_SIZE = 1000
+
+# Số luồng tải hình ảnh khách hàng chạy cùng lúc
+IMAGE_LOADER_WORKERS = 4
+
+# Thời gian tối đa (giây) chờ tải một hình ảnh
+IMAGE_LOAD_TIMEOUT = 10
+
+# Chu kỳ (ms) luồng giao diện kiểm tra kết quả tải hình ảnh (chỉ khi đang có yêu cầu)
+IMAGE_POLL_MS = 50
+
+# Thư mục cache ảnh chân dung khách hàng trên đĩa (ảnh gốc và bản thu nhỏ)
+PORTRAIT_CACHE_DIR = "image_cache"
+
+# Dung lượng tối đa (byte) của cache ảnh, vượt quá thì xóa các ảnh lâu không dùng nhất
+PORTRAIT_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+# Số ảnh đã giải mã (PhotoImage) tối đa giữ trong bộ nhớ
+PHOTO_CACHE_MAX_ENTRIES = 200
+
+# Dung lượng bộ nhớ tối đa (byte, ước tính 4 byte mỗi điểm ảnh) của các ảnh đã giải mã
+PHOTO_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Tải trước ảnh chân dung của khách hàng mẫu vào cache đĩa ngay khi nhập dữ liệu,
+# để xem chi tiết khách hàng mới nhập không phải chờ tải ảnh (và xem được khi không có mạng)
+PREFETCH_PORTRAITS = True
+
+# Số luồng tải trước ảnh chạy cùng lúc
+PREFETCH_WORKERS = 8
+
+# Số lần thử lại khi tải trước một ảnh bị lỗi
+PREFETCH_RETRIES = 2
+
+# Thời gian chờ (giây) trước lần thử lại đầu tiên, nhân đôi sau mỗi lần
+PREFETCH_RETRY_BACKOFF = 0.5
+
+# Thư mục lưu ảnh đại diện của người dùng (đặt tên theo mã băm nội dung ảnh)
+USER_IMAGES_DIR = "user_images"
+
+# Kích thước tối đa (rộng, cao) của ảnh đại diện gốc được lưu, ảnh lớn hơn được thu nhỏ khi tải lên
+AVATAR_MAX_SIZE = (512, 512)
+
+# Các kích thước bản thu nhỏ của ảnh đại diện được tạo sẵn khi tải lên
+AVATAR_THUMBNAIL_SIZES = [(150, 150)]
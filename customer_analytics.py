@@ -0,0 +1,216 @@
+import numpy as np
+
+# Mã giới tính trong cột gender
+GENDER_LABELS = ("Nam", "Nữ", "Khác")
+GENDER_CODES = {"Nam": 0, "Nữ": 1}
+OTHER_GENDER = 2
+
+# Giá trị tuổi không hợp lệ
+NO_AGE = -1
+
+def gender_code(gender):
+    """
+    Chuyển giới tính sang mã số (0: Nam, 1: Nữ, 2: Khác)
+    """
+    return GENDER_CODES.get(gender, OTHER_GENDER)
+
+def age_value(age):
+    """
+    Chuyển tuổi sang số nguyên, trả về NO_AGE nếu không hợp lệ
+    """
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return NO_AGE
+    return age if 0 <= age <= 150 else NO_AGE
+
+def parse_datetime(text):
+    """
+    Chuyển chuỗi created_at ("YYYY-MM-DD HH:MM:SS") sang datetime64, NaT nếu không hợp lệ
+    """
+    try:
+        return np.datetime64(str(text).replace(" ", "T"), "s")
+    except ValueError:
+        return np.datetime64("NaT", "s")
+
+def parse_datetimes(texts):
+    """
+    Chuyển cả danh sách chuỗi thời gian sang mảng datetime64 (vector hóa, chỉ xử lý từng phần tử khi có chuỗi lỗi)
+    """
+    try:
+        return np.array(texts, dtype="datetime64[s]")
+    except ValueError:
+        return np.array([parse_datetime(text) for text in texts], dtype="datetime64[s]")
+
+class CustomerAnalytics:
+    def __init__(self, customer_manager):
+        """
+        Lớp thống kê khách hàng dạng cột trên NumPy
+        Mỗi khách hàng là một dòng trong các mảng age (int16), gender (mã int8), created_at (datetime64)
+        Các mảng được cập nhật theo từng thay đổi của CustomerManager (cùng cách xóa đổi chỗ
+        với phần tử cuối), nếu không theo kịp (ví dụ SQLite, hoàn tác) thì dựng lại toàn bộ
+        """
+        self.customer_manager = customer_manager
+        self.ids = []
+        self.positions = {}
+        self.size = 0
+        self.age = np.empty(0, dtype=np.int16)
+        self.gender = np.empty(0, dtype=np.int8)
+        self.created_at = np.empty(0, dtype="datetime64[s]")
+        self.synced_generation = None
+        customer_manager.add_change_listener(self.on_changes)
+
+    def rebuild(self):
+        """
+        Dựng lại toàn bộ các cột từ danh sách khách hàng
+        """
+        customers = self.customer_manager.get_all_customers()
+        self.ids = [str(customer.get("id", "")) for customer in customers]
+        self.positions = {customer_id: position for position, customer_id in enumerate(self.ids)}
+        self.size = len(customers)
+        self.age = np.array([age_value(customer.get("age")) for customer in customers], dtype=np.int16)
+        self.gender = np.array([gender_code(customer.get("gender")) for customer in customers], dtype=np.int8)
+        self.created_at = parse_datetimes([customer.get("created_at") or "NaT" for customer in customers])
+        self.synced_generation = self.customer_manager.generation
+
+    def refresh(self):
+        """
+        Đảm bảo các cột khớp với dữ liệu hiện tại trước khi thống kê
+        """
+        if self.synced_generation != self.customer_manager.generation:
+            self.rebuild()
+
+    def on_changes(self, entries):
+        """
+        Nhận thay đổi từ CustomerManager; entries là None khi dữ liệu được tải lại toàn bộ
+        Chỉ cập nhật từng dòng khi các cột đang khớp với thế hệ dữ liệu ngay trước đó
+        """
+        if entries is None or self.synced_generation != self.customer_manager.generation - 1:
+            # Chưa từng dựng hoặc đã lệch: để lần thống kê sau dựng lại
+            self.synced_generation = None
+            return
+        for entry in entries:
+            op = entry.get("op")
+            if op == "add" or op == "update":
+                self.set_row(entry["record"])
+            elif op == "delete":
+                self.remove_row(str(entry["id"]))
+        self.synced_generation = self.customer_manager.generation
+
+    def ensure_capacity(self, size):
+        """
+        Mở rộng các mảng (gấp đôi) khi không đủ chỗ
+        """
+        capacity = len(self.age)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        for name in ("age", "gender", "created_at"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def set_row(self, customer):
+        """
+        Thêm mới hoặc cập nhật dòng của một khách hàng
+        """
+        customer_id = str(customer.get("id", ""))
+        position = self.positions.get(customer_id)
+        if position is None:
+            position = self.size
+            self.ensure_capacity(position + 1)
+            self.ids.append(customer_id)
+            self.positions[customer_id] = position
+            self.size += 1
+        self.age[position] = age_value(customer.get("age"))
+        self.gender[position] = gender_code(customer.get("gender"))
+        self.created_at[position] = parse_datetime(customer.get("created_at") or "NaT")
+
+    def remove_row(self, customer_id):
+        """
+        Xóa dòng bằng cách chuyển dòng cuối vào chỗ trống
+        """
+        position = self.positions.pop(customer_id, None)
+        if position is None:
+            return
+        last = self.size - 1
+        last_id = self.ids.pop()
+        if position != last:
+            self.ids[position] = last_id
+            self.positions[last_id] = position
+            self.age[position] = self.age[last]
+            self.gender[position] = self.gender[last]
+            self.created_at[position] = self.created_at[last]
+        self.size = last
+
+    def gender_counts(self):
+        """
+        Số khách hàng theo giới tính
+        """
+        self.refresh()
+        counts = np.bincount(self.gender[:self.size], minlength=len(GENDER_LABELS))
+        return {label: int(count) for label, count in zip(GENDER_LABELS, counts)}
+
+    def valid_ages(self):
+        """
+        Mảng tuổi hợp lệ
+        """
+        self.refresh()
+        ages = self.age[:self.size]
+        return ages[ages != NO_AGE]
+
+    def age_histogram(self, bin_width=10, max_age=100):
+        """
+        Số khách hàng theo nhóm tuổi [a, a + bin_width), trả về danh sách (a, a + bin_width, số lượng)
+        """
+        edges = np.arange(0, max_age + bin_width, bin_width)
+        ages = np.minimum(self.valid_ages(), max_age - 1)
+        counts, _ = np.histogram(ages, bins=edges)
+        return [(int(low), int(high), int(count)) for low, high, count in zip(edges[:-1], edges[1:], counts)]
+
+    def age_percentiles(self, percentiles=(25, 50, 75, 90)):
+        """
+        Các phân vị của tuổi, trả về {phân_vị: tuổi}
+        """
+        ages = self.valid_ages()
+        if not len(ages):
+            return {}
+        values = np.percentile(ages, percentiles)
+        return {percentile: float(value) for percentile, value in zip(percentiles, values)}
+
+    def signups(self, unit="D"):
+        """
+        Số khách hàng đăng ký theo ngày (unit="D") hoặc tháng (unit="M"),
+        trả về danh sách (thời điểm dạng chuỗi, số lượng) theo thứ tự thời gian
+        """
+        self.refresh()
+        created_at = self.created_at[:self.size]
+        created_at = created_at[~np.isnat(created_at)]
+        periods, counts = np.unique(created_at.astype(f"datetime64[{unit}]"), return_counts=True)
+        return [(str(period), int(count)) for period, count in zip(periods, counts)]
+
+    def signups_per_day(self):
+        """
+        Số khách hàng đăng ký theo ngày
+        """
+        return self.signups("D")
+
+    def signups_per_month(self):
+        """
+        Số khách hàng đăng ký theo tháng
+        """
+        return self.signups("M")
+
+    def summary(self):
+        """
+        Tổng hợp các số liệu thống kê để hiển thị
+        """
+        self.refresh()
+        return {
+            "total": self.size,
+            "gender_counts": self.gender_counts(),
+            "age_histogram": self.age_histogram(),
+            "age_percentiles": self.age_percentiles(),
+            "signups_per_month": self.signups_per_month(),
+        }
@@ -1,73 +1,99 @@
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-import random
+import config
+from journal import ChangeJournal
+from safe_writer import (GroupCommitWriter, atomic_write_json, atomic_write_lines, append_durable, commit_delay,
+                         truncate_partial_line)
+from jsonl_store import dumps_record, iter_jsonl_records
+from snapshot_cache import load_snapshot, save_snapshot
+from customer_record import CustomerRecord
+from id_allocator import IdAllocator
+from search_index import NGRAM_SIZE, SearchIndex, build_postings, normalize_text
+from customer_query import QueryPlanner, parse_query, is_structured_query, uses_text_index
 
-class CustomerManager:
-    def __init__(self, data_file="customers.json"):
+class BaseCustomerManager:
+    def __init__(self, data_file):
         """
-        Khởi tạo CustomerManager với đường dẫn file dữ liệu
+        Phần dùng chung của các kiểu lưu trữ khách hàng: kiểm tra và định dạng dữ liệu,
+        cấp ID, giao dịch batch() và các hàm nhận thay đổi
+        Lớp con tự lo việc đọc/ghi dữ liệu (begin_batch, commit_batch, rollback_batch...)
         """
         self.data_file = data_file
-        self.customers = []
-        self.load_data()
+        # Khóa dữ liệu: mọi thay đổi giữ khóa này, luồng tìm kiếm chạy nền giữ khóa trong lúc đọc
+        self.lock = threading.RLock()
+        self.id_allocator = IdAllocator("KH", state_file=f"{data_file}.ids")
+        # Bộ đếm thế hệ tăng sau mỗi lần tải lại hoặc thay đổi dữ liệu
+        self.generation = 0
+        # Trạng thái giao dịch batch(): độ sâu lồng nhau và thay đổi đang gom
+        self.batch_depth = 0
+        self.batch_entries = []
+        # Các hàm được gọi sau mỗi thay đổi dữ liệu (ví dụ lớp thống kê CustomerAnalytics)
+        self.change_listeners = []
+        # Bộ ghi gộp của kiểu lưu trữ dạng file (None nếu mỗi thay đổi được ghi ngay)
+        self.writer = None
     
-    def load_data(self):
+    def prepare_search_index(self, keyword):
         """
-        Đọc dữ liệu khách hàng từ file JSON
+        Chuẩn bị chỉ mục tìm kiếm trước khi tìm theo từ khóa hoặc truy vấn có cấu trúc
+        (gọi trên luồng tìm kiếm, khi chưa giữ khóa dữ liệu)
+        Kiểu lưu trữ không có chỉ mục trong bộ nhớ thì không cần làm gì
         """
-        try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as file:
-                    content = file.read().strip()
-                    if content:  # Kiểm tra nếu file không trống
-                        try:
-                            self.customers = json.loads(content)
-                            if not isinstance(self.customers, list):
-                                raise ValueError("Dữ liệu không đúng định dạng danh sách")
-                            print(f"Đã tải dữ liệu từ {self.data_file}, số lượng khách hàng: {len(self.customers)}")
-                            return True
-                        except json.JSONDecodeError as je:
-                            print(f"Lỗi định dạng JSON: {je}")
-                            self.customers = []
-                            return False
-                        except ValueError as ve:
-                            print(f"Lỗi dữ liệu: {ve}")
-                            self.customers = []
-                            return False
-                    else:
-                        self.customers = []
-                        print(f"File {self.data_file} trống")
-                        return True
-            else:
-                self.customers = []
-                print(f"File {self.data_file} không tồn tại. Tạo danh sách khách hàng mới.")
-                # Tạo file trống nếu chưa tồn tại
-                with open(self.data_file, 'w', encoding='utf-8') as file:
-                    json.dump([], file, ensure_ascii=False, indent=4)
-                return True
-        except Exception as e:
-            print(f"Lỗi khi tải dữ liệu: {e}")
-            self.customers = []
-            return False
+        return None
     
-    def save_data(self):
+    def add_change_listener(self, listener):
+        """
+        Đăng ký hàm nhận thay đổi: listener(entries) với entries là danh sách thay đổi
+        (cùng dạng bản ghi nhật ký) hoặc None khi dữ liệu được tải lại / hoàn tác toàn bộ
+        """
+        self.change_listeners.append(listener)
+    
+    def remove_change_listener(self, listener):
         """
-        Lưu dữ liệu khách hàng ra file JSON
+        Hủy đăng ký hàm nhận thay đổi
         """
+        if listener in self.change_listeners:
+            self.change_listeners.remove(listener)
+    
+    def notify_changes(self, entries):
+        """
+        Báo thay đổi cho các hàm đã đăng ký (sau khi generation đã được tăng)
+        """
+        for listener in list(self.change_listeners):
+            try:
+                listener(entries)
+            except Exception as e:
+                print(f"Lỗi khi báo thay đổi dữ liệu: {e}")
+    
+    @contextmanager
+    def batch(self):
+        """
+        Giao dịch gom nhiều thay đổi: dữ liệu chỉ được ghi một lần khi thoát khối with,
+        nếu có ngoại lệ thì mọi thay đổi trong khối bị hoàn tác
+        Khối batch() lồng nhau được gộp vào giao dịch ngoài cùng
+        """
+        self.batch_depth += 1
+        if self.batch_depth == 1:
+            self.begin_batch()
         try:
-            # Đảm bảo thư mục chứa file tồn tại
-            file_dir = os.path.dirname(os.path.abspath(self.data_file))
-            if not os.path.exists(file_dir):
-                os.makedirs(file_dir)
-                
-            with open(self.data_file, 'w', encoding='utf-8') as file:
-                json.dump(self.customers, file, ensure_ascii=False, indent=4)
-            print(f"Đã lưu dữ liệu vào {self.data_file}, số lượng khách hàng: {len(self.customers)}")
-            return True
-        except Exception as e:
-            print(f"Lỗi khi lưu dữ liệu: {e}")
-            return False
+            yield self
+        except BaseException:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.rollback_batch()
+            raise
+        self.batch_depth -= 1
+        if self.batch_depth == 0:
+            self.commit_batch()
+    
+    def flush(self):
+        """
+        Ghi ngay mọi thay đổi đang chờ xuống đĩa (dùng khi thoát chương trình)
+        Kiểu lưu trữ không có bộ ghi gộp thì không có gì phải ghi
+        """
+        return self.writer.flush() if self.writer is not None else True
     
     def convert_gender(self, gender):
         """
@@ -187,9 +213,9 @@ class CustomerManager:
             
         return True
     
-    def add_customer(self, customer_data):
+    def prepare_customer_data(self, customer_data):
         """
-        Thêm một khách hàng mới
+        Kiểm tra và định dạng số điện thoại, email, giới tính của khách hàng
         """
         # Kiểm tra và định dạng số điện thoại
         if "phone" in customer_data:
@@ -203,27 +229,566 @@ class CustomerManager:
                 raise ValueError("Email không hợp lệ! Vui lòng nhập đúng định dạng @gmail.com")
             customer_data["email"] = self.format_email(customer_data["email"])
         
-        # Tạo ID duy nhất cho khách hàng mới theo định dạng KHxxxx
-        timestamp = str(int(datetime.now().timestamp()))
-        last_four = timestamp[-4:] if len(timestamp) >= 4 else timestamp.zfill(4)
-        customer_id = f"KH{last_four}"
-        
-        # Kiểm tra xem ID đã tồn tại chưa
-        while any(customer.get("id") == customer_id for customer in self.customers):
-            # Nếu ID đã tồn tại, tạo ID mới bằng cách thêm số ngẫu nhiên
-            last_four = str(random.randint(1000, 9999))
-            customer_id = f"KH{last_four}"
-        
-        customer_data["id"] = customer_id
-        customer_data["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
         # Chuyển đổi giới tính sang định dạng Nam/Nữ
         if "gender" in customer_data:
             customer_data["gender"] = self.convert_gender(customer_data["gender"])
         
-        self.customers.append(customer_data)
-        self.save_data()
-        return customer_id
+        return customer_data
+    
+    def generate_customer_id(self):
+        """
+        Tạo ID duy nhất cho khách hàng mới theo định dạng KHxxxx
+        """
+        return self.id_allocator.allocate()
+    
+    def prepare_new_customers(self, customers_data):
+        """
+        Kiểm tra danh sách khách hàng mới, cấp ID hàng loạt cho các dòng hợp lệ
+        Trả về (danh sách bản ghi hợp lệ, danh sách lỗi (vị trí dòng, thông báo))
+        """
+        records = []
+        errors = []
+        for row, customer_data in enumerate(customers_data):
+            try:
+                records.append(self.prepare_customer_data(customer_data))
+            except ValueError as ve:
+                errors.append((row, str(ve)))
+
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for customer_id, customer_data in zip(self.id_allocator.allocate_many(len(records)), records):
+            customer_data["id"] = customer_id
+            customer_data["created_at"] = created_at
+        return records, errors
+    
+    def prepare_updates(self, updates):
+        """
+        Kiểm tra các cập nhật dạng {id: các trường cần đổi} và ghép vào bản ghi hiện có
+        Trả về (danh sách bản ghi mới, danh sách lỗi (ID, thông báo))
+        """
+        records = []
+        errors = []
+        updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for customer_id, changes in updates.items():
+            customer = self.get_customer_by_id(customer_id)
+            if customer is None:
+                errors.append((customer_id, "Không tìm thấy khách hàng!"))
+                continue
+            try:
+                changes = self.prepare_customer_data(dict(changes))
+            except ValueError as ve:
+                errors.append((customer_id, str(ve)))
+                continue
+            record = dict(customer)
+            record.update(changes)
+            # Giữ lại ID và thời gian tạo
+            record["id"] = customer["id"]
+            record["created_at"] = customer.get("created_at")
+            record["updated_at"] = updated_at
+            records.append(record)
+        return records, errors
+
+class CustomerManager(BaseCustomerManager):
+    def __init__(self, data_file="customers.json", compact_threshold=500, load_progress=None):
+        """
+        Khởi tạo CustomerManager với đường dẫn file dữ liệu
+        Mỗi thay đổi được ghi vào nhật ký, khi nhật ký đạt compact_threshold
+        bản ghi thì được gộp lại vào file dữ liệu chính
+        Việc ghi file do GroupCommitWriter đảm nhận: các thay đổi liên tiếp được gộp
+        thành một lần ghi, file chính được ghi an toàn qua file tạm + đổi tên
+        File có đuôi .jsonl được lưu dạng JSON Lines (mỗi dòng một khách hàng), được đọc
+        từng dòng và khách hàng mới được ghi thêm thẳng vào cuối file
+        load_progress(số_byte_đã_đọc, tổng_số_byte) được gọi trong lúc đọc file JSON Lines
+        """
+        super().__init__(data_file)
+        self.data_format = "jsonl" if data_file.endswith(".jsonl") else "json"
+        self.load_progress = load_progress
+        self.customers = []
+        # Chỉ mục theo ID: id -> bản ghi và id -> vị trí trong danh sách
+        self.customer_index = {}
+        self.customer_positions = {}
+        # Chỉ mục tìm kiếm lưu sẵn chuỗi đã bỏ dấu của từng khách hàng
+        self.search_index = SearchIndex()
+        self.journal = ChangeJournal(f"{data_file}.journal")
+        self.compact_threshold = compact_threshold
+        # Dấu hiệu nhận biết file dữ liệu (mtime, kích thước) lúc đọc/ghi gần nhất
+        self.file_signature = None
+        # Dữ liệu chờ ghi: bản chụp toàn bộ danh sách (khi gộp) và các thay đổi cho nhật ký
+        self.pending_lock = threading.Lock()
+        self.pending_snapshot = None
+        self.pending_search_texts = None
+        self.pending_entries = []
+        # Số thay đổi chưa được gộp vào file chính (kể cả đang chờ ghi)
+        self.unmerged_changes = 0
+        # Luồng ghi không ghi được nhật ký và cần một bản chụp toàn bộ danh sách
+        self.snapshot_requested = False
+        # Bản sao danh sách để hoàn tác giao dịch batch()
+        self.batch_backup = None
+        # Thực thi truy vấn có cấu trúc (gender:Nữ age:25..35 ...) bằng các chỉ mục trong bộ nhớ
+        self.query_planner = QueryPlanner(self)
+        self.writer = GroupCommitWriter(self.commit_pending_changes,
+                                        delay=commit_delay(), name=f"writer:{data_file}")
+        self.load_data()
+    
+    def load_data(self):
+        """
+        Đọc dữ liệu khách hàng từ file JSON, áp dụng nhật ký và dựng lại chỉ mục
+        """
+        with self.lock:
+            # Ghi nốt các thay đổi đang chờ trước khi đọc lại
+            self.writer.flush()
+            # Dùng cache nhị phân nếu file dữ liệu chưa đổi kể từ lần ghi cache
+            cached = load_snapshot(self.data_file)
+            if cached is not None:
+                self.customers = cached["customers"]
+                print(f"Số lượng khách hàng: {len(self.customers)}")
+                loaded = True
+                self.rebuild_index(cached)
+            else:
+                loaded = self.read_data_file()
+                self.rebuild_index()
+                if loaded and self.customers:
+                    # Ghi cache cho lần khởi động sau (trước khi áp dụng nhật ký)
+                    save_snapshot(self.data_file, self.snapshot_payload(self.customers, self.search_index.texts))
+            if loaded:
+                self.replay_journal()
+            self.file_signature = self.get_file_signature()
+            self.generation += 1
+            self.notify_changes(None)
+            return loaded
+    
+    def get_file_signature(self):
+        """
+        Lấy mtime, kích thước và inode của file dữ liệu và file nhật ký
+        """
+        signature = []
+        for path in (self.data_file, self.journal.journal_file):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def has_file_changed(self):
+        """
+        Kiểm tra file dữ liệu có bị thay đổi bởi tiến trình khác kể từ lần đọc/ghi gần nhất không
+        """
+        return self.get_file_signature() != self.file_signature
+    
+    def reload_if_changed(self, force=False):
+        """
+        Chỉ đọc lại file khi file đã bị thay đổi từ bên ngoài (hoặc khi force=True)
+        """
+        self.writer.flush()
+        if force or self.has_file_changed():
+            return self.load_data()
+        return True
+    
+    def read_data_file(self):
+        """
+        Đọc danh sách khách hàng từ file dữ liệu theo định dạng của file
+        """
+        if self.data_format == "jsonl":
+            return self.read_jsonl_file()
+        return self.read_json_file()
+    
+    def snapshot_payload(self, customers, search_texts):
+        """
+        Dữ liệu ghi vào cache nhị phân: danh sách khách hàng kèm chuỗi tìm kiếm đã chuẩn hóa
+        và mốc ID cao nhất, để lần khởi động sau không phải dựng lại chỉ mục
+        """
+        return {
+            "customers": customers,
+            "search_texts": search_texts,
+            "high_water": self.id_allocator.high_water,
+        }
+    
+    def read_json_file(self):
+        """
+        Đọc danh sách khách hàng từ file JSON
+        """
+        try:
+            if os.path.exists(self.data_file):
+                with open(self.data_file, 'r', encoding='utf-8') as file:
+                    content = file.read().strip()
+                    if content:  # Kiểm tra nếu file không trống
+                        try:
+                            self.customers = json.loads(content)
+                            if not isinstance(self.customers, list):
+                                raise ValueError("Dữ liệu không đúng định dạng danh sách")
+                            self.customers = [self.make_record(customer) for customer in self.customers]
+                            print(f"Đã tải dữ liệu từ {self.data_file}, số lượng khách hàng: {len(self.customers)}")
+                            return True
+                        except json.JSONDecodeError as je:
+                            print(f"Lỗi định dạng JSON: {je}")
+                            self.customers = []
+                            return False
+                        except ValueError as ve:
+                            print(f"Lỗi dữ liệu: {ve}")
+                            self.customers = []
+                            return False
+                    else:
+                        self.customers = []
+                        print(f"File {self.data_file} trống")
+                        return True
+            else:
+                self.customers = []
+                print(f"File {self.data_file} không tồn tại. Tạo danh sách khách hàng mới.")
+                # Tạo file trống nếu chưa tồn tại
+                atomic_write_json(self.data_file, [])
+                return True
+        except Exception as e:
+            print(f"Lỗi khi tải dữ liệu: {e}")
+            self.customers = []
+            return False
+    
+    def read_jsonl_file(self):
+        """
+        Đọc danh sách khách hàng từ file JSON Lines theo từng dòng
+        Dòng cuối bị ghi dở (do sự cố khi ghi thêm) được cắt khỏi file trước khi đọc,
+        để khách hàng ghi thêm sau đó không bị nối vào mảnh dòng này
+        """
+        try:
+            if not os.path.exists(self.data_file):
+                self.customers = []
+                print(f"File {self.data_file} không tồn tại. Tạo danh sách khách hàng mới.")
+                atomic_write_lines(self.data_file, [])
+                return True
+            removed = truncate_partial_line(self.data_file)
+            if removed:
+                print(f"Đã bỏ {removed} byte ghi dở ở cuối {self.data_file}")
+            self.customers = []
+            for customer in iter_jsonl_records(self.data_file, self.load_progress):
+                self.customers.append(self.make_record(customer))
+            print(f"Đã tải dữ liệu từ {self.data_file}, số lượng khách hàng: {len(self.customers)}")
+            return True
+        except Exception as e:
+            print(f"Lỗi khi tải dữ liệu: {e}")
+            self.customers = []
+            return False
+    
+    def write_snapshot(self, customers):
+        """
+        Ghi toàn bộ danh sách khách hàng vào file chính theo định dạng của file
+        """
+        if self.data_format == "jsonl":
+            atomic_write_lines(self.data_file, (dumps_record(customer) for customer in customers))
+        else:
+            atomic_write_json(self.data_file, customers)
+    
+    def append_records(self, entries):
+        """
+        Với file JSON Lines: ghi các bản ghi thêm mới ở đầu danh sách thay đổi
+        thẳng vào cuối file chính (chỉ khi nhật ký đang trống để giữ đúng thứ tự áp dụng)
+        Trả về các thay đổi còn lại cần ghi vào nhật ký
+        """
+        if self.data_format != "jsonl" or self.journal.entry_count:
+            return entries
+        count = 0
+        while count < len(entries) and entries[count].get("op") == "add":
+            count += 1
+        if count:
+            append_durable(self.data_file, "".join(dumps_record(entry["record"]) for entry in entries[:count]))
+        return entries[count:]
+    
+    def rebuild_index(self, cached=None, high_water=0):
+        """
+        Dựng lại chỉ mục theo ID từ danh sách khách hàng
+        cached là dữ liệu đọc từ cache nhị phân (nếu có) để dùng lại chỉ mục tìm kiếm
+        high_water là mốc ID đã cấp cần giữ lại (ví dụ các ID cấp trong giao dịch bị hoàn tác)
+        """
+        self.customer_index = {}
+        self.customer_positions = {}
+        for position, customer in enumerate(self.customers):
+            customer_id = str(customer.get("id", ""))
+            self.customer_index[customer_id] = customer
+            self.customer_positions[customer_id] = position
+        if cached is not None:
+            self.id_allocator.restore(self.customer_index, cached["high_water"])
+            self.search_index.build(self.customers, cached["search_texts"])
+        else:
+            self.id_allocator.reset(self.customer_index, high_water)
+            self.search_index.build(self.customers)
+    
+    def make_record(self, customer):
+        """
+        Chuyển dict khách hàng sang dạng lưu trong bộ nhớ (CustomerRecord nếu bật CUSTOMER_COMPACT_RECORDS)
+        """
+        if config.CUSTOMER_COMPACT_RECORDS:
+            return CustomerRecord.from_mapping(customer)
+        return customer
+    
+    def index_add(self, customer):
+        """
+        Thêm bản ghi vào cuối danh sách và cập nhật chỉ mục
+        """
+        customer = self.make_record(customer)
+        customer_id = str(customer.get("id", ""))
+        if customer_id in self.customer_index:
+            return self.index_replace(customer_id, customer)
+        self.customer_index[customer_id] = customer
+        self.customer_positions[customer_id] = len(self.customers)
+        self.customers.append(customer)
+        self.id_allocator.register(customer_id)
+        self.search_index.add(customer)
+        return True
+    
+    def index_replace(self, customer_id, customer):
+        """
+        Thay bản ghi có ID cho trước, giữ nguyên vị trí trong danh sách
+        """
+        customer_id = str(customer_id)
+        position = self.customer_positions.get(customer_id)
+        if position is None:
+            return False
+        customer = self.make_record(customer)
+        self.customers[position] = customer
+        self.customer_index[customer_id] = customer
+        self.search_index.add(customer)
+        return True
+    
+    def index_remove(self, customer_id):
+        """
+        Xóa bản ghi theo ID bằng cách đổi chỗ với phần tử cuối, không phải dịch cả danh sách
+        """
+        customer_id = str(customer_id)
+        position = self.customer_positions.pop(customer_id, None)
+        if position is None:
+            return None
+        removed = self.customer_index.pop(customer_id)
+        self.id_allocator.release(customer_id)
+        self.search_index.remove(customer_id)
+        last = self.customers.pop()
+        if position < len(self.customers):
+            self.customers[position] = last
+            self.customer_positions[str(last.get("id", ""))] = position
+        return removed
+    
+    def replay_journal(self):
+        """
+        Áp dụng lại các thay đổi trong nhật ký lên danh sách đã đọc từ file
+        """
+        for entry in self.journal.replay():
+            op = entry.get("op")
+            if op == "add":
+                self.index_add(entry["record"])
+            elif op == "update":
+                self.index_replace(entry["id"], entry["record"])
+            elif op == "delete":
+                self.index_remove(entry["id"])
+        self.unmerged_changes = self.journal.entry_count
+        if self.journal.entry_count:
+            print(f"Đã áp dụng {self.journal.entry_count} thay đổi từ nhật ký {self.journal.journal_file}")
+    
+    def log_changes(self, entries):
+        """
+        Ghi các thay đổi vào nhật ký thay vì ghi lại toàn bộ file
+        Các thay đổi được đưa vào hàng chờ và ghi gộp bởi luồng ghi
+        Gộp nhật ký vào file dữ liệu chính khi đạt ngưỡng
+        """
+        if not entries:
+            return True
+        self.generation += 1
+        self.notify_changes(entries)
+        if self.batch_depth:
+            # Đang trong batch(): chỉ ghi khi kết thúc giao dịch
+            self.batch_entries.extend(entries)
+            return True
+        return self.queue_changes(entries)
+    
+    def queue_changes(self, entries):
+        """
+        Đưa các thay đổi vào hàng chờ ghi, gộp nhật ký nếu đạt ngưỡng
+        """
+        with self.pending_lock:
+            self.pending_entries.extend(entries)
+            if self.data_format == "jsonl":
+                # Bản ghi thêm mới được ghi thẳng vào file chính, không cần gộp
+                self.unmerged_changes += sum(1 for entry in entries if entry.get("op") != "add")
+            else:
+                self.unmerged_changes += len(entries)
+            need_compact = self.unmerged_changes >= self.compact_threshold or self.snapshot_requested
+        if need_compact:
+            return self.compact()
+        return self.writer.request()
+    
+    def begin_batch(self):
+        """
+        Bắt đầu giao dịch: giữ bản sao danh sách để có thể hoàn tác
+        """
+        self.batch_entries = []
+        self.batch_backup = list(self.customers)
+    
+    def commit_batch(self):
+        """
+        Kết thúc giao dịch: ghi mọi thay đổi đã gom trong một lần
+        """
+        entries, self.batch_entries = self.batch_entries, []
+        self.batch_backup = None
+        return self.queue_changes(entries) if entries else True
+    
+    def rollback_batch(self):
+        """
+        Hoàn tác giao dịch: khôi phục danh sách và dựng lại chỉ mục
+        (các ID đã cấp trong giao dịch không được cấp lại)
+        """
+        with self.lock:
+            # Giữ mốc ID đã cấp trong bộ nhớ (kể cả các ID cấp trong giao dịch)
+            high_water = self.id_allocator.high_water
+            self.customers = self.batch_backup
+            self.batch_entries = []
+            self.batch_backup = None
+            self.rebuild_index(high_water=high_water)
+            # Lưu mốc ID (luồng ghi lưu trạng thái của bộ cấp phát sau mỗi lần ghi)
+            self.writer.request()
+            self.generation += 1
+            self.notify_changes(None)
+            print("Đã hoàn tác các thay đổi trong giao dịch")
+    
+    def compact(self):
+        """
+        Gộp nhật ký thay đổi vào file dữ liệu chính
+        """
+        return self.save_data()
+    
+    def save_data(self):
+        """
+        Lưu dữ liệu khách hàng ra file JSON và xóa nhật ký đã được gộp
+        Bản chụp danh sách hiện tại được đưa vào hàng chờ, thay thế mọi thay đổi chưa ghi
+        """
+        with self.pending_lock:
+            self.pending_snapshot = list(self.customers)
+            if config.SNAPSHOT_CACHE:
+                # Bản sao chuỗi tìm kiếm để luồng ghi cập nhật cache nhị phân
+                self.pending_search_texts = dict(self.search_index.texts)
+            self.pending_entries = []
+            self.unmerged_changes = 0
+            self.snapshot_requested = False
+        return self.writer.request()
+    
+    def flush(self):
+        """
+        Ghi ngay mọi thay đổi đang chờ xuống đĩa (dùng khi thoát chương trình)
+        Nếu luồng ghi đã yêu cầu lưu toàn bộ (không ghi được nhật ký) thì chụp danh sách trước
+        """
+        if self.snapshot_requested:
+            with self.lock:
+                self.save_data()
+        return self.writer.flush()
+    
+    def commit_pending_changes(self):
+        """
+        Ghi các dữ liệu đang chờ (chạy trên luồng ghi):
+        bản chụp toàn bộ được ghi an toàn vào file chính rồi xóa nhật ký,
+        các thay đổi sau đó được ghi thêm vào nhật ký trong một lần ghi
+        """
+        with self.pending_lock:
+            snapshot, self.pending_snapshot = self.pending_snapshot, None
+            search_texts, self.pending_search_texts = self.pending_search_texts, None
+            entries, self.pending_entries = self.pending_entries, []
+
+        try:
+            if snapshot is not None:
+                self.write_snapshot(snapshot)
+                self.journal.clear()
+                print(f"Đã lưu dữ liệu vào {self.data_file}, số lượng khách hàng: {len(snapshot)}")
+            if search_texts is not None and not (entries and self.data_format == "jsonl"):
+                # Cập nhật cache khi file chính vừa được ghi lại toàn bộ (và không bị ghi thêm ngay sau đó)
+                save_snapshot(self.data_file, self.snapshot_payload(snapshot, search_texts))
+            if entries:
+                entries = self.append_records(entries)
+            if entries and not self.journal.append_many(entries):
+                # Không ghi được nhật ký: trả thay đổi về hàng chờ và yêu cầu lưu toàn bộ
+                # Bản chụp được lấy trên luồng sửa dữ liệu (luồng ghi không đọc self.customers
+                # vì danh sách có thể đang bị sửa), ở lần thay đổi hoặc flush() tiếp theo
+                print(f"Không ghi được nhật ký {self.journal.journal_file}, sẽ lưu toàn bộ dữ liệu")
+                with self.pending_lock:
+                    self.pending_entries = entries + self.pending_entries
+                    self.snapshot_requested = True
+                return False
+            self.id_allocator.save_state()
+            self.file_signature = self.get_file_signature()
+            return True
+        except Exception as e:
+            print(f"Lỗi khi lưu dữ liệu: {e}")
+            # Đưa dữ liệu chưa ghi được trở lại hàng chờ để lần ghi sau thử lại
+            with self.pending_lock:
+                if self.pending_snapshot is None and snapshot is not None:
+                    self.pending_snapshot = snapshot
+                    self.pending_search_texts = search_texts
+                self.pending_entries = entries + self.pending_entries
+            return False
+    
+    def customer_id_exists(self, customer_id):
+        """
+        Kiểm tra ID khách hàng đã tồn tại chưa
+        """
+        return str(customer_id) in self.customer_index
+    
+    def add_customer(self, customer_data):
+        """
+        Thêm một khách hàng mới
+        """
+        with self.lock:
+            self.prepare_customer_data(customer_data)
+        
+            customer_id = self.generate_customer_id()
+            customer_data["id"] = customer_id
+            customer_data["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+            self.index_add(customer_data)
+            self.log_changes([{"op": "add", "record": customer_data}])
+            return customer_id
+    
+    def add_customers(self, customers_data):
+        """
+        Thêm nhiều khách hàng: kiểm tra từng dòng (không dừng ở lỗi đầu tiên),
+        cấp ID hàng loạt và ghi một lần
+        Trả về (danh sách ID đã thêm, danh sách lỗi (vị trí dòng, thông báo))
+        """
+        with self.lock:
+            records, errors = self.prepare_new_customers(customers_data)
+            for record in records:
+                self.index_add(record)
+            self.log_changes([{"op": "add", "record": record} for record in records])
+            return [record["id"] for record in records], errors
+    
+    def update_customers(self, updates):
+        """
+        Cập nhật nhiều khách hàng, updates có dạng {id: các trường cần đổi}
+        Trả về (danh sách ID đã cập nhật, danh sách lỗi (ID, thông báo))
+        """
+        with self.lock:
+            records, errors = self.prepare_updates(updates)
+            for record in records:
+                self.index_replace(record["id"], record)
+            self.log_changes([{"op": "update", "id": record["id"], "record": record} for record in records])
+            return [record["id"] for record in records], errors
+    
+    def delete_customers(self, customer_ids):
+        """
+        Xóa nhiều khách hàng theo ID và ghi một lần
+        Trả về (danh sách ID đã xóa, danh sách lỗi (ID, thông báo))
+        """
+        with self.lock:
+            deleted = []
+            errors = []
+            for customer_id in customer_ids:
+                if self.index_remove(customer_id) is None:
+                    errors.append((customer_id, "Không tìm thấy khách hàng!"))
+                else:
+                    deleted.append(customer_id)
+            self.log_changes([{"op": "delete", "id": customer_id} for customer_id in deleted])
+            return deleted, errors
+    
+    def import_customers(self, customers):
+        """
+        Thêm danh sách khách hàng đã được định dạng sẵn (ví dụ từ DataCrawler)
+        """
+        with self.lock:
+            for customer in customers:
+                self.index_add(customer)
+            return self.log_changes([{"op": "add", "record": customer} for customer in customers])
     
     def get_all_customers(self):
         """
@@ -231,117 +796,145 @@ class CustomerManager:
         """
         return self.customers
     
+    def get_sorted_customers(self, field="name", descending=False):
+        """
+        Lấy danh sách khách hàng sắp xếp theo trường (name, age, created_at, updated_at, id)
+        Thứ tự lấy từ chỉ mục sắp xếp được cập nhật theo từng thay đổi nên không phải sắp xếp lại,
+        khách hàng không có giá trị ở trường đó nằm cuối danh sách
+        """
+        customer_index = self.customer_index
+        return [customer_index[customer_id]
+                for customer_id in self.query_planner.sorted_index(field).ordered_ids(descending)]
+    
     def get_customer_by_id(self, customer_id):
         """
         Tìm khách hàng theo ID
         """
-        print(f"Đang tìm khách hàng có ID: {customer_id}")
-        print(f"Danh sách khách hàng hiện có: {len(self.customers)} khách hàng")
-        for i, customer in enumerate(self.customers):
-            current_id = customer.get("id")
-            print(f"Khách hàng thứ {i}: ID = {current_id}, kiểu dữ liệu: {type(current_id)}")
-            if str(current_id) == str(customer_id):
-                print(f"Đã tìm thấy khách hàng: {customer.get('name')}")
-                return customer
-        print(f"Không tìm thấy khách hàng với ID: {customer_id}")
-        return None
+        return self.customer_index.get(str(customer_id))
     
     def update_customer(self, customer_id, updated_data):
         """
         Cập nhật thông tin khách hàng
         """
-        for i, customer in enumerate(self.customers):
-            if customer.get("id") == customer_id:
-                # Kiểm tra và định dạng số điện thoại
-                if "phone" in updated_data:
-                    if not self.validate_phone_number(updated_data["phone"]):
-                        raise ValueError("Số điện thoại không hợp lệ! Vui lòng nhập chính xác 10 chữ số và bắt đầu bằng 09 hoặc 08.")
-                    updated_data["phone"] = self.format_phone_number(updated_data["phone"])
-                
-                # Kiểm tra và định dạng email
-                if "email" in updated_data:
-                    if not self.validate_email(updated_data["email"]):
-                        raise ValueError("Email không hợp lệ! Vui lòng nhập đúng định dạng @gmail.com")
-                    updated_data["email"] = self.format_email(updated_data["email"])
-                
-                # Giữ lại ID và thời gian tạo
-                updated_data["id"] = customer_id
-                updated_data["created_at"] = customer.get("created_at")
-                updated_data["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Chuyển đổi giới tính sang định dạng Nam/Nữ
-                if "gender" in updated_data:
-                    updated_data["gender"] = self.convert_gender(updated_data["gender"])
-                
-                self.customers[i] = updated_data
-                self.save_data()
-                return True
-        return False
+        with self.lock:
+            customer = self.get_customer_by_id(customer_id)
+            if customer is None:
+                return False
+        
+            self.prepare_customer_data(updated_data)
+        
+            # Giữ lại ID và thời gian tạo
+            updated_data["id"] = customer_id
+            updated_data["created_at"] = customer.get("created_at")
+            updated_data["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+            self.index_replace(customer_id, updated_data)
+            self.log_changes([{"op": "update", "id": customer_id, "record": updated_data}])
+            return True
     
     def delete_customer(self, customer_id):
         """
         Xóa một khách hàng theo ID
         """
-        for i, customer in enumerate(self.customers):
-            if customer.get("id") == customer_id:
-                del self.customers[i]
-                self.save_data()
-                return True
-        return False
+        with self.lock:
+            if self.index_remove(customer_id) is None:
+                return False
+            self.log_changes([{"op": "delete", "id": customer_id}])
+            return True
+    
+    def prepare_search_index(self, keyword):
+        """
+        Dựng chỉ mục đảo trigram (ở lần tìm đầu tiên cần đến nó) mà không giữ khóa dữ liệu trong lúc dựng:
+        chỉ chép dict chuỗi tìm kiếm khi giữ khóa, dựng trên bản chép rồi giữ khóa lại để gắn vào
+        và áp dụng các thay đổi xảy ra trong lúc dựng, nên luồng giao diện không bị chặn lâu
+        Phải gọi khi luồng hiện tại chưa giữ self.lock
+        """
+        try:
+            if is_structured_query(keyword):
+                needed = uses_text_index(parse_query(keyword))
+            else:
+                needed = len(normalize_text(keyword.strip())) >= NGRAM_SIZE
+        except ValueError:
+            # Truy vấn sai cú pháp được báo lỗi khi tìm
+            return
+        if not needed:
+            return
+        with self.lock:
+            if self.search_index.postings is not None:
+                return
+            texts = dict(self.search_index.texts)
+        postings = build_postings(texts)
+        with self.lock:
+            self.search_index.install_postings(postings, texts)
     
-    def search_customers(self, keyword):
+    def search_customers(self, keyword, candidates=None):
         """
         Tìm kiếm khách hàng theo từ khóa hoặc ID
+        Nếu có candidates (kết quả của lần tìm trước) thì chỉ lọc lại trong danh sách đó
+        Từ khóa rỗng hoặc chỉ có khoảng trắng trả về danh sách rỗng (không còn trả về toàn bộ
+        khách hàng; giao diện tự hiển thị lại toàn bộ danh sách khi ô tìm kiếm trống)
+        Có thể gọi từ luồng khác: việc tìm chạy trong khi giữ khóa dữ liệu
         """
-        results = []
-        if not keyword:
-            return results
-            
-        # Chuẩn hóa từ khóa tìm kiếm
-        keyword = keyword.lower().strip()
+        with self.lock:
+            if not keyword or not keyword.strip():
+                return []
         
-        # Hàm chuẩn hóa chuỗi để tìm kiếm không phân biệt dấu
-        def normalize_text(text):
-            if not text:
-                return ""
-            text = text.lower()
-            # Loại bỏ dấu tiếng Việt
-            text = text.replace('à', 'a').replace('á', 'a').replace('ả', 'a').replace('ã', 'a').replace('ạ', 'a')
-            text = text.replace('ă', 'a').replace('ằ', 'a').replace('ắ', 'a').replace('ẳ', 'a').replace('ẵ', 'a').replace('ặ', 'a')
-            text = text.replace('â', 'a').replace('ầ', 'a').replace('ấ', 'a').replace('ẩ', 'a').replace('ẫ', 'a').replace('ậ', 'a')
-            text = text.replace('đ', 'd')
-            text = text.replace('è', 'e').replace('é', 'e').replace('ẻ', 'e').replace('ẽ', 'e').replace('ẹ', 'e')
-            text = text.replace('ê', 'e').replace('ề', 'e').replace('ế', 'e').replace('ể', 'e').replace('ễ', 'e').replace('ệ', 'e')
-            text = text.replace('ì', 'i').replace('í', 'i').replace('ỉ', 'i').replace('ĩ', 'i').replace('ị', 'i')
-            text = text.replace('ò', 'o').replace('ó', 'o').replace('ỏ', 'o').replace('õ', 'o').replace('ọ', 'o')
-            text = text.replace('ô', 'o').replace('ồ', 'o').replace('ố', 'o').replace('ổ', 'o').replace('ỗ', 'o').replace('ộ', 'o')
-            text = text.replace('ơ', 'o').replace('ờ', 'o').replace('ớ', 'o').replace('ở', 'o').replace('ỡ', 'o').replace('ợ', 'o')
-            text = text.replace('ù', 'u').replace('ú', 'u').replace('ủ', 'u').replace('ũ', 'u').replace('ụ', 'u')
-            text = text.replace('ư', 'u').replace('ừ', 'u').replace('ứ', 'u').replace('ử', 'u').replace('ữ', 'u').replace('ự', 'u')
-            text = text.replace('ỳ', 'y').replace('ý', 'y').replace('ỷ', 'y').replace('ỹ', 'y').replace('ỵ', 'y')
-            return text
-            
-        normalized_keyword = normalize_text(keyword)
+            # Nếu từ khóa trùng chính xác với một ID, trả về ngay kết quả
+            customer_id = self.search_index.find_id(keyword)
+            if customer_id is not None:
+                return [self.customer_index[customer_id]]
         
-        for customer in self.customers:
-            # Kiểm tra ID trước
-            customer_id = str(customer.get("id", "")).lower()
-            if keyword == customer_id:
-                # Nếu tìm thấy ID chính xác, trả về ngay kết quả
-                return [customer]
-            
-            # Chuẩn hóa các trường dữ liệu để tìm kiếm
-            name = normalize_text(customer.get("name", ""))
-            email = normalize_text(customer.get("email", ""))
-            phone = normalize_text(customer.get("phone", ""))
-            address = normalize_text(customer.get("address", ""))
-            
-            # Tìm kiếm trong các trường
-            if (normalized_keyword in name or
-                normalized_keyword in email or
-                normalized_keyword in phone or
-                normalized_keyword in address or
-                normalized_keyword in customer_id):  # Thêm tìm kiếm trong ID
-                results.append(customer)
+            candidate_ids = None
+            if candidates is not None:
+                candidate_ids = [str(customer.get("id", "")) for customer in candidates]
         
-        return results 
\ No newline at end of file
+            # Chỉ chuẩn hóa từ khóa, các trường đã được chuẩn hóa sẵn trong chỉ mục
+            return [self.customer_index[customer_id]
+                    for customer_id in self.search_index.search(keyword, candidate_ids)]
+
+    def query_customers(self, query):
+        """
+        Tìm khách hàng bằng truy vấn có cấu trúc, ví dụ:
+        gender:Nữ age:25..35 address:colorado created:>=2025-06-01
+        Trả về iterator (kết quả được lấy dần), báo ValueError nếu truy vấn sai cú pháp
+        Khi lấy kết quả từ luồng khác, luồng đó phải giữ self.lock trong lúc lấy
+        """
+        return self.query_planner.execute(parse_query(query))
+
+def convert_json_to_jsonl(json_file="customers.json", jsonl_file="customers.jsonl"):
+    """
+    Chuyển dữ liệu khách hàng từ file JSON (kèm nhật ký) sang file JSON Lines
+    """
+    source = CustomerManager(json_file)
+    source.flush()
+    atomic_write_lines(jsonl_file, (dumps_record(customer) for customer in source.get_all_customers()))
+    print(f"Đã chuyển {len(source.get_all_customers())} khách hàng từ {json_file} sang {jsonl_file}")
+    return True
+
+def convert_jsonl_to_json(jsonl_file="customers.jsonl", json_file="customers.json"):
+    """
+    Chuyển dữ liệu khách hàng từ file JSON Lines (kèm nhật ký) sang file JSON
+    """
+    source = CustomerManager(jsonl_file)
+    source.flush()
+    atomic_write_json(json_file, source.get_all_customers())
+    print(f"Đã chuyển {len(source.get_all_customers())} khách hàng từ {jsonl_file} sang {json_file}")
+    return True
+
+def create_customer_manager(load_progress=None):
+    """
+    Tạo CustomerManager theo kiểu lưu trữ được chọn trong config.py
+    load_progress(số_byte_đã_đọc, tổng_số_byte) dùng để báo tiến trình đọc file JSON Lines
+    """
+    if config.CUSTOMER_STORAGE == "sqlite":
+        from sqlite_customer_manager import SQLiteCustomerManager, migrate_json_to_sqlite
+        # Lần đầu dùng SQLite thì chuyển dữ liệu từ file JSON sang
+        if not os.path.exists(config.CUSTOMER_DB_FILE) and os.path.exists(config.CUSTOMER_DATA_FILE):
+            migrate_json_to_sqlite(config.CUSTOMER_DATA_FILE, config.CUSTOMER_DB_FILE)
+        return SQLiteCustomerManager(config.CUSTOMER_DB_FILE)
+    if config.CUSTOMER_STORAGE == "jsonl":
+        # Lần đầu dùng JSON Lines thì chuyển dữ liệu từ file JSON sang
+        if not os.path.exists(config.CUSTOMER_JSONL_FILE) and os.path.exists(config.CUSTOMER_DATA_FILE):
+            convert_json_to_jsonl(config.CUSTOMER_DATA_FILE, config.CUSTOMER_JSONL_FILE)
+        return CustomerManager(config.CUSTOMER_JSONL_FILE, load_progress=load_progress)
+    return CustomerManager(config.CUSTOMER_DATA_FILE)
@@ -0,0 +1,601 @@
+import re
+from itertools import chain
+from search_index import NGRAM_SIZE, normalize_text, build_search_text, vietnamese_sort_key
+from sorted_index import SortedIndex
+
+# Tên trường dùng trong truy vấn (đã bỏ dấu, chữ thường) -> trường của khách hàng
+FIELD_ALIASES = {
+    "id": "id", "ma": "id",
+    "name": "name", "ten": "name",
+    "email": "email",
+    "phone": "phone", "sdt": "phone",
+    "address": "address", "diachi": "address",
+    "gender": "gender", "gioitinh": "gender",
+    "age": "age", "tuoi": "age",
+    "created": "created_at", "created_at": "created_at", "ngaytao": "created_at",
+    "updated": "updated_at", "updated_at": "updated_at", "ngaysua": "updated_at",
+}
+DATE_FIELDS = ("created_at", "updated_at")
+
+# Giá trị giới tính trong truy vấn (đã bỏ dấu) -> giới tính lưu trong dữ liệu
+GENDER_ALIASES = {"nam": "Nam", "male": "Nam", "m": "Nam",
+                  "nu": "Nữ", "female": "Nữ", "f": "Nữ",
+                  "khac": "Khác", "other": "Khác"}
+
+# Tách truy vấn thành các token: dấu ngoặc, giá trị trong ngoặc kép (kể cả dạng field:"a b") và từ thường
+TOKEN_RE = re.compile(r'[()]|[^\s()"]*"[^"]*"?|[^\s()]+')
+# Kiểm tra chuỗi có phải truy vấn có cấu trúc: có ít nhất một điều kiện dạng field:giá_trị
+# (tên trường không chứa "-" để điều kiện phủ định như -gender:Nam vẫn được nhận ra)
+STRUCTURED_RE = re.compile(r'(?:^|[\s(-])([^\s():"-]+):')
+# Thời gian dạng YYYY[-MM[-DD[ HH[:MM[:SS]]]]], so sánh trực tiếp trên chuỗi created_at
+DATE_RE = re.compile(r'\d{4}(-\d{2}(-\d{2}( \d{2}(:\d{2}(:\d{2})?)?)?)?)?')
+# Ký tự lớn hơn mọi ký tự trong chuỗi thời gian: "2025-06" + PREFIX_END lớn hơn mọi thời điểm trong tháng 6
+PREFIX_END = "\uffff"
+# Dãy chữ số trong ID
+NUMBER_RE = re.compile(r'\d+')
+
+def is_structured_query(text):
+    """
+    Kiểm tra từ khóa có chứa điều kiện dạng field:giá_trị với tên trường hợp lệ không
+    """
+    return any(normalize_text(name) in FIELD_ALIASES for name in STRUCTURED_RE.findall(text or ""))
+
+def like_pattern(text):
+    """
+    Tạo mẫu LIKE tìm chuỗi con (thoát các ký tự đặc biệt, dùng với ESCAPE '\\')
+    """
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def gender_label(gender):
+    """
+    Giới tính chuẩn (Nam/Nữ/Khác) của giá trị lưu trong dữ liệu
+    """
+    return GENDER_ALIASES.get(normalize_text(str(gender or "")), "Khác")
+
+def age_key(customer):
+    """
+    Khóa sắp xếp theo tuổi, None nếu tuổi không hợp lệ
+    """
+    try:
+        return int(customer.get("age"))
+    except (TypeError, ValueError):
+        return None
+
+def date_key(field):
+    """
+    Hàm lấy khóa sắp xếp theo trường thời gian (chuỗi "YYYY-MM-DD HH:MM:SS" so sánh được trực tiếp)
+    """
+    def key(customer):
+        value = customer.get(field)
+        return str(value) if value else None
+    return key
+
+def name_key(customer):
+    """
+    Khóa sắp xếp theo tên (thứ tự từ điển tiếng Việt)
+    """
+    name = customer.get("name")
+    return vietnamese_sort_key(name) if name else None
+
+def id_key(customer):
+    """
+    Khóa sắp xếp theo ID, phần số được so sánh theo giá trị (KH9999 < KH10000)
+    """
+    return NUMBER_RE.sub(lambda match: match.group().zfill(12), str(customer.get("id", "")))
+
+# Hàm lấy khóa của các trường có chỉ mục sắp xếp (dùng cho tìm theo khoảng và sắp xếp danh sách)
+SORT_KEYS = {"age": age_key, "created_at": date_key("created_at"), "updated_at": date_key("updated_at"),
+             "name": name_key, "id": id_key}
+
+class TextTerm:
+    # Chi phí tương đối khi kiểm tra một khách hàng, điều kiện rẻ được kiểm tra trước
+    COST = 2
+
+    def __init__(self, field, value):
+        """
+        Điều kiện chứa chuỗi (không phân biệt hoa thường, dấu) trong một trường,
+        field là None khi tìm trên mọi trường như ô tìm kiếm thường
+        """
+        self.field = field
+        self.value = normalize_text(value)
+
+    def matches(self, customer, planner):
+        """
+        Kiểm tra khách hàng thỏa điều kiện
+        """
+        # Chuỗi tìm kiếm đã chuẩn hóa sẵn chứa mọi trường văn bản: loại nhanh trước khi chuẩn hóa riêng trường
+        if self.value not in planner.search_text(customer):
+            return False
+        if self.field is None:
+            return True
+        return self.value in normalize_text(str(customer.get(self.field) or ""))
+
+    def plan(self, planner):
+        """
+        Dùng chỉ mục trigram nếu chuỗi đủ dài, trả về (số ứng viên ước lượng, hàm lấy danh sách ID)
+        Các danh sách posting chỉ được giao khi kế hoạch này được chọn
+        """
+        estimate = planner.text_estimate(self.value)
+        if estimate is None:
+            return None
+        return estimate, lambda: planner.text_candidates(self.value)
+
+    def to_sql(self):
+        """
+        Điều kiện SQL tương ứng (cột search_text và hàm normalize_text đã được chuẩn hóa sẵn)
+        """
+        column = "search_text" if self.field is None else f"normalize_text({self.field})"
+        return f"{column} LIKE ? ESCAPE '\\'", [like_pattern(self.value)]
+
+class IdTerm:
+    COST = 0
+
+    def __init__(self, value):
+        """
+        Điều kiện ID trùng khớp (không phân biệt hoa thường)
+        """
+        self.value = value.strip().lower()
+
+    def matches(self, customer, planner):
+        """
+        Kiểm tra khách hàng thỏa điều kiện
+        """
+        return str(customer.get("id", "")).lower() == self.value
+
+    def plan(self, planner):
+        """
+        Tra bảng băm ID: nhiều nhất một ứng viên
+        """
+        customer_id = planner.find_id(self.value)
+        ids = [] if customer_id is None else [customer_id]
+        return len(ids), lambda: ids
+
+    def to_sql(self):
+        """
+        Điều kiện SQL tương ứng
+        """
+        return "lower(id) = ?", [self.value]
+
+class GenderTerm:
+    COST = 1
+
+    def __init__(self, value):
+        """
+        Điều kiện giới tính (Nam, Nữ hoặc Khác)
+        """
+        label = GENDER_ALIASES.get(normalize_text(value))
+        if label is None:
+            raise ValueError(f"Giới tính không hợp lệ: {value}")
+        self.label = label
+
+    def matches(self, customer, planner):
+        """
+        Kiểm tra khách hàng thỏa điều kiện
+        """
+        gender = customer.get("gender")
+        # Phần lớn dữ liệu lưu đúng Nam/Nữ nên so sánh trực tiếp trước khi chuẩn hóa
+        return gender == self.label or gender_label(gender) == self.label
+
+    def plan(self, planner):
+        """
+        Không có chỉ mục theo giới tính
+        """
+        return None
+
+    def to_sql(self):
+        """
+        Điều kiện SQL tương ứng
+        """
+        known = [alias for alias, label in GENDER_ALIASES.items() if label != "Khác"]
+        if self.label == "Khác":
+            placeholders = ", ".join("?" * len(known))
+            return f"normalize_text(COALESCE(gender, '')) NOT IN ({placeholders})", known
+        aliases = [alias for alias, label in GENDER_ALIASES.items() if label == self.label]
+        return f"normalize_text(gender) IN ({', '.join('?' * len(aliases))})", aliases
+
+class RangeTerm:
+    COST = 1
+
+    def __init__(self, field, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """
+        Điều kiện giá trị của trường (tuổi, thời gian) nằm trong khoảng, None là không giới hạn
+        """
+        self.field = field
+        self.low = low
+        self.high = high
+        self.low_inclusive = low_inclusive
+        self.high_inclusive = high_inclusive
+        self.key_func = SORT_KEYS[field]
+
+    def matches(self, customer, planner):
+        """
+        Kiểm tra khách hàng thỏa điều kiện
+        """
+        key = self.key_func(customer)
+        if key is None:
+            return False
+        if self.low is not None and (key < self.low if self.low_inclusive else key <= self.low):
+            return False
+        if self.high is not None and (key > self.high if self.high_inclusive else key >= self.high):
+            return False
+        return True
+
+    def plan(self, planner):
+        """
+        Dùng chỉ mục sắp xếp: đếm bằng bisect, ID lấy theo thứ tự tăng dần của giá trị
+        """
+        index = planner.sorted_index(self.field)
+        bounds = (self.low, self.high, self.low_inclusive, self.high_inclusive)
+        return index.count(*bounds), lambda: index.range_ids(*bounds)
+
+    def to_sql(self):
+        """
+        Điều kiện SQL tương ứng
+        """
+        conditions = [f"{self.field} IS NOT NULL"]
+        params = []
+        if self.low is not None:
+            conditions.append(f"{self.field} {'>=' if self.low_inclusive else '>'} ?")
+            params.append(self.low)
+        if self.high is not None:
+            conditions.append(f"{self.field} {'<=' if self.high_inclusive else '<'} ?")
+            params.append(self.high)
+        return " AND ".join(conditions), params
+
+class AndNode:
+    COST = 3
+
+    def __init__(self, children):
+        """
+        Tất cả điều kiện con đều phải thỏa, được kiểm tra theo thứ tự chi phí tăng dần
+        """
+        self.children = sorted(children, key=lambda child: child.COST)
+
+    def matches(self, customer, planner):
+        """
+        Kiểm tra khách hàng thỏa điều kiện
+        """
+        return all(child.matches(customer, planner) for child in self.children)
+
+    def plan(self, planner):
+        """
+        Chọn điều kiện con dùng được chỉ mục và có ít ứng viên nhất,
+        các điều kiện còn lại được kiểm tra trên từng ứng viên
+        """
+        plans = [plan for plan in (child.plan(planner) for child in self.children) if plan is not None]
+        if not plans:
+            return None
+        return min(plans, key=lambda plan: plan[0])
+
+    def to_sql(self):
+        """
+        Điều kiện SQL tương ứng
+        """
+        if not self.children:
+            return "1", []
+        parts = [child.to_sql() for child in self.children]
+        return " AND ".join(f"({sql})" for sql, _ in parts), [param for _, params in parts for param in params]
+
+class OrNode:
+    COST = 3
+
+    def __init__(self, children):
+        """
+        Ít nhất một điều kiện con phải thỏa
+        """
+        self.children = children
+
+    def matches(self, customer, planner):
+        """
+        Kiểm tra khách hàng thỏa điều kiện
+        """
+        return any(child.matches(customer, planner) for child in self.children)
+
+    def plan(self, planner):
+        """
+        Chỉ dùng chỉ mục khi mọi điều kiện con đều dùng được, ứng viên là hợp các kết quả
+        """
+        plans = []
+        for child in self.children:
+            plan = child.plan(planner)
+            if plan is None:
+                return None
+            plans.append(plan)
+
+        def fetch():
+            seen = set()
+            for customer_id in chain.from_iterable(fetch_ids() for _, fetch_ids in plans):
+                if customer_id not in seen:
+                    seen.add(customer_id)
+                    yield customer_id
+        return sum(count for count, _ in plans), fetch
+
+    def to_sql(self):
+        """
+        Điều kiện SQL tương ứng
+        """
+        parts = [child.to_sql() for child in self.children]
+        return " OR ".join(f"({sql})" for sql, _ in parts), [param for _, params in parts for param in params]
+
+class NotNode:
+    COST = 3
+
+    def __init__(self, child):
+        """
+        Phủ định điều kiện con
+        """
+        self.child = child
+
+    def matches(self, customer, planner):
+        """
+        Kiểm tra khách hàng thỏa điều kiện
+        """
+        return not self.child.matches(customer, planner)
+
+    def plan(self, planner):
+        """
+        Phủ định không dùng được chỉ mục
+        """
+        return None
+
+    def to_sql(self):
+        """
+        Điều kiện SQL tương ứng
+        """
+        sql, params = self.child.to_sql()
+        return f"NOT ({sql})", params
+
+def parse_bounds(text):
+    """
+    Tách giá trị khoảng: "a..b", ">=a", ">a", "<=b", "<b" hoặc "a" (bằng)
+    Trả về (low, high, low_inclusive, high_inclusive) dạng chuỗi
+    """
+    if ".." in text:
+        low, high = text.split("..", 1)
+        return low or None, high or None, True, True
+    for operator in (">=", "<=", ">", "<"):
+        if text.startswith(operator):
+            value = text[len(operator):]
+            if operator.startswith(">"):
+                return value, None, operator == ">=", True
+            return None, value, True, operator == "<="
+    return text, text, True, True
+
+def make_age_term(text):
+    """
+    Tạo điều kiện tuổi, ví dụ age:25..35, age:>=18, age:30
+    """
+    low, high, low_inclusive, high_inclusive = parse_bounds(text)
+    try:
+        low = int(low) if low is not None else None
+        high = int(high) if high is not None else None
+    except ValueError:
+        raise ValueError(f"Tuổi không hợp lệ: {text}")
+    return RangeTerm("age", low, high, low_inclusive, high_inclusive)
+
+def make_date_term(field, text):
+    """
+    Tạo điều kiện thời gian, ví dụ created:>=2025-06-01, created:2025-06, created:2025-01..2025-03
+    Mỗi mốc là một tiền tố thời gian: "2025-06" bao gồm cả tháng 6
+    """
+    low, high, low_inclusive, high_inclusive = parse_bounds(text.replace("T", " "))
+    for value in (low, high):
+        if value is not None and not DATE_RE.fullmatch(value):
+            raise ValueError(f"Thời gian không hợp lệ: {text} (định dạng YYYY-MM-DD)")
+    # Đổi mốc tiền tố thành khoảng trên chuỗi: "> 2025-06" là sau mọi thời điểm của tháng 6,
+    # "<= 2025-06" là tới hết tháng 6
+    if low is not None and not low_inclusive:
+        low, low_inclusive = low + PREFIX_END, True
+    if high is not None and high_inclusive:
+        high = high + PREFIX_END
+    return RangeTerm(field, low, high, low_inclusive, high_inclusive)
+
+def make_term(token):
+    """
+    Tạo điều kiện từ một token: field:giá_trị hoặc từ khóa tìm trên mọi trường
+    """
+    name, separator, value = token.partition(":")
+    field = FIELD_ALIASES.get(normalize_text(name)) if separator else None
+    if field is None:
+        if separator and not token.startswith('"'):
+            raise ValueError(f"Không có trường '{name}' (các trường: {', '.join(sorted(set(FIELD_ALIASES.values())))})")
+        return TextTerm(None, token.strip('"'))
+
+    value = value.strip('"').strip()
+    if not value:
+        raise ValueError(f"Thiếu giá trị cho trường '{name}'")
+    if field == "id":
+        return IdTerm(value)
+    if field == "gender":
+        return GenderTerm(value)
+    if field == "age":
+        return make_age_term(value)
+    if field in DATE_FIELDS:
+        return make_date_term(field, value)
+    return TextTerm(field, value)
+
+class QueryParser:
+    def __init__(self, text):
+        """
+        Phân tích truy vấn thành cây điều kiện
+        Các điều kiện viết liền nhau là AND, OR nối hai nhóm điều kiện,
+        dấu - ở đầu là phủ định, dấu ngoặc để nhóm
+        """
+        self.tokens = TOKEN_RE.findall(text)
+        self.position = 0
+
+    def peek(self):
+        """
+        Token hiện tại, None nếu đã hết
+        """
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self):
+        """
+        Lấy token hiện tại và chuyển sang token tiếp theo
+        """
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        """
+        Phân tích toàn bộ truy vấn
+        """
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"Token không hợp lệ: {self.peek()}")
+        return node
+
+    def parse_or(self):
+        """
+        nhóm (OR nhóm)*
+        """
+        children = [self.parse_and()]
+        while self.peek() in ("OR", "|"):
+            self.next()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else OrNode(children)
+
+    def parse_and(self):
+        """
+        điều_kiện điều_kiện ... (AND viết rõ cũng được chấp nhận)
+        """
+        children = []
+        while self.peek() not in (None, ")", "OR", "|"):
+            if self.peek() == "AND":
+                self.next()
+                continue
+            children.append(self.parse_unary())
+        if not children:
+            raise ValueError("Thiếu điều kiện trong truy vấn")
+        return children[0] if len(children) == 1 else AndNode(children)
+
+    def parse_unary(self):
+        """
+        -điều_kiện, (nhóm) hoặc một điều kiện đơn
+        """
+        token = self.next()
+        if token == "-" or token == "NOT":
+            return NotNode(self.parse_unary())
+        if token == "(":
+            node = self.parse_or()
+            if self.next() != ")":
+                raise ValueError("Thiếu dấu ')' trong truy vấn")
+            return node
+        if token.startswith("-") and len(token) > 1:
+            return NotNode(make_term(token[1:]))
+        return make_term(token)
+
+def uses_text_index(tree):
+    """
+    Kiểm tra kế hoạch của cây điều kiện có cần đến chỉ mục trigram không
+    (có điều kiện chứa chuỗi đủ dài nằm ngoài phép phủ định)
+    """
+    if isinstance(tree, TextTerm):
+        return len(tree.value) >= NGRAM_SIZE
+    if isinstance(tree, (AndNode, OrNode)):
+        return any(uses_text_index(child) for child in tree.children)
+    return False
+
+def parse_query(text):
+    """
+    Phân tích truy vấn, ví dụ: gender:Nữ age:25..35 address:colorado created:>=2025-06-01
+    Báo ValueError nếu truy vấn sai cú pháp
+    """
+    if not text or not text.strip():
+        return AndNode([])
+    return QueryParser(text).parse()
+
+class QueryPlanner:
+    def __init__(self, customer_manager):
+        """
+        Thực thi cây điều kiện trên dữ liệu trong bộ nhớ của CustomerManager
+        Chọn chỉ mục có ít ứng viên nhất (bảng băm ID, trigram, chỉ mục sắp xếp theo tuổi/thời gian),
+        sau đó kiểm tra toàn bộ điều kiện trên từng ứng viên; không có chỉ mục thì quét toàn bộ
+        Chỉ mục sắp xếp chỉ được dựng khi cần và được cập nhật theo các thay đổi của CustomerManager
+        """
+        self.customer_manager = customer_manager
+        self.sorted_indexes = {}
+        self.synced_generation = None
+        customer_manager.add_change_listener(self.on_changes)
+
+    def on_changes(self, entries):
+        """
+        Cập nhật các chỉ mục sắp xếp đã dựng theo thay đổi, dựng lại khi không theo kịp
+        (tải lại dữ liệu, hoàn tác giao dịch)
+        """
+        if entries is None or self.synced_generation != self.customer_manager.generation - 1:
+            self.sorted_indexes = {}
+        elif self.sorted_indexes:
+            # Chỉ giữ trạng thái cuối cùng của mỗi khách hàng
+            changes = {}
+            for entry in entries:
+                if entry.get("op") == "delete":
+                    changes[str(entry["id"])] = None
+                else:
+                    changes[str(entry["record"].get("id", ""))] = entry["record"]
+            for index in self.sorted_indexes.values():
+                index.update_many(changes)
+        self.synced_generation = self.customer_manager.generation
+
+    def sorted_index(self, field):
+        """
+        Lấy chỉ mục sắp xếp theo trường, dựng lần đầu khi cần
+        """
+        if self.synced_generation != self.customer_manager.generation:
+            self.sorted_indexes = {}
+            self.synced_generation = self.customer_manager.generation
+        index = self.sorted_indexes.get(field)
+        if index is None:
+            index = SortedIndex(SORT_KEYS[field])
+            index.build(self.customer_manager.get_all_customers())
+            self.sorted_indexes[field] = index
+        return index
+
+    def find_id(self, value):
+        """
+        Tra ID chính xác trong bảng băm
+        """
+        return self.customer_manager.search_index.find_id(value)
+
+    def text_estimate(self, normalized_value):
+        """
+        Ước lượng số ứng viên theo chỉ mục trigram, None nếu chuỗi quá ngắn
+        """
+        return self.customer_manager.search_index.estimate(normalized_value)
+
+    def text_candidates(self, normalized_value):
+        """
+        Danh sách ID có thể chứa chuỗi theo chỉ mục trigram, theo thứ tự thêm vào
+        """
+        search_index = self.customer_manager.search_index
+        sequence = search_index.sequence
+        return sorted(search_index.candidates(normalized_value),
+                      key=lambda customer_id: sequence.get(customer_id, 0))
+
+    def search_text(self, customer):
+        """
+        Chuỗi tìm kiếm đã chuẩn hóa của khách hàng (lấy từ chỉ mục nếu có)
+        """
+        text = self.customer_manager.search_index.texts.get(str(customer.get("id", "")))
+        return text if text is not None else build_search_text(customer)
+
+    def execute(self, tree):
+        """
+        Trả về iterator các khách hàng thỏa điều kiện, việc lập kế hoạch và kiểm tra
+        chỉ diễn ra khi lấy kết quả nên giao diện có thể lấy từng trang
+        """
+        plan = tree.plan(self)
+        if plan is None:
+            # Sao chép danh sách để việc xóa (đổi chỗ với phần tử cuối) không làm bỏ sót khách hàng
+            for customer in list(self.customer_manager.get_all_customers()):
+                if tree.matches(customer, self):
+                    yield customer
+            return
+
+        customer_index = self.customer_manager.customer_index
+        for customer_id in plan[1]():
+            customer = customer_index.get(customer_id)
+            if customer is not None and tree.matches(customer, self):
+                yield customer
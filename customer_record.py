@@ -0,0 +1,154 @@
+import sys
+from collections.abc import MutableMapping
+
+# Các trường cố định của khách hàng, mỗi trường là một slot thay vì một khóa trong dict
+CUSTOMER_FIELDS = ("id", "name", "email", "phone", "address", "gender", "age",
+                   "picture", "created_at", "updated_at")
+FIELD_SET = frozenset(CUSTOMER_FIELDS)
+
+# Các trường có nhiều giá trị lặp lại giữa các khách hàng, được intern để dùng chung một chuỗi
+INTERNED_FIELDS = ("gender", "picture", "created_at", "updated_at")
+
+class MissingType:
+    def __reduce__(self):
+        """
+        Khi pickle chỉ lưu tên biến MISSING để lúc đọc lại vẫn là cùng một đối tượng
+        """
+        return "MISSING"
+
+# Giá trị đánh dấu trường không có trong bản ghi (khác với giá trị None)
+MISSING = MissingType()
+
+class CustomerRecord(MutableMapping):
+    __slots__ = CUSTOMER_FIELDS + ("extra",)
+
+    def __init__(self, data=()):
+        """
+        Bản ghi khách hàng gọn nhẹ dùng __slots__ thay cho dict
+        Vẫn dùng được như dict (get, [], in, keys, items, dict(record)...) nên giao diện không cần thay đổi
+        Các trường ngoài CUSTOMER_FIELDS được lưu trong dict extra (chỉ tạo khi cần)
+        data là dict hoặc danh sách cặp (khóa, giá trị)
+        """
+        for field in CUSTOMER_FIELDS:
+            setattr(self, field, MISSING)
+        self.extra = None
+        items = data.items() if hasattr(data, "items") else data
+        for key, value in items:
+            self[key] = value
+
+    @classmethod
+    def from_mapping(cls, data):
+        """
+        Chuyển dict thành CustomerRecord (giữ nguyên nếu đã là CustomerRecord)
+        """
+        if isinstance(data, cls):
+            return data
+        return cls(data)
+
+    def __getitem__(self, key):
+        """
+        Lấy giá trị theo khóa, báo KeyError nếu không có
+        """
+        if key in FIELD_SET:
+            value = getattr(self, key)
+            if value is MISSING:
+                raise KeyError(key)
+            return value
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def get(self, key, default=None):
+        """
+        Lấy giá trị theo khóa, trả về default nếu không có (nhanh hơn bản mặc định của Mapping)
+        """
+        if key in FIELD_SET:
+            value = getattr(self, key)
+            return default if value is MISSING else value
+        if self.extra is None:
+            return default
+        return self.extra.get(key, default)
+
+    def __setitem__(self, key, value):
+        """
+        Gán giá trị, các chuỗi lặp lại nhiều được intern
+        """
+        if key in FIELD_SET:
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        """
+        Xóa một khóa khỏi bản ghi
+        """
+        if key in FIELD_SET:
+            if getattr(self, key) is MISSING:
+                raise KeyError(key)
+            setattr(self, key, MISSING)
+        elif self.extra is not None and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        """
+        Kiểm tra bản ghi có khóa cho trước không
+        """
+        if key in FIELD_SET:
+            return getattr(self, key) is not MISSING
+        return self.extra is not None and key in self.extra
+
+    def __iter__(self):
+        """
+        Duyệt các khóa đang có theo thứ tự cố định rồi tới các khóa phụ
+        """
+        for field in CUSTOMER_FIELDS:
+            if getattr(self, field) is not MISSING:
+                yield field
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        """
+        Số khóa đang có trong bản ghi
+        """
+        count = sum(1 for field in CUSTOMER_FIELDS if getattr(self, field) is not MISSING)
+        return count + (len(self.extra) if self.extra else 0)
+
+    def __eq__(self, other):
+        """
+        So sánh như dict
+        """
+        if isinstance(other, MutableMapping):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        """
+        Hiển thị như dict
+        """
+        return f"CustomerRecord({dict(self.items())!r})"
+
+    def __reduce__(self):
+        """
+        Pickle gọn: chỉ lưu bộ giá trị theo thứ tự slot (dùng cho cache nhị phân)
+        """
+        values = tuple(getattr(self, field) for field in CUSTOMER_FIELDS)
+        return (restore_record, (values, self.extra))
+
+def restore_record(values, extra):
+    """
+    Tạo lại CustomerRecord từ dữ liệu pickle
+    """
+    record = CustomerRecord.__new__(CustomerRecord)
+    for field, value in zip(CUSTOMER_FIELDS, values):
+        if field in INTERNED_FIELDS and type(value) is str:
+            value = sys.intern(value)
+        setattr(record, field, value)
+    record.extra = extra
+    return record
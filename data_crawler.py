@@ -1,15 +1,21 @@
 import requests
-import json
-import os
-import random
+import threading
 from datetime import datetime
+import config
+from customer_manager import CustomerManager
+from portrait_prefetch import prefetch_portraits
 
 class DataCrawler:
-    def __init__(self, customers_file="customers.json"):
+    def __init__(self, customers_file="customers.json", customer_manager=None, portrait_cache=None):
         """
         Khởi tạo DataCrawler để lấy dữ liệu mẫu từ API
+        Nếu có customer_manager thì dữ liệu mới được ghi qua nhật ký của nó
+        Nếu có portrait_cache (PortraitCache) thì ảnh chân dung của mỗi lô được tải trước vào cache
+        (khi bật config.PREFETCH_PORTRAITS)
         """
         self.customers_file = customers_file
+        self.customer_manager = customer_manager
+        self.portrait_cache = portrait_cache
         self.api_url = "https://randomuser.me/api/"
     
     def convert_gender(self, gender):
@@ -69,9 +75,19 @@ class DataCrawler:
         # Tạo email mới với domain gmail.com
         return f"{local_part}@gmail.com"
     
+    def get_customer_manager(self):
+        """
+        Lấy CustomerManager dùng chung (tạo mới nếu chưa được truyền vào)
+        """
+        if self.customer_manager is None:
+            self.customer_manager = CustomerManager(self.customers_file)
+        return self.customer_manager
+    
     def fetch_random_users(self, count=10):
         """
-        Lấy dữ liệu người dùng ngẫu nhiên từ API randomuser.me
+        Lấy dữ liệu người dùng ngẫu nhiên từ API randomuser.me (có thể chạy trên luồng riêng)
+        Chỉ tải và định dạng dữ liệu, chưa cấp ID và chưa lưu: save_customers phải được gọi
+        trên luồng giao diện vì nó thay đổi dữ liệu dùng chung của CustomerManager
         """
         try:
             print(f"Đang lấy {count} khách hàng ngẫu nhiên từ API...")
@@ -81,21 +97,10 @@ class DataCrawler:
                 data = response.json()
                 
                 # Chuyển đổi dữ liệu từ API sang định dạng khách hàng
+                users = data.get("results", [])
                 customers = []
-                for user in data.get("results", []):
-                    # Tạo ID duy nhất cho khách hàng mới theo định dạng KHxxxx
-                    timestamp = str(int(datetime.now().timestamp()))
-                    last_four = timestamp[-4:] if len(timestamp) >= 4 else timestamp.zfill(4)
-                    customer_id = f"KH{last_four}"
-                    
-                    # Kiểm tra xem ID đã tồn tại chưa
-                    while any(customer.get("id") == customer_id for customer in customers):
-                        # Nếu ID đã tồn tại, tạo ID mới bằng cách thêm số ngẫu nhiên
-                        last_four = str(random.randint(1000, 9999))
-                        customer_id = f"KH{last_four}"
-                    
+                for user in users:
                     customer = {
-                        "id": customer_id,
                         "name": f"{user['name']['first']} {user['name']['last']}",
                         "email": self.format_email(user["email"]),
                         "phone": self.format_phone_number(user["phone"]),
@@ -107,9 +112,6 @@ class DataCrawler:
                     }
                     customers.append(customer)
                 
-                # Lưu danh sách khách hàng vào file JSON
-                self.save_customers(customers)
-                
                 print(f"Đã lấy thành công {len(customers)} khách hàng.")
                 return True, customers
             else:
@@ -117,28 +119,47 @@ class DataCrawler:
         except Exception as e:
             return False, f"Lỗi khi lấy dữ liệu: {e}"
     
+    def start_prefetch(self, customers):
+        """
+        Tải trước ảnh chân dung của lô khách hàng trên một luồng nền, không chờ tải xong
+        (gọi sau khi đã lưu và báo kết quả nhập dữ liệu), trả về luồng tải hoặc None
+        """
+        if self.portrait_cache is None or not config.PREFETCH_PORTRAITS:
+            return None
+        thread = threading.Thread(target=self.prefetch_pictures, args=(list(customers),),
+                                  name="portrait-prefetch", daemon=True)
+        thread.start()
+        return thread
+    
+    def prefetch_pictures(self, customers):
+        """
+        Tải trước ảnh chân dung (ảnh gốc và bản thu nhỏ) của lô khách hàng vào cache đĩa
+        Lỗi tải ảnh không làm hỏng việc nhập dữ liệu: ảnh lỗi sẽ được tải lại khi xem
+        """
+        if self.portrait_cache is None or not config.PREFETCH_PORTRAITS:
+            return 0
+        urls = [customer.get("picture") for customer in customers]
+        try:
+            loaded, failed = prefetch_portraits(urls, self.portrait_cache)
+        except Exception as e:
+            print(f"Lỗi khi tải trước ảnh khách hàng: {e}")
+            return 0
+        print(f"Đã tải trước {loaded} ảnh khách hàng.")
+        if failed:
+            print(f"Không tải được {len(failed)} ảnh khách hàng.")
+        return loaded
+    
     def save_customers(self, customers):
         """
-        Lưu danh sách khách hàng vào file JSON
+        Cấp ID cho cả lô và lưu danh sách khách hàng mới qua nhật ký thay đổi của CustomerManager
+        (gọi trên luồng giao diện)
         """
-        existing_customers = []
-        
-        # Đọc file JSON hiện tại nếu có
-        if os.path.exists(self.customers_file):
-            try:
-                with open(self.customers_file, 'r', encoding='utf-8') as file:
-                    existing_customers = json.load(file)
-            except Exception as e:
-                print(f"Lỗi khi đọc file {self.customers_file}: {e}")
-        
-        # Thêm khách hàng mới vào danh sách hiện tại
-        merged_customers = existing_customers + customers
-        
-        # Lưu lại file JSON
         try:
-            with open(self.customers_file, 'w', encoding='utf-8') as file:
-                json.dump(merged_customers, file, ensure_ascii=False, indent=4)
-            return True
+            customer_manager = self.get_customer_manager()
+            # Cấp ID cho cả lô bằng bộ cấp phát dùng chung với CustomerManager
+            customer_ids = customer_manager.id_allocator.allocate_many(len(customers))
+            customers = [{"id": customer_id, **customer} for customer, customer_id in zip(customers, customer_ids)]
+            return customer_manager.import_customers(customers)
         except Exception as e:
             print(f"Lỗi khi lưu file {self.customers_file}: {e}")
-            return False 
\ No newline at end of file
+            return False
\ No newline at end of file
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from safe_writer import atomic_write_json
+
+class IdAllocator:
+    def __init__(self, prefix="KH", width=4, state_file=None):
+        """
+        Khởi tạo bộ cấp phát ID tăng dần theo định dạng <prefix><số>
+        Số có ít nhất width chữ số (KH0001 ... KH9999, sau đó KH10000 ...)
+        nên vẫn tương thích với các ID KHxxxx đã có
+        Mốc cao nhất đã cấp (high-water mark) được lưu vào state_file
+        để ID của khách hàng đã xóa không bị cấp lại
+        """
+        self.prefix = prefix
+        self.width = width
+        self.state_file = state_file
+        self.used = set()
+        self.high_water = 0
+        self.saved_high_water = 0
+        self.lock = threading.Lock()
+        self.load_state()
+
+    def load_state(self):
+        """
+        Đọc mốc cao nhất đã lưu
+        """
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as file:
+                self.saved_high_water = int(json.load(file).get("high_water", 0))
+            self.high_water = max(self.high_water, self.saved_high_water)
+        except Exception as e:
+            print(f"Lỗi khi đọc file {self.state_file}: {e}")
+
+    def save_state(self):
+        """
+        Lưu mốc cao nhất đã cấp nếu có thay đổi (ghi an toàn qua file tạm + đổi tên)
+        """
+        if not self.state_file or self.high_water == self.saved_high_water:
+            return True
+        try:
+            high_water = self.high_water
+            atomic_write_json(self.state_file, {"high_water": high_water})
+            self.saved_high_water = high_water
+            return True
+        except Exception as e:
+            print(f"Lỗi khi lưu file {self.state_file}: {e}")
+            return False
+
+    def parse_number(self, item_id):
+        """
+        Lấy phần số của ID, trả về None nếu ID không theo định dạng của bộ cấp phát
+        """
+        item_id = str(item_id)
+        if item_id.startswith(self.prefix):
+            number = item_id[len(self.prefix):]
+            if number.isdigit():
+                return int(number)
+        return None
+
+    def format_id(self, number):
+        """
+        Tạo ID từ phần số
+        """
+        return f"{self.prefix}{number:0{self.width}d}"
+
+    def reset(self, ids=(), high_water=0):
+        """
+        Nạp lại tập ID đang dùng, mốc cao nhất không bao giờ giảm
+        """
+        with self.lock:
+            self.used = set()
+            self.high_water = max(high_water, self.saved_high_water)
+            for item_id in ids:
+                self.register_unlocked(item_id)
+
+    def restore(self, ids, high_water):
+        """
+        Nạp lại tập ID đang dùng cùng mốc cao nhất đã biết (ví dụ từ cache),
+        không cần phân tích từng ID
+        """
+        with self.lock:
+            self.used = set(ids)
+            self.high_water = max(high_water, self.saved_high_water)
+
+    def register(self, item_id):
+        """
+        Ghi nhận một ID đã được sử dụng
+        """
+        with self.lock:
+            self.register_unlocked(item_id)
+
+    def register_unlocked(self, item_id):
+        """
+        Ghi nhận ID khi đã giữ khóa
+        """
+        item_id = str(item_id)
+        self.used.add(item_id)
+        number = self.parse_number(item_id)
+        if number is not None and number > self.high_water:
+            self.high_water = number
+
+    def release(self, item_id):
+        """
+        Bỏ ghi nhận ID khi bản ghi bị xóa (ID vẫn không được cấp lại)
+        """
+        with self.lock:
+            self.used.discard(str(item_id))
+
+    def exists(self, item_id):
+        """
+        Kiểm tra ID đã được sử dụng chưa
+        """
+        return str(item_id) in self.used
+
+    def allocate(self):
+        """
+        Cấp một ID mới
+        """
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        """
+        Cấp nhiều ID mới, mỗi ID tốn thời gian hằng số
+        """
+        with self.lock:
+            ids = []
+            number = self.high_water
+            while len(ids) < count:
+                number += 1
+                item_id = self.format_id(number)
+                if item_id in self.used:
+                    continue
+                self.used.add(item_id)
+                ids.append(item_id)
+            self.high_water = number
+            return ids
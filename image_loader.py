@@ -0,0 +1,211 @@
+import queue
+import threading
+import time
+from PIL import ImageTk
+import config
+from lru_cache import LRUCache
+from portrait_cache import load_thumbnail
+
+def photo_bytes(photo):
+    """
+    Dung lượng bộ nhớ ước tính của PhotoImage (4 byte mỗi điểm ảnh)
+    """
+    return photo.width() * photo.height() * 4
+
+class ImageRequest:
+    def __init__(self, key, callback, owner, deadline):
+        """
+        Một yêu cầu tải hình ảnh của giao diện
+        callback(photo, error) được gọi trên luồng giao diện: photo là PhotoImage hoặc None,
+        error là thông báo lỗi hoặc None
+        owner là cửa sổ yêu cầu (dùng để hủy mọi yêu cầu khi cửa sổ đóng)
+        """
+        self.key = key
+        self.callback = callback
+        self.owner = owner
+        self.deadline = deadline
+        self.cancelled = False
+
+class ImageLoader:
+    def __init__(self, root, workers=None, timeout=None, poll_ms=None, disk_cache=None):
+        """
+        Dịch vụ tải hình ảnh từ URL bằng một nhóm luồng có số lượng cố định
+        - Các yêu cầu cùng URL và kích thước dùng chung một lần tải
+        - Mỗi yêu cầu có thời hạn (timeout giây), quá hạn sẽ nhận lỗi
+        - Yêu cầu có thể bị hủy (ví dụ khi đóng cửa sổ), kết quả khi đó bị bỏ qua
+        - Luồng tải chỉ tải và thu nhỏ ảnh, PhotoImage được tạo và giao cho giao diện trên
+          luồng giao diện: kết quả đi qua hàng đợi được root.after kiểm tra định kỳ
+        - Nếu có disk_cache (PortraitCache) thì ảnh gốc và bản thu nhỏ được lưu trên đĩa,
+          các lần mở sau không cần tải lại qua mạng
+        """
+        self.root = root
+        self.disk_cache = disk_cache
+        self.timeout = timeout if timeout is not None else config.IMAGE_LOAD_TIMEOUT
+        self.poll_ms = poll_ms if poll_ms is not None else config.IMAGE_POLL_MS
+        self.lock = threading.Lock()
+        # (url, kích thước) -> danh sách yêu cầu đang chờ lần tải đó
+        self.jobs = {}
+        self.work_queue = queue.Queue()
+        self.result_queue = queue.Queue()
+        # Ảnh đã giải mã: (url, kích thước) -> PhotoImage, giới hạn số ảnh và dung lượng
+        self.cache = LRUCache(max_entries=config.PHOTO_CACHE_MAX_ENTRIES,
+                              max_bytes=config.PHOTO_CACHE_MAX_BYTES, size_func=photo_bytes)
+        self.poll_id = None
+        self.closed = False
+        self.workers = []
+        for index in range(workers if workers is not None else config.IMAGE_LOADER_WORKERS):
+            worker = threading.Thread(target=self.run_worker, name=f"image-loader-{index}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def load(self, url, callback, size=(150, 150), owner=None):
+        """
+        Yêu cầu tải ảnh (gọi trên luồng giao diện), trả về ImageRequest để có thể hủy
+        Nếu ảnh đã có trong cache thì callback được gọi ngay và trả về None
+        """
+        key = (url, tuple(size))
+        photo = self.cache.get(key)
+        if photo is not None:
+            callback(photo, None)
+            return None
+
+        request = ImageRequest(key, callback, owner, time.monotonic() + self.timeout)
+        with self.lock:
+            requests = self.jobs.get(key)
+            if requests is None:
+                # Chưa có lần tải nào cho ảnh này: đưa vào hàng đợi của nhóm luồng
+                self.jobs[key] = [request]
+                self.work_queue.put(key)
+            else:
+                requests.append(request)
+        self.schedule_poll()
+        return request
+
+    def cancel(self, request):
+        """
+        Hủy một yêu cầu, callback sẽ không được gọi
+        """
+        if request is not None:
+            request.cancelled = True
+
+    def cancel_owner(self, owner):
+        """
+        Hủy mọi yêu cầu của một cửa sổ (gọi khi cửa sổ bị đóng)
+        """
+        with self.lock:
+            for requests in self.jobs.values():
+                for request in requests:
+                    if request.owner is owner:
+                        request.cancelled = True
+
+    def has_waiting_requests(self, key):
+        """
+        Kiểm tra lần tải còn yêu cầu nào chưa bị hủy không, bỏ lần tải nếu không còn
+        """
+        with self.lock:
+            requests = self.jobs.get(key, [])
+            if any(not request.cancelled for request in requests):
+                return True
+            self.jobs.pop(key, None)
+            return False
+
+    def run_worker(self):
+        """
+        Vòng lặp của luồng tải: lấy ảnh cần tải từ hàng đợi, tải và thu nhỏ,
+        đưa kết quả vào hàng đợi kết quả
+        """
+        while True:
+            key = self.work_queue.get()
+            if key is None:
+                return
+            if not self.has_waiting_requests(key):
+                continue
+            url, size = key
+            try:
+                self.result_queue.put((key, self.fetch(url, size), None))
+            except Exception as e:
+                self.result_queue.put((key, None, str(e)))
+
+    def fetch(self, url, size):
+        """
+        Lấy ảnh đã thu nhỏ theo kích thước yêu cầu (chạy trên luồng tải)
+        """
+        return load_thumbnail(url, size, self.disk_cache, self.timeout)
+
+    def schedule_poll(self):
+        """
+        Lên lịch kiểm tra kết quả nếu chưa có lịch (chỉ kiểm tra khi còn yêu cầu đang chờ)
+        """
+        if self.poll_id is None and not self.closed:
+            self.poll_id = self.root.after(self.poll_ms, self.poll)
+
+    def poll(self):
+        """
+        Nhận kết quả từ các luồng tải và giao cho giao diện (chạy trên luồng giao diện)
+        """
+        self.poll_id = None
+        while True:
+            try:
+                key, image, error = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            with self.lock:
+                requests = self.jobs.pop(key, [])
+            photo = None
+            if image is not None:
+                # PhotoImage phải được tạo trên luồng giao diện
+                photo = ImageTk.PhotoImage(image)
+                self.cache.put(key, photo)
+            for request in requests:
+                self.deliver(request, photo, error)
+
+        self.expire_requests()
+        with self.lock:
+            waiting = bool(self.jobs)
+        if waiting:
+            self.schedule_poll()
+
+    def expire_requests(self):
+        """
+        Báo lỗi cho các yêu cầu đã quá thời hạn mà chưa có kết quả
+        """
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            for requests in self.jobs.values():
+                for request in requests:
+                    if not request.cancelled and request.deadline <= now:
+                        expired.append(request)
+        for request in expired:
+            self.deliver(request, None, "Hết thời gian tải hình ảnh")
+            request.cancelled = True
+
+    def deliver(self, request, photo, error):
+        """
+        Gọi callback của yêu cầu nếu chưa bị hủy
+        """
+        if request.cancelled:
+            return
+        try:
+            request.callback(photo, error)
+        except Exception as e:
+            print(f"Lỗi khi hiển thị hình ảnh: {e}")
+
+    def shutdown(self):
+        """
+        Hủy mọi yêu cầu và dừng các luồng tải (gọi khi đóng ứng dụng)
+        """
+        self.closed = True
+        with self.lock:
+            for requests in self.jobs.values():
+                for request in requests:
+                    request.cancelled = True
+            self.jobs.clear()
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        for _ in self.workers:
+            self.work_queue.put(None)
+        if self.disk_cache is not None:
+            # Lưu thứ tự dùng ảnh của cache đĩa
+            self.disk_cache.flush()
@@ -0,0 +1,75 @@
+import json
+import os
+from safe_writer import append_durable, json_default, truncate_partial_line
+
+class ChangeJournal:
+    def __init__(self, journal_file):
+        """
+        Khởi tạo nhật ký thay đổi (write-ahead journal) dạng append-only
+        Mỗi thay đổi được ghi thành một dòng JSON gọn
+        """
+        self.journal_file = journal_file
+        self.entry_count = 0
+
+    def append(self, entry):
+        """
+        Ghi thêm một bản ghi thay đổi vào cuối nhật ký
+        """
+        return self.append_many([entry])
+
+    def append_many(self, entries):
+        """
+        Ghi thêm nhiều bản ghi thay đổi trong một lần ghi file (fsync trước khi trả về)
+        """
+        if not entries:
+            return True
+
+        lines = "".join(
+            json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=json_default) + "\n"
+            for entry in entries
+        )
+        try:
+            append_durable(self.journal_file, lines)
+            self.entry_count += len(entries)
+            return True
+        except Exception as e:
+            print(f"Lỗi khi ghi nhật ký {self.journal_file}: {e}")
+            return False
+
+    def replay(self):
+        """
+        Đọc lần lượt các bản ghi thay đổi trong nhật ký
+        Dòng cuối bị ghi dở (do sự cố) được cắt khỏi file để bản ghi tiếp theo không bị nối vào
+        """
+        self.entry_count = 0
+        if not os.path.exists(self.journal_file):
+            return
+        removed = truncate_partial_line(self.journal_file)
+        if removed:
+            print(f"Đã bỏ {removed} byte ghi dở ở cuối nhật ký {self.journal_file}")
+
+        with open(self.journal_file, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as je:
+                    print(f"Bỏ qua dòng nhật ký lỗi {line_number} trong {self.journal_file}: {je}")
+                    continue
+                self.entry_count += 1
+                yield entry
+
+    def clear(self):
+        """
+        Xóa toàn bộ nhật ký sau khi đã gộp vào file dữ liệu chính
+        """
+        try:
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self.entry_count = 0
+            return True
+        except Exception as e:
+            print(f"Lỗi khi xóa nhật ký {self.journal_file}: {e}")
+            return False
@@ -0,0 +1,35 @@
+import json
+import os
+from safe_writer import json_default
+
+# Số dòng giữa hai lần báo tiến trình khi đọc file
+PROGRESS_INTERVAL = 10000
+
+def dumps_record(record):
+    """
+    Chuyển một bản ghi thành một dòng JSON gọn (kết thúc bằng xuống dòng)
+    """
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=json_default) + "\n"
+
+def iter_jsonl_records(path, progress=None):
+    """
+    Đọc lần lượt từng bản ghi của file JSON Lines (mỗi dòng một bản ghi)
+    Không đọc cả file vào bộ nhớ; progress(số_byte_đã_đọc, tổng_số_byte) được gọi định kỳ
+    Dòng lỗi (ví dụ dòng cuối bị ghi dở) sẽ được bỏ qua
+    """
+    total = os.path.getsize(path)
+    done = 0
+    with open(path, 'rb') as file:
+        for line_number, line in enumerate(file, 1):
+            done += len(line)
+            if progress is not None and line_number % PROGRESS_INTERVAL == 0:
+                progress(done, total)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as je:
+                print(f"Bỏ qua dòng lỗi {line_number} trong {path}: {je}")
+    if progress is not None:
+        progress(total, total)
@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    def __init__(self, max_entries=None, max_bytes=None, size_func=None):
+        """
+        Bộ nhớ đệm LRU có giới hạn số mục (max_entries) và/hoặc tổng dung lượng (max_bytes),
+        None là không giới hạn; size_func(value) trả về dung lượng ước tính của một giá trị
+        Khi vượt giới hạn thì bỏ các mục lâu không dùng nhất
+        An toàn khi dùng từ nhiều luồng, có bộ đếm hits/misses/evictions
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_func = size_func or (lambda value: 0)
+        self.lock = threading.Lock()
+        # khóa -> (giá trị, dung lượng), theo thứ tự dùng gần nhất ở cuối
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """
+        Số mục đang có
+        """
+        return len(self.entries)
+
+    def __contains__(self, key):
+        """
+        Kiểm tra có khóa không (không tính là một lần dùng)
+        """
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key, default=None):
+        """
+        Lấy giá trị và đánh dấu vừa dùng, trả về default nếu không có
+        """
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        """
+        Thêm hoặc thay giá trị rồi bỏ bớt mục cũ nếu vượt giới hạn
+        (một giá trị lớn hơn cả giới hạn dung lượng vẫn được giữ cho tới lần thêm sau)
+        """
+        size = self.size_func(value)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while len(self.entries) > 1 and self.over_limit():
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def over_limit(self):
+        """
+        Kiểm tra có vượt giới hạn số mục hoặc dung lượng không (gọi khi đang giữ khóa)
+        """
+        if self.max_entries is not None and len(self.entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def pop(self, key, default=None):
+        """
+        Bỏ một mục, trả về giá trị của nó
+        """
+        with self.lock:
+            item = self.entries.pop(key, None)
+            if item is None:
+                return default
+            self.total_bytes -= item[1]
+            return item[0]
+
+    def clear(self):
+        """
+        Bỏ toàn bộ các mục (giữ nguyên bộ đếm)
+        """
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """
+        Thống kê hiện tại: số mục, dung lượng, số lần trúng/trượt/bị bỏ
+        """
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.total_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
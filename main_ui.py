@@ -2,13 +2,20 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
 import os
 import threading
-import shutil
 from PIL import Image, ImageTk
-import urllib.request
-import io
-from customer_manager import CustomerManager
+from itertools import islice
+import config
+from search_index import normalize_text
+from customer_query import is_structured_query, SORT_KEYS
+from customer_manager import create_customer_manager
+from customer_analytics import CustomerAnalytics
 from user_manager import UserManager
 from data_crawler import DataCrawler
+from image_loader import ImageLoader
+from portrait_cache import PortraitCache
+from avatar_store import AvatarStore, avatar_path
+from virtual_tree import VirtualTreeview, reconcile_tree
+from search_worker import SearchWorker
 
 class MainUI:
     def __init__(self, root, user_manager):
@@ -17,16 +24,41 @@ class MainUI:
         """
         self.root = root
         self.user_manager = user_manager
-        self.customer_manager = CustomerManager()
-        self.data_crawler = DataCrawler()
         
-        # Lưu trữ hình ảnh đã tải về
-        self.image_cache = {}
+        # Tải hình ảnh khách hàng bằng nhóm luồng cố định, kết quả được giao về luồng giao diện
+        # Ảnh đã tải được lưu vào cache trên đĩa để các phiên sau không phải tải lại
+        # Cache ảnh trên đĩa dùng chung cho việc hiển thị và tải trước ảnh khi nhập dữ liệu mẫu
+        self.portrait_cache = PortraitCache()
+        self.image_loader = ImageLoader(self.root, disk_cache=self.portrait_cache)
+        
+        # Trạng thái tìm kiếm khi đang gõ
+        self.search_after_id = None
+        self.search_generation = 0
+        # Một luồng tìm kiếm dùng chung, chỉ chạy lần tìm mới nhất đang chờ
+        self.search_worker = SearchWorker()
+        self.last_search_keyword = ""
+        self.last_search_results = None
+        # Thế hệ dữ liệu của CustomerManager lúc tìm ra last_search_results
+        self.last_search_data_generation = None
+        # Iterator kết quả của truy vấn có cấu trúc còn trang chưa lấy (None nếu đã hết)
+        self.query_iterator = None
+        
+        # Danh sách khách hàng đã sắp xếp, khóa (thế hệ dữ liệu, cột, chiều) tương ứng
+        # và cột đang sắp xếp (click vào tiêu đề cột để đổi)
+        self.sorted_customers = []
+        self.sorted_generation = None
+        self.sort_field = "name"
+        self.sort_descending = False
+        
+        # Giá trị đang hiển thị của từng dòng trong bảng người dùng
+        self.user_tree_values = {}
         
         # Tạo thư mục lưu hình ảnh người dùng nếu chưa có
-        self.user_images_dir = "user_images"
+        self.user_images_dir = config.USER_IMAGES_DIR
         if not os.path.exists(self.user_images_dir):
             os.makedirs(self.user_images_dir)
+        # Kho ảnh đại diện: lưu sẵn bản thu nhỏ để hiển thị không phải thu nhỏ lại
+        self.avatar_store = AvatarStore(self.user_images_dir)
         
         # Thiết lập cửa sổ chính
         self.setup_main_window()
@@ -37,6 +69,23 @@ class MainUI:
         self.create_tabs()
         self.create_customer_tab()
         self.create_user_tab()
+        self.create_stats_tab()
+        
+        # Tạo CustomerManager sau khi có giao diện để hiển thị tiến trình đọc dữ liệu
+        self.customer_manager = create_customer_manager(load_progress=self.show_load_progress)
+        self.data_crawler = DataCrawler(customer_manager=self.customer_manager,
+                                        portrait_cache=self.portrait_cache)
+        # Thống kê dạng cột, tự cập nhật theo các thay đổi của CustomerManager
+        self.analytics = CustomerAnalytics(self.customer_manager)
+        
+        # Nhận kết quả ghi file từ luồng ghi và ghi nốt dữ liệu khi đóng cửa sổ
+        # (SQLite xác nhận từng thay đổi ngay nên không có bộ ghi gộp)
+        self.save_writers = [(name, writer) for name, writer in
+                             [("khách hàng", self.customer_manager.writer), ("người dùng", self.user_manager.writer)]
+                             if writer is not None]
+        self.save_listeners = []
+        self.attach_save_listeners()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         # Tải dữ liệu ban đầu
         self.load_customers()
@@ -71,13 +120,14 @@ class MainUI:
         file_menu.add_command(label="Tải dữ liệu mẫu", command=self.load_sample_data)
         file_menu.add_separator()
         file_menu.add_command(label="Đăng xuất", command=self.logout)
-        file_menu.add_command(label="Thoát", command=self.root.quit)
+        file_menu.add_command(label="Thoát", command=self.on_closing)
         self.menu_bar.add_cascade(label="Tệp", menu=file_menu)
         
         # Menu Customer
         customer_menu = tk.Menu(self.menu_bar, tearoff=0)
         customer_menu.add_command(label="Thêm khách hàng", command=self.show_add_customer_form)
         customer_menu.add_command(label="Làm mới danh sách", command=self.load_customers)
+        customer_menu.add_command(label="Tải lại từ file", command=lambda: self.load_customers(force=True))
         self.menu_bar.add_cascade(label="Khách hàng", menu=customer_menu)
         
         # Menu User (chỉ admin mới thấy)
@@ -117,6 +167,80 @@ class MainUI:
         role_text = "Quản trị viên" if self.user_manager.is_admin() else "Người dùng"
         role_label = ttk.Label(header_frame, text=f"Vai trò: {role_text}", foreground="blue")
         role_label.pack(side=tk.RIGHT)
+        
+        # Trạng thái đọc/ghi dữ liệu
+        self.status_label = ttk.Label(header_frame, text="", foreground="gray")
+        self.status_label.pack(side=tk.RIGHT, padx=20)
+    
+    def show_load_progress(self, done, total):
+        """
+        Hiển thị tiến trình đọc file dữ liệu khách hàng
+        """
+        percent = done * 100 // total if total else 100
+        self.status_label.config(text=f"Đang tải dữ liệu khách hàng: {percent}%", foreground="gray")
+        # Vẽ lại giao diện ngay vì việc đọc đang chạy trên luồng giao diện
+        self.root.update_idletasks()
+    
+    def report_save_result(self, name, result):
+        """
+        Nhận kết quả ghi từ luồng ghi và chuyển về luồng giao diện
+        """
+        try:
+            self.root.after(0, lambda: self.show_save_result(name, result))
+        except (RuntimeError, tk.TclError):
+            # Cửa sổ đã bị đóng
+            pass
+    
+    def show_save_result(self, name, result):
+        """
+        Hiển thị kết quả ghi dữ liệu (chạy trên luồng giao diện)
+        """
+        if result:
+            self.status_label.config(text=f"Đã lưu dữ liệu {name}", foreground="gray")
+        else:
+            self.status_label.config(text=f"Lỗi khi lưu dữ liệu {name}!", foreground="red")
+            messagebox.showerror("Lỗi", f"Không thể lưu dữ liệu {name} xuống đĩa. Hệ thống sẽ thử lại ở lần lưu tiếp theo.")
+    
+    def attach_save_listeners(self):
+        """
+        Đăng ký nhận kết quả ghi của các bộ ghi dữ liệu
+        """
+        for name, writer in self.save_writers:
+            listener = lambda result, name=name: self.report_save_result(name, result)
+            writer.add_listener(listener)
+            self.save_listeners.append((writer, listener))
+    
+    def detach_save_listeners(self):
+        """
+        Ngừng nhận kết quả ghi (trước khi đóng cửa sổ)
+        """
+        for writer, listener in self.save_listeners:
+            writer.remove_listener(listener)
+        self.save_listeners = []
+    
+    def flush_pending_writes(self):
+        """
+        Ghi nốt các thay đổi đang chờ và ngừng nhận kết quả ghi
+        Trả về tên các dữ liệu không ghi được
+        """
+        self.detach_save_listeners()
+        # Ghi qua CustomerManager để bản chụp cần lưu toàn bộ (nếu có) được lấy trên luồng giao diện
+        self.customer_manager.flush()
+        results = [(name, writer.flush()) for name, writer in self.save_writers]
+        return [name for name, result in results if not result]
+    
+    def on_closing(self):
+        """
+        Đóng ứng dụng sau khi đã ghi xong mọi thay đổi đang chờ
+        """
+        failed = self.flush_pending_writes()
+        if failed:
+            names = ", ".join(failed)
+            if not messagebox.askyesno("Cảnh báo", f"Không thể lưu dữ liệu {names}. Bạn vẫn muốn thoát?"):
+                self.attach_save_listeners()
+                return
+        self.image_loader.shutdown()
+        self.root.destroy()
     
     def create_tabs(self):
         """
@@ -129,6 +253,12 @@ class MainUI:
         self.customer_tab = ttk.Frame(self.tab_control)
         self.tab_control.add(self.customer_tab, text="Quản lý khách hàng")
         
+        # Tab thống kê khách hàng
+        self.stats_tab = ttk.Frame(self.tab_control)
+        self.tab_control.add(self.stats_tab, text="Thống kê")
+        # Cập nhật thống kê mỗi khi chuyển sang tab thống kê
+        self.tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        
         # Tab quản lý người dùng (chỉ hiển thị với admin)
         self.user_tab = ttk.Frame(self.tab_control)
         
@@ -148,6 +278,9 @@ class MainUI:
         
         self.search_entry = ttk.Entry(search_frame, width=40)
         self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        # Tìm kiếm ngay khi gõ, chờ người dùng ngừng gõ một chút mới chạy
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
+        self.search_entry.bind("<Return>", lambda event: self.search_customers())
         
         search_button = ttk.Button(search_frame, text="Tìm", command=self.search_customers)
         search_button.grid(row=0, column=2, padx=5, pady=5)
@@ -158,22 +291,41 @@ class MainUI:
         add_button = ttk.Button(search_frame, text="Thêm mới", command=self.show_add_customer_form)
         add_button.grid(row=0, column=4, padx=5, pady=5)
         
+        # Lấy trang kết quả tiếp theo của truy vấn có cấu trúc
+        self.more_button = ttk.Button(search_frame, text="Xem thêm", command=self.show_more_results,
+                                      state=tk.DISABLED)
+        self.more_button.grid(row=0, column=5, padx=5, pady=5)
+        
+        # Gợi ý cú pháp truy vấn
+        query_hint = ttk.Label(search_frame, foreground="gray",
+                               text="Ví dụ: gender:Nữ age:25..35 address:colorado created:>=2025-06-01")
+        query_hint.grid(row=1, column=1, columnspan=5, sticky=tk.W, padx=5)
+        
         # Frame danh sách khách hàng
         list_frame = ttk.LabelFrame(self.customer_tab, text="Danh sách khách hàng", padding=10)
         list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # Tạo Treeview để hiển thị danh sách khách hàng
-        columns = ("id", "name", "email", "phone", "address", "gender", "age")
-        self.customer_tree = ttk.Treeview(list_frame, columns=columns, show="headings", selectmode="browse")
-        
-        # Đặt tiêu đề cho các cột
-        self.customer_tree.heading("id", text="ID")
-        self.customer_tree.heading("name", text="Họ tên")
-        self.customer_tree.heading("email", text="Email")
-        self.customer_tree.heading("phone", text="Số điện thoại")
-        self.customer_tree.heading("address", text="Địa chỉ")
-        self.customer_tree.heading("gender", text="Giới tính")
-        self.customer_tree.heading("age", text="Tuổi")
+        # Chỉ các dòng đang nhìn thấy mới được tạo item, dữ liệu nằm trong bộ nhớ
+        columns = ("id", "name", "email", "phone", "address", "gender", "age", "created_at")
+        self.customer_list = VirtualTreeview(list_frame, columns,
+                                             key_func=lambda c: str(c.get("id", "")),
+                                             values_func=self.customer_values,
+                                             virtual=config.CUSTOMER_VIRTUAL_LIST,
+                                             selectmode="extended")
+        self.customer_tree = self.customer_list.tree
+        
+        # Đặt tiêu đề cho các cột, click vào tiêu đề ID, Họ tên, Tuổi, Ngày tạo để sắp xếp
+        self.customer_headings = {"id": "ID", "name": "Họ tên", "email": "Email", "phone": "Số điện thoại",
+                                  "address": "Địa chỉ", "gender": "Giới tính", "age": "Tuổi",
+                                  "created_at": "Ngày tạo"}
+        for column, text in self.customer_headings.items():
+            if column in SORT_KEYS:
+                self.customer_tree.heading(column, text=text,
+                                           command=lambda column=column: self.sort_customers_by(column))
+            else:
+                self.customer_tree.heading(column, text=text)
+        self.update_sort_headings()
         
         # Đặt độ rộng và căn chỉnh cho các cột
         self.customer_tree.column("id", width=80, anchor=tk.W)
@@ -183,14 +335,11 @@ class MainUI:
         self.customer_tree.column("address", width=250, anchor=tk.W)
         self.customer_tree.column("gender", width=80, anchor=tk.CENTER)
         self.customer_tree.column("age", width=50, anchor=tk.CENTER)
-        
-        # Thêm thanh cuộn
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.customer_tree.yview)
-        self.customer_tree.configure(yscroll=scrollbar.set)
+        self.customer_tree.column("created_at", width=130, anchor=tk.CENTER)
         
         # Đặt vị trí cho treeview và scrollbar
         self.customer_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.customer_list.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Bind sự kiện click đúp chuột để xem chi tiết
         self.customer_tree.bind("<Double-1>", self.view_customer_details)
@@ -200,9 +349,77 @@ class MainUI:
         self.context_menu.add_command(label="Xem chi tiết", command=self.view_selected_customer)
         self.context_menu.add_command(label="Chỉnh sửa", command=self.edit_selected_customer)
         self.context_menu.add_command(label="Xóa", command=self.delete_selected_customer)
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Đặt giá trị cho các dòng đã chọn", command=self.set_field_for_selected)
         
         # Bind chuột phải để hiển thị menu ngữ cảnh
         self.customer_tree.bind("<Button-3>", self.show_context_menu)
+        # Ctrl+A chọn toàn bộ danh sách (dùng cho xóa/sửa hàng loạt)
+        self.customer_tree.bind("<Control-a>", lambda event: self.customer_list.select_all())
+    
+    def create_stats_tab(self):
+        """
+        Tạo giao diện tab thống kê khách hàng
+        """
+        button_frame = ttk.Frame(self.stats_tab)
+        button_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        refresh_button = ttk.Button(button_frame, text="Làm mới", command=self.refresh_stats)
+        refresh_button.pack(side=tk.LEFT, padx=5)
+        
+        stats_frame = ttk.LabelFrame(self.stats_tab, text="Thống kê khách hàng", padding=10)
+        stats_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        self.stats_text = tk.Text(stats_frame, wrap=tk.NONE, font=("Consolas", 10), state=tk.DISABLED)
+        stats_scrollbar = ttk.Scrollbar(stats_frame, orient=tk.VERTICAL, command=self.stats_text.yview)
+        self.stats_text.configure(yscrollcommand=stats_scrollbar.set)
+        self.stats_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        stats_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    
+    def on_tab_changed(self, event=None):
+        """
+        Cập nhật thống kê khi người dùng mở tab thống kê
+        """
+        if not hasattr(self, "analytics"):
+            return
+        if self.tab_control.select() == str(self.stats_tab):
+            self.refresh_stats()
+    
+    def refresh_stats(self):
+        """
+        Tính lại và hiển thị các số liệu thống kê
+        """
+        summary = self.analytics.summary()
+        total = summary["total"]
+        lines = [f"Tổng số khách hàng: {total}", "", "Theo giới tính:"]
+        for label, count in summary["gender_counts"].items():
+            percent = count * 100 / total if total else 0
+            lines.append(f"  {label:<6} {count:>10}  ({percent:.1f}%)")
+        
+        lines += ["", "Theo độ tuổi:"]
+        for low, high, count in summary["age_histogram"]:
+            lines.append(f"  {low:>3} - {high - 1:<3} {count:>10}")
+        
+        percentiles = summary["age_percentiles"]
+        if percentiles:
+            lines += ["", "Phân vị tuổi:"]
+            for percentile, value in percentiles.items():
+                lines.append(f"  P{percentile:<3} {value:>6.1f}")
+        
+        lines += ["", "Khách hàng đăng ký theo tháng:"]
+        for month, count in summary["signups_per_month"]:
+            lines.append(f"  {month}  {count:>10}")
+        
+        # Bộ nhớ đệm ảnh đã giải mã
+        cache = self.image_loader.cache.stats()
+        lines += ["", "Bộ nhớ đệm hình ảnh:",
+                  f"  {cache['entries']} ảnh, {cache['bytes'] / (1024 * 1024):.1f} MB",
+                  f"  Trúng: {cache['hits']}  Trượt: {cache['misses']}  Đã bỏ: {cache['evictions']}"]
+        
+        self.stats_text.configure(state=tk.NORMAL)
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, "\n".join(lines))
+        self.stats_text.configure(state=tk.DISABLED)
     
     def create_user_tab(self):
         """
@@ -271,75 +488,263 @@ class MainUI:
             # Đảm bảo file users.json tồn tại và có cấu trúc hợp lệ
             self.user_manager.save_data()
     
-    def load_customers(self):
+    def load_customers(self, force=False):
         """
         Tải danh sách khách hàng vào treeview
+        Chỉ đọc lại file khi file bị thay đổi từ bên ngoài hoặc khi force=True
         """
         try:
-            # Tải lại dữ liệu từ file
-            if not self.customer_manager.load_data():
+            # Tải lại dữ liệu từ file nếu cần
+            if not self.customer_manager.reload_if_changed(force):
                 messagebox.showerror("Lỗi", "Không thể tải dữ liệu khách hàng. Vui lòng kiểm tra file dữ liệu!")
                 return
             
-            # Xóa tất cả các mục hiện tại
-            for item in self.customer_tree.get_children():
-                self.customer_tree.delete(item)
-            
-            # Lấy danh sách khách hàng từ customer_manager
-            customers = self.customer_manager.get_all_customers()
-            # Sắp xếp theo tên từ A-Z (không phân biệt hoa thường)
-            customers = sorted(customers, key=lambda c: c.get("name", "").lower())
+            # Bỏ kết quả tìm kiếm cũ vì dữ liệu đã được tải lại
+            self.search_generation += 1
+            self.last_search_keyword = ""
+            self.last_search_results = None
+            self.set_query_iterator(None)
             
-            # Thêm các khách hàng vào treeview
-            for customer in customers:
-                values = (
-                    customer.get("id", ""),
-                    customer.get("name", ""),
-                    customer.get("email", ""),
-                    customer.get("phone", ""),
-                    customer.get("address", ""),
-                    customer.get("gender", ""),
-                    customer.get("age", "")
-                )
-                self.customer_tree.insert("", tk.END, values=values)
+            customers = self.show_all_customers()
             
             # Hiển thị thông báo thành công
             status_text = f"Đã tải {len(customers)} khách hàng"
+            self.status_label.config(text=status_text, foreground="gray")
             messagebox.showinfo("Thành công", status_text)
             
         except Exception as e:
             messagebox.showerror("Lỗi", f"Đã xảy ra lỗi khi tải danh sách khách hàng:\n{str(e)}")
             print(f"Lỗi khi tải danh sách khách hàng: {e}")
     
+    def show_all_customers(self):
+        """
+        Hiển thị toàn bộ khách hàng theo cột đang sắp xếp
+        Thứ tự lấy từ chỉ mục sắp xếp của CustomerManager nên không phải sắp xếp lại
+        """
+        sort_state = (self.customer_manager.generation, self.sort_field, self.sort_descending)
+        if self.sorted_generation != sort_state:
+            self.sorted_customers = self.customer_manager.get_sorted_customers(self.sort_field,
+                                                                               self.sort_descending)
+            self.sorted_generation = sort_state
+        self.display_customers(self.sorted_customers)
+        return self.sorted_customers
+    
+    def sort_customers_by(self, field):
+        """
+        Sắp xếp danh sách theo cột được click, click lại cùng cột để đảo chiều
+        """
+        if field == self.sort_field:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_field = field
+            self.sort_descending = False
+        self.update_sort_headings()
+        
+        if self.last_search_results is None:
+            self.show_all_customers()
+            return
+        # Đang hiển thị kết quả tìm kiếm: chỉ sắp xếp lại các kết quả đó
+        self.last_search_results = self.sort_rows(self.last_search_results)
+        self.display_customers(self.last_search_results)
+    
+    def sort_rows(self, customers, sort_state=None):
+        """
+        Sắp xếp một danh sách khách hàng theo cột đang chọn (hoặc theo sort_state = (cột, giảm dần)
+        khi chạy trên luồng tìm kiếm), khách hàng không có giá trị nằm cuối
+        """
+        field, descending = sort_state or (self.sort_field, self.sort_descending)
+        key_func = SORT_KEYS[field]
+        keyed = [(key_func(customer), customer) for customer in customers]
+        result = [customer for key, customer in
+                  sorted((item for item in keyed if item[0] is not None),
+                         key=lambda item: item[0], reverse=descending)]
+        result.extend(customer for key, customer in keyed if key is None)
+        return result
+    
+    def update_sort_headings(self):
+        """
+        Hiển thị mũi tên chiều sắp xếp trên tiêu đề cột đang sắp xếp
+        Khi truy vấn có cấu trúc còn trang chưa lấy, chỉ các dòng đã lấy được sắp xếp
+        nên không hiển thị mũi tên
+        """
+        for column, text in self.customer_headings.items():
+            if column == self.sort_field and self.query_iterator is None:
+                text = f"{text} {'▼' if self.sort_descending else '▲'}"
+            self.customer_tree.heading(column, text=text)
+    
+    def customer_values(self, customer):
+        """
+        Giá trị các cột của một khách hàng trong treeview
+        """
+        return (
+            customer.get("id", ""),
+            customer.get("name", ""),
+            customer.get("email", ""),
+            customer.get("phone", ""),
+            customer.get("address", ""),
+            customer.get("gender", ""),
+            customer.get("age", ""),
+            customer.get("created_at", "")
+        )
+    
+    def display_customers(self, customers):
+        """
+        Hiển thị danh sách khách hàng vào treeview (chỉ tạo item cho các dòng nhìn thấy)
+        Các dòng không đổi được giữ nguyên nên lựa chọn và vị trí cuộn không bị mất
+        """
+        self.customer_list.set_rows(customers)
+    
+    def on_search_key(self, event):
+        """
+        Lên lịch tìm kiếm sau mỗi lần gõ phím, lần gõ mới sẽ hủy lịch cũ
+        """
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(config.SEARCH_DEBOUNCE_MS, self.search_customers)
+    
     def search_customers(self):
         """
-        Tìm kiếm khách hàng theo từ khóa
+        Tìm kiếm khách hàng theo từ khóa trên luồng tìm kiếm chạy nền
         """
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        
         keyword = self.search_entry.get().strip()
         
+        # Mỗi lần tìm có một số thứ tự, kết quả của lần tìm cũ hơn sẽ bị bỏ qua
+        self.search_generation += 1
+        generation = self.search_generation
+        # Kết quả được sắp xếp theo cột đang chọn ngay trên luồng tìm kiếm
+        sort_state = (self.sort_field, self.sort_descending)
+        
         if not keyword:
-            self.load_customers()
+            self.last_search_keyword = ""
+            self.last_search_results = None
+            self.set_query_iterator(None)
+            self.show_all_customers()
+            return
+        
+        # Kết quả trước chỉ còn dùng được nếu dữ liệu chưa thay đổi kể từ lúc tìm
+        results_current = (self.last_search_results is not None and
+                           self.last_search_data_generation == self.customer_manager.generation)
+        if keyword == self.last_search_keyword and results_current:
+            return
+        
+        if is_structured_query(keyword):
+            self.run_query(generation, keyword, sort_state)
+            return
+        
+        # Nếu từ khóa mới là phần mở rộng của từ khóa trước thì chỉ lọc lại kết quả trước
+        # (không áp dụng khi lần trước là truy vấn có cấu trúc vì kết quả có thể chưa đủ)
+        candidates = None
+        if (results_current and self.last_search_keyword and
+                not is_structured_query(self.last_search_keyword) and
+                normalize_text(keyword).startswith(normalize_text(self.last_search_keyword))):
+            candidates = self.last_search_results
+        
+        def run_search():
+            # Bỏ qua nếu đã có lần gõ mới hơn trước khi thread kịp chạy
+            if generation != self.search_generation:
+                return
+            try:
+                # Dựng chỉ mục tìm kiếm (nếu chưa có) khi chưa giữ khóa để luồng giao diện không bị chặn
+                if candidates is None:
+                    self.customer_manager.prepare_search_index(keyword)
+                # Giữ khóa dữ liệu để luồng giao diện không sửa dữ liệu trong lúc tìm
+                with self.customer_manager.lock:
+                    data_generation = self.customer_manager.generation
+                    results = self.customer_manager.search_customers(keyword, candidates)
+                # Bản ghi không bị sửa tại chỗ (cập nhật thay bản ghi mới) nên sắp xếp ngoài khóa
+                results = self.sort_rows(results, sort_state)
+            except Exception as e:
+                print(f"Lỗi khi tìm kiếm khách hàng: {e}")
+                return
+            self.root.after(0, lambda: self.show_search_results(generation, keyword, results,
+                                                                data_generation=data_generation,
+                                                                sort_state=sort_state))
+        
+        self.search_worker.submit(run_search)
+    
+    def show_search_results(self, generation, keyword, results, query_iterator=None, data_generation=None,
+                            sort_state=None):
+        """
+        Hiển thị kết quả tìm kiếm nếu đó vẫn là lần tìm mới nhất
+        query_iterator là phần kết quả chưa lấy của truy vấn có cấu trúc
+        data_generation là thế hệ dữ liệu lúc tìm, dữ liệu đã đổi sau đó thì tìm lại
+        sort_state là (cột, giảm dần) đã dùng để sắp xếp results, sắp xếp lại nếu người dùng đã đổi cột
+        """
+        if generation != self.search_generation:
             return
+        if data_generation is not None and data_generation != self.customer_manager.generation:
+            self.last_search_results = None
+            self.search_customers()
+            return
+        if sort_state != (self.sort_field, self.sort_descending):
+            results = self.sort_rows(results)
+        self.last_search_keyword = keyword
+        self.last_search_results = results
+        self.last_search_data_generation = data_generation
+        self.set_query_iterator(query_iterator)
+        if is_structured_query(keyword):
+            more = "+" if query_iterator is not None else ""
+            self.status_label.config(text=f"Tìm thấy {len(results)}{more} khách hàng", foreground="gray")
+        self.display_customers(results)
+    
+    def run_query(self, generation, keyword, sort_state):
+        """
+        Tìm bằng truy vấn có cấu trúc trên luồng tìm kiếm chạy nền, chỉ lấy trang đầu tiên
+        Các dòng đã lấy được sắp xếp theo sort_state = (cột, giảm dần)
+        """
+        def run():
+            if generation != self.search_generation:
+                return
+            try:
+                self.customer_manager.prepare_search_index(keyword)
+                # Giữ khóa dữ liệu trong lúc lấy trang đầu (các trang sau được lấy trên luồng giao diện)
+                with self.customer_manager.lock:
+                    data_generation = self.customer_manager.generation
+                    iterator = self.customer_manager.query_customers(keyword)
+                    results = list(islice(iterator, config.QUERY_PAGE_SIZE))
+            except ValueError as e:
+                message = f"Truy vấn không hợp lệ: {e}"
+                self.root.after(0, lambda: self.status_label.config(text=message, foreground="red"))
+                return
+            except Exception as e:
+                print(f"Lỗi khi tìm kiếm khách hàng: {e}")
+                return
+            # Còn trang tiếp theo nếu trang đầu đã đầy
+            remaining = iterator if len(results) == config.QUERY_PAGE_SIZE else None
+            results = self.sort_rows(results, sort_state)
+            self.root.after(0, lambda: self.show_search_results(generation, keyword, results, remaining,
+                                                                data_generation, sort_state))
         
-        # Lấy kết quả tìm kiếm
-        results = self.customer_manager.search_customers(keyword)
-        
-        # Xóa tất cả các mục hiện tại trong treeview
-        for item in self.customer_tree.get_children():
-            self.customer_tree.delete(item)
-        
-        # Thêm kết quả tìm kiếm vào treeview
-        for customer in results:
-            values = (
-                customer.get("id", ""),
-                customer.get("name", ""),
-                customer.get("email", ""),
-                customer.get("phone", ""),
-                customer.get("address", ""),
-                customer.get("gender", ""),
-                customer.get("age", "")
-            )
-            self.customer_tree.insert("", tk.END, values=values)
+        self.search_worker.submit(run)
+    
+    def set_query_iterator(self, iterator):
+        """
+        Lưu phần kết quả chưa lấy và bật/tắt nút "Xem thêm"
+        """
+        self.query_iterator = iterator
+        self.more_button.config(state=tk.NORMAL if iterator is not None else tk.DISABLED)
+        self.update_sort_headings()
+    
+    def show_more_results(self):
+        """
+        Lấy thêm một trang kết quả của truy vấn có cấu trúc
+        """
+        if self.query_iterator is None or self.last_search_results is None:
+            return
+        try:
+            more = list(islice(self.query_iterator, config.QUERY_PAGE_SIZE))
+        except Exception as e:
+            # Dữ liệu có thể đã thay đổi sau lần lấy trước
+            print(f"Lỗi khi lấy thêm kết quả: {e}")
+            more = []
+        self.last_search_results = self.sort_rows(self.last_search_results + more)
+        if len(more) < config.QUERY_PAGE_SIZE:
+            self.set_query_iterator(None)
+        self.display_customers(self.last_search_results)
     
     def show_context_menu(self, event):
         """
@@ -349,8 +754,10 @@ class MainUI:
         item = self.customer_tree.identify_row(event.y)
         
         if item:
-            # Chọn dòng được click
-            self.customer_tree.selection_set(item)
+            # Chọn dòng được click (iid của mỗi dòng là ID khách hàng),
+            # giữ nguyên lựa chọn nhiều dòng nếu click vào một dòng đã chọn
+            if item not in self.customer_list.selection():
+                self.customer_list.selection_set([item])
             # Hiển thị menu ngữ cảnh
             self.context_menu.post(event.x_root, event.y_root)
     
@@ -358,21 +765,24 @@ class MainUI:
         """
         Lấy ID của khách hàng đang được chọn trong treeview
         """
-        selected_items = self.customer_tree.selection()
+        selected_ids = self.customer_list.selection()
         
-        if not selected_items:
+        if not selected_ids:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn một khách hàng!")
             return None
         
-        # Lấy giá trị của cột id
-        values = self.customer_tree.item(selected_items[0])["values"]
-        if not values or len(values) == 0:
-            messagebox.showerror("Lỗi", "Không tìm thấy dữ liệu khách hàng được chọn!")
-            return None
-            
-        customer_id = values[0]
-        print(f"Đã chọn khách hàng có ID: {customer_id}, có kiểu dữ liệu: {type(customer_id)}")
-        return str(customer_id)  # Đảm bảo ID là dạng chuỗi
+        # Khóa của mỗi dòng chính là ID khách hàng
+        return str(selected_ids[0])
+    
+    def get_selected_customer_ids(self):
+        """
+        Lấy ID của tất cả khách hàng đang được chọn trong treeview
+        """
+        selected_ids = [str(customer_id) for customer_id in self.customer_list.selection()]
+        
+        if not selected_ids:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn ít nhất một khách hàng!")
+        return selected_ids
     
     def view_customer_details(self, event):
         """
@@ -389,9 +799,6 @@ class MainUI:
         if not customer_id:
             return
         
-        # In ra ID để debug
-        print(f"Đang tìm khách hàng với ID: {customer_id}")
-        
         # Lấy thông tin chi tiết từ customer_manager
         customer = self.customer_manager.get_customer_by_id(customer_id)
         
@@ -424,8 +831,10 @@ class MainUI:
         if image_url and image_url != "":
             # Hiển thị thông báo đang tải
             image_label.config(text="Đang tải hình ảnh...")
-            # Tải hình ảnh trong một thread riêng
-            threading.Thread(target=self.load_image, args=(image_url, image_label)).start()
+            # Tải hình ảnh qua nhóm luồng tải, hủy yêu cầu nếu cửa sổ bị đóng trước khi tải xong
+            self.image_loader.load(image_url, lambda photo, error: self.show_image(image_label, photo, error),
+                                   size=(150, 150), owner=detail_window)
+            detail_window.bind("<Destroy>", lambda event: self.on_detail_window_destroy(event, detail_window))
         
         # Phần thông tin
         info_frame = ttk.LabelFrame(main_frame, text="Thông tin chi tiết", padding=10)
@@ -472,36 +881,25 @@ class MainUI:
         close_button = ttk.Button(button_frame, text="Đóng", command=detail_window.destroy)
         close_button.pack(side=tk.RIGHT, padx=5)
     
-    def load_image(self, url, label_widget):
+    def show_image(self, label_widget, photo, error):
         """
-        Tải hình ảnh từ URL và hiển thị vào label
+        Hiển thị hình ảnh đã tải vào label (được gọi trên luồng giao diện)
         """
-        try:
-            # Kiểm tra cache
-            if url in self.image_cache:
-                photo = self.image_cache[url]
-            else:
-                # Tải hình ảnh từ URL
-                with urllib.request.urlopen(url) as response:
-                    image_data = response.read()
-                
-                # Chuyển đổi thành đối tượng hình ảnh
-                image = Image.open(io.BytesIO(image_data))
-                
-                # Thay đổi kích thước hình ảnh
-                image = image.resize((150, 150), Image.LANCZOS)
-                
-                # Chuyển đổi thành đối tượng PhotoImage
-                photo = ImageTk.PhotoImage(image)
-                
-                # Lưu vào cache
-                self.image_cache[url] = photo
-            
-            # Cập nhật label
-            label_widget.config(image=photo, text="")
-            label_widget.image = photo  # Giữ tham chiếu đến hình ảnh
-        except Exception as e:
-            label_widget.config(text=f"Không thể tải hình ảnh: {e}")
+        if not label_widget.winfo_exists():
+            return
+        if photo is None:
+            label_widget.config(text=f"Không thể tải hình ảnh: {error}")
+            return
+        label_widget.config(image=photo, text="")
+        label_widget.image = photo  # Giữ tham chiếu đến hình ảnh
+    
+    def on_detail_window_destroy(self, event, window):
+        """
+        Hủy các yêu cầu tải hình ảnh của cửa sổ chi tiết khi cửa sổ bị đóng
+        """
+        # Sự kiện Destroy cũng được gửi cho từng widget con, chỉ xử lý khi chính cửa sổ bị đóng
+        if event.widget is window:
+            self.image_loader.cancel_owner(window)
     
     def load_sample_data(self):
         """
@@ -529,8 +927,14 @@ class MainUI:
     def handle_sample_data_result(self, success, data):
         """
         Xử lý kết quả sau khi tải dữ liệu mẫu
+        Khách hàng mới được lưu tại đây, trên luồng giao diện (không phải luồng tải)
         """
+        if success and not self.data_crawler.save_customers(data):
+            success, data = False, "Không thể lưu khách hàng mẫu"
         if success:
+            # Tải trước ảnh chân dung trên luồng nền, không chặn việc báo kết quả
+            self.data_crawler.start_prefetch(data)
+            
             # Làm mới danh sách
             self.load_customers()
             
@@ -549,6 +953,9 @@ class MainUI:
         
         if confirm:
             self.user_manager.logout()
+            # Ghi nốt các thay đổi đang chờ trước khi mở lại màn hình đăng nhập
+            self.flush_pending_writes()
+            self.image_loader.shutdown()
             self.root.destroy()
             # Quay lại màn hình đăng nhập
             import main
@@ -821,14 +1228,169 @@ class MainUI:
     
     def delete_selected_customer(self):
         """
-        Xóa khách hàng được chọn
+        Xóa khách hàng được chọn (xóa hàng loạt nếu chọn nhiều dòng)
         """
-        customer_id = self.get_selected_customer_id()
+        customer_ids = self.get_selected_customer_ids()
         
-        if not customer_id:
+        if not customer_ids:
+            return
+        
+        if len(customer_ids) > 1:
+            self.delete_selected_customers(customer_ids)
+        else:
+            self.delete_customer(customer_ids[0])
+    
+    def delete_selected_customers(self, customer_ids):
+        """
+        Xóa nhiều khách hàng trong một giao dịch
+        """
+        confirm = messagebox.askyesno("Xác nhận", f"Bạn có chắc chắn muốn xóa {len(customer_ids)} khách hàng đã chọn?")
+        
+        if not confirm:
+            return
+        
+        self.run_bulk_operation("Đang xóa khách hàng", customer_ids,
+                                self.customer_manager.delete_customers, "Đã xóa")
+    
+    def set_field_for_selected(self):
+        """
+        Hiển thị form đặt cùng một giá trị (giới tính, tuổi, địa chỉ) cho các khách hàng đã chọn
+        """
+        customer_ids = self.get_selected_customer_ids()
+        
+        if not customer_ids:
+            return
+        
+        # Tạo cửa sổ form
+        form_window = tk.Toplevel(self.root)
+        form_window.title("Đặt giá trị cho các dòng đã chọn")
+        form_window.geometry("420x220")
+        form_window.resizable(False, False)
+        form_window.grab_set()
+        
+        main_frame = ttk.Frame(form_window, padding=20)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(main_frame, text=f"Số khách hàng đã chọn: {len(customer_ids)}").grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        # Trường cần đặt
+        fields = {"Giới tính": "gender", "Tuổi": "age", "Địa chỉ": "address"}
+        ttk.Label(main_frame, text="Trường:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        field_combobox = ttk.Combobox(main_frame, values=list(fields), state="readonly", width=30)
+        field_combobox.grid(row=1, column=1, sticky=tk.W, pady=5)
+        field_combobox.current(0)
+        
+        # Giá trị mới
+        ttk.Label(main_frame, text="Giá trị:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        value_entry = ttk.Combobox(main_frame, values=["Nam", "Nữ"], width=30)
+        value_entry.grid(row=2, column=1, sticky=tk.W, pady=5)
+        
+        def on_field_change(event=None):
+            # Gợi ý giá trị cho trường giới tính
+            value_entry.config(values=["Nam", "Nữ"] if fields[field_combobox.get()] == "gender" else [])
+            value_entry.set("")
+        
+        field_combobox.bind("<<ComboboxSelected>>", on_field_change)
+        
+        # Nút áp dụng và hủy
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=3, column=0, columnspan=2, sticky=tk.EW, pady=15)
+        
+        apply_button = ttk.Button(button_frame, text="Áp dụng",
+                                  command=lambda: self.save_field_for_selected(
+                                      customer_ids,
+                                      fields[field_combobox.get()],
+                                      value_entry.get(),
+                                      form_window))
+        apply_button.pack(side=tk.LEFT, padx=5)
+        
+        cancel_button = ttk.Button(button_frame, text="Hủy", command=form_window.destroy)
+        cancel_button.pack(side=tk.RIGHT, padx=5)
+    
+    def save_field_for_selected(self, customer_ids, field, value, window):
+        """
+        Kiểm tra giá trị và cập nhật một trường cho nhiều khách hàng trong một giao dịch
+        """
+        value = value.strip()
+        if not value:
+            messagebox.showerror("Lỗi", "Vui lòng nhập giá trị!")
+            return
+        
+        if field == "age":
+            try:
+                value = int(value)
+            except ValueError:
+                messagebox.showerror("Lỗi", "Tuổi phải là một số nguyên!")
+                return
+        elif field == "gender" and value not in ("Nam", "Nữ"):
+            messagebox.showerror("Lỗi", "Giới tính phải là Nam hoặc Nữ!")
             return
         
-        self.delete_customer(customer_id)
+        window.destroy()
+        
+        def update_chunk(chunk_ids):
+            return self.customer_manager.update_customers({customer_id: {field: value} for customer_id in chunk_ids})
+        
+        self.run_bulk_operation("Đang cập nhật khách hàng", customer_ids, update_chunk, "Đã cập nhật")
+    
+    def run_bulk_operation(self, title, customer_ids, operation, done_text):
+        """
+        Thực hiện thao tác hàng loạt theo từng phần trong một giao dịch duy nhất
+        operation(danh_sách_id) trả về (các ID thành công, các lỗi)
+        Cả giao dịch chạy liền một mạch, không trả quyền cho vòng lặp sự kiện khi giao dịch đang mở
+        (thao tác khác của người dùng không thể lọt vào giao dịch); với lựa chọn lớn, thanh tiến trình
+        được vẽ lại giữa các phần bằng update_idletasks (chỉ vẽ lại, không xử lý sự kiện)
+        """
+        chunk_size = config.BULK_CHUNK_SIZE
+        total = len(customer_ids)
+        done_ids = []
+        errors = []
+        
+        # Chỉ hiện thanh tiến trình khi lựa chọn lớn
+        progress_window = None
+        if total > chunk_size:
+            progress_window = tk.Toplevel(self.root)
+            progress_window.title(title)
+            progress_window.geometry("360x100")
+            progress_window.resizable(False, False)
+            progress_window.grab_set()
+            # Không cho đóng cửa sổ khi đang xử lý
+            progress_window.protocol("WM_DELETE_WINDOW", lambda: None)
+            progress_label = ttk.Label(progress_window, text=f"{title}: 0/{total}")
+            progress_label.pack(pady=10)
+            progress_bar = ttk.Progressbar(progress_window, length=300, maximum=total)
+            progress_bar.pack(pady=5)
+            progress_window.update_idletasks()
+        
+        error = None
+        try:
+            # Toàn bộ các phần nằm trong cùng một batch(): ghi một lần, lỗi thì hoàn tác tất cả
+            with self.customer_manager.batch():
+                for start in range(0, total, chunk_size):
+                    chunk_done, chunk_errors = operation(customer_ids[start:start + chunk_size])
+                    done_ids.extend(chunk_done)
+                    errors.extend(chunk_errors)
+                    if progress_window is not None:
+                        processed = min(total, start + chunk_size)
+                        progress_bar["value"] = processed
+                        progress_label.config(text=f"{title}: {processed}/{total}")
+                        progress_window.update_idletasks()
+        except Exception as e:
+            error = e
+        
+        if progress_window is not None:
+            progress_window.destroy()
+        self.customer_list.selection_set([])
+        self.load_customers()
+        if error is not None:
+            print(f"Lỗi khi xử lý hàng loạt: {error}")
+            messagebox.showerror("Lỗi", f"Đã xảy ra lỗi, mọi thay đổi đã được hoàn tác:\n{str(error)}")
+        elif errors:
+            details = "\n".join(f"{item}: {message}" for item, message in errors[:10])
+            messagebox.showwarning("Hoàn tất", f"{done_text} {len(done_ids)}/{total} khách hàng.\n"
+                                               f"{len(errors)} dòng bị lỗi:\n{details}")
+        else:
+            messagebox.showinfo("Thành công", f"{done_text} {len(done_ids)} khách hàng!")
     
     def delete_customer(self, customer_id, parent_window=None):
         """
@@ -954,20 +1516,7 @@ class MainUI:
         self.user_image_label.pack(padx=10, pady=10)
         
         # Kiểm tra và hiển thị ảnh
-        image_path = user.get("picture", "")
-        if image_path and os.path.exists(image_path):
-            try:
-                # Tải ảnh từ file
-                image = Image.open(image_path)
-                image = image.resize((150, 150), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(image)
-                
-                # Hiển thị ảnh
-                self.user_image_label.config(image=photo, text="")
-                self.user_image_label.image = photo
-            except Exception as e:
-                print(f"Lỗi khi tải ảnh: {e}")
-                self.user_image_label.config(text="Không thể tải ảnh")
+        self.show_user_avatar(user)
         
         # Nút tải ảnh đại diện mới
         is_current_user = self.user_manager.get_current_user().get('id') == user_id
@@ -1229,10 +1778,6 @@ class MainUI:
         """
         if not self.user_manager.is_admin():
             return
-            
-        # Xóa tất cả các mục hiện tại
-        for item in self.user_tree.get_children():
-            self.user_tree.delete(item)
         
         try:
             # Lấy danh sách người dùng từ user_manager
@@ -1247,16 +1792,17 @@ class MainUI:
                 # Tải lại danh sách
                 users = self.user_manager.get_all_users()
             
-            # Thêm các người dùng vào treeview
-            for user in users:
-                values = (
-                    user.get("id", ""),
-                    user.get("username", ""),
-                    user.get("full_name", ""),
-                    "Quản trị viên" if user.get("role") == "admin" else "Người dùng",
-                    user.get("created_at", "")
-                )
-                self.user_tree.insert("", tk.END, values=values)
+            # Chỉ thêm/sửa/xóa những dòng thay đổi, giữ nguyên lựa chọn và vị trí cuộn
+            reconcile_tree(self.user_tree, users,
+                           key_func=lambda user: str(user.get("id", "")),
+                           values_func=lambda user: (
+                               user.get("id", ""),
+                               user.get("username", ""),
+                               user.get("full_name", ""),
+                               "Quản trị viên" if user.get("role") == "admin" else "Người dùng",
+                               user.get("created_at", "")
+                           ),
+                           rendered_values=self.user_tree_values)
                 
         except Exception as e:
             print(f"Lỗi khi tải danh sách người dùng: {e}")
@@ -1440,17 +1986,7 @@ class MainUI:
         self.user_image_label = ttk.Label(image_frame, text="Không có ảnh")
         self.user_image_label.pack(padx=10, pady=10)
         
-        image_path = user.get("picture", "")
-        if image_path and os.path.exists(image_path):
-            try:
-                image = Image.open(image_path)
-                image = image.resize((150, 150), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(image)
-                self.user_image_label.config(image=photo, text="")
-                self.user_image_label.image = photo
-            except Exception as e:
-                print(f"Lỗi khi tải ảnh: {e}")
-                self.user_image_label.config(text="Không thể tải ảnh")
+        self.show_user_avatar(user)
         
         is_current_user = self.user_manager.get_current_user().get('id') == user_id
         is_admin = self.user_manager.is_admin()
@@ -1642,6 +2178,27 @@ class MainUI:
         cancel_button = ttk.Button(form_frame, text="Hủy", command=form_window.destroy)
         cancel_button.pack(pady=10)
 
+    def show_user_avatar(self, user, size=(150, 150)):
+        """
+        Hiển thị ảnh đại diện của người dùng trên user_image_label
+        Dùng bản thu nhỏ tạo sẵn; ảnh tải lên trước khi có kho ảnh thì mới phải thu nhỏ
+        """
+        image_path = avatar_path(user, size)
+        if not image_path:
+            return
+        try:
+            image = Image.open(image_path)
+            if image.size != tuple(size):
+                image = image.resize(size, Image.LANCZOS)
+            photo = ImageTk.PhotoImage(image)
+            self.user_image_label.config(image=photo, text="")
+            self.user_image_label.image = photo
+        except FileNotFoundError:
+            print(f"Cảnh báo: Không tìm thấy ảnh đại diện tại {image_path}")
+        except Exception as e:
+            print(f"Lỗi khi tải ảnh: {e}")
+            self.user_image_label.config(text="Không thể tải ảnh")
+
     def select_image_file(self, user_id, form_window):
         """
         Hiển thị hộp thoại chọn file và xử lý file đã chọn
@@ -1676,29 +2233,15 @@ class MainUI:
             return
         
         try:
-            # Tạo tên file mới
-            file_extension = os.path.splitext(file_path)[1]
-            new_filename = f"user_{user_id}{file_extension}"
-            new_file_path = os.path.join(self.user_images_dir, new_filename)
-            
-            # Sao chép file vào thư mục lưu trữ
-            shutil.copy2(file_path, new_file_path)
-            
-            # Resize ảnh để hiển thị
-            image = Image.open(new_file_path)
-            image = image.resize((150, 150), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(image)
-            
-            # Hiển thị ảnh mới
-            if hasattr(self, 'user_image_label'):
-                self.user_image_label.config(image=photo, text="")
-                self.user_image_label.image = photo
-            
-            # Cập nhật đường dẫn ảnh vào thông tin người dùng
             user = self.user_manager.get_user_by_id(user_id)
             if user:
-                user['picture'] = new_file_path
-                self.user_manager.update_user(user_id, user)
+                # Giải mã ảnh một lần, lưu ảnh đã thu nhỏ và các bản thu nhỏ vào kho ảnh
+                avatar = self.avatar_store.save(file_path)
+                self.user_manager.update_user(user_id, avatar)
+                
+                # Hiển thị ảnh mới
+                if hasattr(self, 'user_image_label'):
+                    self.show_user_avatar(avatar)
                 
                 # Cập nhật giao diện
                 if hasattr(self, 'user_tree'):
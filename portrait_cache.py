@@ -0,0 +1,254 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import urllib.request
+from collections import OrderedDict
+from PIL import Image
+import config
+from safe_writer import GroupCommitWriter, atomic_write, atomic_write_json, commit_delay
+
+# Tăng số phiên bản khi thay đổi định dạng file chỉ mục để bỏ qua chỉ mục cũ
+INDEX_VERSION = 1
+INDEX_FILE = "index.json"
+# Tên biến thể của ảnh gốc (các biến thể thu nhỏ có tên dạng "150x150")
+ORIGINAL = "original"
+
+def url_key(url):
+    """
+    Mã băm BLAKE2b của URL, dùng làm tên file trong cache
+    """
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+
+def variant_name(size):
+    """
+    Tên biến thể của ảnh theo kích thước, None là ảnh gốc
+    """
+    if size is None:
+        return ORIGINAL
+    return f"{size[0]}x{size[1]}"
+
+def image_extension(image_data):
+    """
+    Đuôi file theo định dạng của nội dung ảnh
+    """
+    try:
+        image_format = Image.open(io.BytesIO(image_data)).format or ""
+    except Exception:
+        return "img"
+    return {"JPEG": "jpg"}.get(image_format, image_format.lower() or "img")
+
+def has_alpha(image):
+    """
+    Kiểm tra ảnh có kênh trong suốt không
+    """
+    return image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+def convert_for_display(image):
+    """
+    Chuyển ảnh về chế độ màu hiển thị và lưu được: RGBA nếu có kênh trong suốt, ngược lại RGB
+    (ảnh CMYK, bảng màu P, LA, 16 bit... không lưu được dạng JPEG/PNG hoặc thu nhỏ kém)
+    Ảnh RGB, RGBA, L được giữ nguyên
+    """
+    if image.mode in ("RGB", "RGBA", "L"):
+        return image
+    return image.convert("RGBA" if has_alpha(image) else "RGB")
+
+def image_extension_for(image):
+    """
+    Đuôi file khi lưu bản thu nhỏ: JPEG cho ảnh màu không trong suốt, PNG cho các ảnh khác
+    """
+    return "jpg" if image.mode in ("RGB", "L") else "png"
+
+def encode_image(image):
+    """
+    Mã hóa bản thu nhỏ để lưu vào cache đĩa
+    """
+    image = convert_for_display(image)
+    buffer = io.BytesIO()
+    if image_extension_for(image) == "jpg":
+        image.save(buffer, "JPEG", quality=90)
+    else:
+        image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def load_thumbnail(url, size, disk_cache=None, timeout=None):
+    """
+    Lấy ảnh (PIL) đã thu nhỏ theo kích thước, có thể chạy trên luồng bất kỳ
+    Thứ tự: bản thu nhỏ trong cache đĩa, ảnh gốc trong cache đĩa, cuối cùng mới tải qua mạng;
+    ảnh gốc và bản thu nhỏ được lưu lại vào cache đĩa (nếu có)
+    """
+    size = tuple(size)
+    image_data = None
+    if disk_cache is not None:
+        data = disk_cache.get(url, size)
+        if data is not None:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            return image
+        image_data = disk_cache.get(url)
+
+    if image_data is None:
+        timeout = timeout if timeout is not None else config.IMAGE_LOAD_TIMEOUT
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            image_data = response.read()
+        if disk_cache is not None:
+            disk_cache.put(url, image_data, extension=image_extension(image_data))
+
+    image = convert_for_display(Image.open(io.BytesIO(image_data))).resize(size, Image.LANCZOS)
+    if disk_cache is not None:
+        disk_cache.put(url, encode_image(image), size, extension=image_extension_for(image))
+    return image
+
+class PortraitCache:
+    def __init__(self, directory=None, max_bytes=None):
+        """
+        Cache ảnh chân dung trên đĩa: mỗi URL (theo mã băm) có ảnh gốc và các bản thu nhỏ
+        File chỉ mục lưu danh sách ảnh theo thứ tự dùng gần nhất và kích thước từng file,
+        nên tra cứu không cần quét thư mục; khi tổng dung lượng vượt max_bytes thì xóa
+        các ảnh lâu không dùng nhất (LRU)
+        Có thể dùng từ nhiều luồng; chỉ mục được ghi gộp bởi GroupCommitWriter
+        Lần đọc trúng cache chỉ đánh dấu thứ tự LRU đã đổi, thứ tự này được ghi cùng lần ghi
+        chỉ mục tiếp theo (khi thêm/xóa ảnh) hoặc khi flush (đóng ứng dụng)
+        """
+        self.directory = directory or config.PORTRAIT_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else config.PORTRAIT_CACHE_MAX_BYTES
+        self.index_file = os.path.join(self.directory, INDEX_FILE)
+        self.lock = threading.Lock()
+        # mã băm URL -> {"url": ..., "files": {biến thể: [tên file, số byte]}}, theo thứ tự LRU
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        # Thứ tự LRU đã đổi do đọc ảnh nhưng chưa được ghi vào file chỉ mục
+        self.access_dirty = False
+        # Bộ ghi tự ghi thứ tự LRU còn chờ khi flush, kể cả lúc thoát chương trình
+        self.writer = GroupCommitWriter(self.save_index, delay=commit_delay(), name="writer:portrait-cache",
+                                        has_unsaved=lambda: self.access_dirty)
+        self.load_index()
+
+    def load_index(self):
+        """
+        Đọc file chỉ mục, bỏ qua nếu chưa có hoặc bị lỗi (cache được xem như rỗng)
+        """
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get("version") != INDEX_VERSION:
+                return
+            for entry in data.get("entries", []):
+                self.entries[entry["key"]] = {"url": entry["url"], "files": entry["files"]}
+            self.total_bytes = sum(size for entry in self.entries.values()
+                                   for _, size in entry["files"].values())
+        except Exception as e:
+            print(f"Lỗi khi đọc chỉ mục cache ảnh: {e}")
+            self.entries = OrderedDict()
+            self.total_bytes = 0
+
+    def save_index(self):
+        """
+        Ghi file chỉ mục (gọi bởi luồng ghi), thứ tự các mục là thứ tự LRU
+        """
+        with self.lock:
+            entries = [{"key": key, "url": entry["url"], "files": dict(entry["files"])}
+                       for key, entry in self.entries.items()]
+            self.access_dirty = False
+        atomic_write_json(self.index_file, {"version": INDEX_VERSION, "entries": entries})
+        return True
+
+    def get(self, url, size=None):
+        """
+        Lấy nội dung ảnh (bytes) trong cache: ảnh gốc nếu size là None, ngược lại là bản thu nhỏ
+        Trả về None nếu chưa có
+        """
+        key = url_key(url)
+        variant = variant_name(size)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or variant not in entry["files"]:
+                return None
+            filename = entry["files"][variant][0]
+            self.entries.move_to_end(key)
+            self.access_dirty = True
+        try:
+            with open(os.path.join(self.directory, filename), 'rb') as file:
+                data = file.read()
+        except OSError:
+            # File bị xóa từ bên ngoài: bỏ khỏi chỉ mục
+            self.discard(key, variant)
+            return None
+        return data
+
+    def contains(self, url, size=None):
+        """
+        Kiểm tra cache đã có ảnh chưa (không tính là một lần dùng)
+        """
+        with self.lock:
+            entry = self.entries.get(url_key(url))
+            return entry is not None and variant_name(size) in entry["files"]
+
+    def put(self, url, data, size=None, extension="jpg"):
+        """
+        Lưu nội dung ảnh vào cache (ghi file an toàn) rồi xóa bớt ảnh cũ nếu vượt dung lượng
+        """
+        key = url_key(url)
+        variant = variant_name(size)
+        filename = f"{key}.{extension}" if size is None else f"{key}_{variant}.{extension}"
+        atomic_write(os.path.join(self.directory, filename), lambda file: file.write(data), binary=True)
+        with self.lock:
+            entry = self.entries.setdefault(key, {"url": url, "files": {}})
+            old = entry["files"].get(variant)
+            if old is not None:
+                self.total_bytes -= old[1]
+                if old[0] != filename:
+                    self.remove_file(old[0])
+            entry["files"][variant] = [filename, len(data)]
+            self.total_bytes += len(data)
+            self.entries.move_to_end(key)
+            evicted = self.evict()
+        self.writer.request()
+        if evicted:
+            print(f"Đã xóa {evicted} ảnh lâu không dùng khỏi cache")
+
+    def evict(self):
+        """
+        Xóa các ảnh lâu không dùng nhất cho tới khi tổng dung lượng không vượt ngân sách
+        (luôn giữ lại ảnh vừa dùng), trả về số ảnh đã xóa; gọi khi đang giữ khóa
+        """
+        evicted = 0
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            for filename, size in entry["files"].values():
+                self.total_bytes -= size
+                self.remove_file(filename)
+            evicted += 1
+        return evicted
+
+    def discard(self, key, variant):
+        """
+        Bỏ một biến thể ảnh khỏi chỉ mục
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or variant not in entry["files"]:
+                return
+            self.total_bytes -= entry["files"].pop(variant)[1]
+            if not entry["files"]:
+                del self.entries[key]
+        self.writer.request()
+
+    def remove_file(self, filename):
+        """
+        Xóa file ảnh, bỏ qua nếu không còn
+        """
+        try:
+            os.remove(os.path.join(self.directory, filename))
+        except OSError:
+            pass
+
+    def flush(self):
+        """
+        Ghi ngay chỉ mục đang chờ, kể cả thứ tự LRU đã đổi do đọc ảnh
+        """
+        return self.writer.flush()
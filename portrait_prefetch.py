@@ -0,0 +1,63 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+from portrait_cache import load_thumbnail
+
+def fetch_with_retry(url, size, disk_cache, retries, timeout, backoff):
+    """
+    Tải và thu nhỏ một ảnh vào cache đĩa, thử lại tối đa retries lần khi lỗi
+    (chờ backoff, 2*backoff, 4*backoff... giây giữa các lần), trả về thông báo lỗi cuối
+    hoặc None nếu thành công
+    """
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * (2 ** (attempt - 1)))
+        try:
+            load_thumbnail(url, size, disk_cache, timeout)
+            return None
+        except Exception as e:
+            error = str(e)
+    return error
+
+def prefetch_portraits(urls, disk_cache, size=(150, 150), workers=None, retries=None,
+                       timeout=None, backoff=None, progress=None):
+    """
+    Tải trước ảnh chân dung của một lô khách hàng vào cache đĩa (ảnh gốc và bản thu nhỏ)
+    - Bỏ qua URL rỗng, trùng lặp hoặc đã có bản thu nhỏ trong cache
+    - Chạy song song bằng một nhóm tối đa workers luồng, mỗi ảnh được thử lại khi lỗi
+    - progress(done, total) (nếu có) được gọi trên luồng tải sau mỗi ảnh
+    Trả về (số ảnh đã tải, {url: thông báo lỗi} của các ảnh không tải được)
+    """
+    workers = workers if workers is not None else config.PREFETCH_WORKERS
+    retries = retries if retries is not None else config.PREFETCH_RETRIES
+    backoff = backoff if backoff is not None else config.PREFETCH_RETRY_BACKOFF
+    size = tuple(size)
+    pending = [url for url in dict.fromkeys(urls)
+               if url and not disk_cache.contains(url, size)]
+    failed = {}
+    if not pending:
+        return 0, failed
+
+    lock = threading.Lock()
+    done = [0]
+
+    def fetch(url):
+        """
+        Tải một ảnh và cập nhật tiến độ
+        """
+        error = fetch_with_retry(url, size, disk_cache, retries, timeout, backoff)
+        with lock:
+            if error is not None:
+                failed[url] = error
+            done[0] += 1
+            finished = done[0]
+        if progress is not None:
+            progress(finished, len(pending))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="portrait-prefetch") as pool:
+        # list() để chờ mọi ảnh tải xong (lỗi đã được fetch xử lý)
+        list(pool.map(fetch, pending))
+    disk_cache.flush()
+    return len(pending) - len(failed), failed
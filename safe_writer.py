@@ -0,0 +1,243 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+import config
+
+def commit_delay():
+    """
+    Thời gian gộp ghi (giây) theo cấu hình, None nếu ghi đồng bộ
+    """
+    if config.SAVE_ASYNC and config.SAVE_GROUP_COMMIT_MS > 0:
+        return config.SAVE_GROUP_COMMIT_MS / 1000
+    return None
+
+def fsync_directory(directory):
+    """
+    Đồng bộ thư mục xuống đĩa để thao tác đổi tên file không bị mất khi mất điện
+    (bỏ qua trên hệ điều hành không hỗ trợ mở thư mục, ví dụ Windows)
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write_text(path, text):
+    """
+    Ghi nội dung vào file an toàn: ghi ra file tạm cùng thư mục, fsync rồi đổi tên đè file cũ
+    Nếu chương trình bị dừng giữa chừng, file cũ vẫn còn nguyên vẹn
+    """
+    atomic_write_lines(path, [text])
+
+def atomic_write_lines(path, lines):
+    """
+    Ghi lần lượt các đoạn văn bản vào file một cách an toàn (không cần ghép cả file trong bộ nhớ)
+    """
+    atomic_write(path, lambda file: file.writelines(lines))
+
+def atomic_write(path, write_func, binary=False):
+    """
+    Mở file tạm cùng thư mục, gọi write_func(file) để ghi, fsync rồi đổi tên đè lên path
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        if binary:
+            file = os.fdopen(fd, 'wb')
+        else:
+            file = os.fdopen(fd, 'w', encoding='utf-8')
+        with file:
+            write_func(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    fsync_directory(directory)
+
+def json_default(value):
+    """
+    Cho phép json ghi các đối tượng dạng dict (ví dụ CustomerRecord) như dict thường
+    """
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Không thể chuyển {type(value).__name__} sang JSON")
+
+def atomic_write_json(path, data):
+    """
+    Ghi dữ liệu ra file JSON một cách an toàn (cùng định dạng với các file dữ liệu hiện có)
+    """
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=4, default=json_default))
+
+def append_durable(path, text):
+    """
+    Ghi thêm vào cuối file và fsync trước khi trả về
+    """
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+
+def truncate_partial_line(path):
+    """
+    Cắt bỏ dòng cuối bị ghi dở (không kết thúc bằng xuống dòng, do sự cố khi đang ghi thêm)
+    để lần ghi thêm sau bắt đầu ở dòng mới thay vì bị nối vào mảnh dòng đó
+    Trả về số byte đã cắt (0 nếu file không có dòng ghi dở hoặc không tồn tại)
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    if size == 0:
+        return 0
+    with open(path, 'rb+') as file:
+        file.seek(size - 1)
+        if file.read(1) == b"\n":
+            return 0
+        # Tìm ký tự xuống dòng cuối cùng, đọc ngược từng đoạn từ cuối file
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            file.seek(start)
+            position = file.read(end - start).rfind(b"\n")
+            if position >= 0:
+                end = start + position + 1
+                break
+            end = start
+        file.truncate(end)
+        file.flush()
+        os.fsync(file.fileno())
+    return size - end
+
+class GroupCommitWriter:
+    def __init__(self, commit_func, delay=0.05, name="writer", has_unsaved=None):
+        """
+        Bộ ghi gộp (group commit): các yêu cầu ghi đến trong khoảng delay giây
+        được gộp lại và commit_func chỉ được gọi một lần trên luồng ghi riêng
+        commit_func tự lấy dữ liệu đang chờ và trả về True/False
+        Nếu delay là None thì ghi đồng bộ ngay trên luồng gọi
+        has_unsaved() (nếu có) báo còn dữ liệu chưa ghi dù chưa gọi request(),
+        được kiểm tra khi flush (kể cả lúc thoát chương trình)
+        """
+        self.commit_func = commit_func
+        self.has_unsaved = has_unsaved
+        self.delay = delay
+        self.name = name
+        self.condition = threading.Condition()
+        self.pending = False
+        self.writing = False
+        self.last_result = True
+        self.thread = None
+        # Các hàm được gọi sau mỗi lần ghi với kết quả True/False (trên luồng ghi)
+        self.listeners = []
+        # Đảm bảo dữ liệu đang chờ được ghi xuống đĩa trước khi thoát chương trình
+        atexit.register(self.flush)
+
+    def request(self):
+        """
+        Đánh dấu có dữ liệu cần ghi
+        Trả về kết quả ghi nếu ghi đồng bộ, ngược lại trả về True ngay
+        """
+        with self.condition:
+            self.pending = True
+            if self.delay is not None and self.thread is None:
+                self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+        if self.delay is None:
+            return self.commit_pending()
+        return True
+
+    def run(self):
+        """
+        Vòng lặp của luồng ghi: chờ yêu cầu, đợi thêm delay giây để gộp rồi ghi một lần
+        """
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+            # Gom thêm các thay đổi đến ngay sau đó
+            time.sleep(self.delay)
+            self.commit_pending()
+
+    def commit_pending(self):
+        """
+        Ghi dữ liệu đang chờ (nếu có), chỉ một luồng được ghi tại một thời điểm
+        Việc ghi diễn ra ngoài khóa để luồng gọi request() không bị chặn
+        """
+        with self.condition:
+            while self.writing:
+                self.condition.wait()
+            if not self.pending:
+                return self.last_result
+            self.pending = False
+            self.writing = True
+        result = self.run_commit()
+        with self.condition:
+            self.last_result = result
+            self.writing = False
+            self.condition.notify_all()
+        for listener in list(self.listeners):
+            try:
+                listener(result)
+            except Exception as e:
+                print(f"Lỗi khi báo kết quả ghi ({self.name}): {e}")
+        return result
+
+    def run_commit(self):
+        """
+        Gọi hàm ghi, lỗi được ghi log và trả về False
+        """
+        try:
+            return self.commit_func() is not False
+        except Exception as e:
+            print(f"Lỗi khi ghi dữ liệu ({self.name}): {e}")
+            return False
+
+    def flush(self):
+        """
+        Ghi ngay mọi dữ liệu đang chờ và đợi ghi xong
+        Trả về kết quả của lần ghi gần nhất
+        """
+        if self.has_unsaved is not None and self.has_unsaved():
+            with self.condition:
+                self.pending = True
+        self.commit_pending()
+        with self.condition:
+            while self.writing:
+                self.condition.wait()
+            return self.last_result
+
+    def add_listener(self, listener):
+        """
+        Đăng ký hàm nhận kết quả sau mỗi lần ghi
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """
+        Hủy đăng ký hàm nhận kết quả ghi
+        """
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def has_pending(self):
+        """
+        Kiểm tra còn dữ liệu chưa được ghi xuống đĩa không
+        """
+        with self.condition:
+            return self.pending or self.writing
@@ -0,0 +1,248 @@
+# Bảng chuyển ký tự có dấu tiếng Việt (chữ thường) sang không dấu, dựng một lần khi nạp module
+ACCENT_GROUPS = {
+    'a': 'àáảãạăằắẳẵặâầấẩẫậ',
+    'd': 'đ',
+    'e': 'èéẻẽẹêềếểễệ',
+    'i': 'ìíỉĩị',
+    'o': 'òóỏõọôồốổỗộơờớởỡợ',
+    'u': 'ùúủũụưừứửữự',
+    'y': 'ỳýỷỹỵ',
+}
+FOLD_TABLE = str.maketrans({char: base for base, chars in ACCENT_GROUPS.items() for char in chars})
+
+# Thứ tự chữ cái tiếng Việt (kèm f, j, w, z) và thứ tự dấu thanh: ngang, huyền, hỏi, ngã, sắc, nặng
+VIETNAMESE_ALPHABET = "aăâbcdđeêfghijklmnoôơpqrstuưvwxyz"
+VIETNAMESE_VOWELS = {
+    'a': 'aàảãáạ', 'ă': 'ăằẳẵắặ', 'â': 'âầẩẫấậ', 'e': 'eèẻẽéẹ', 'ê': 'êềểễếệ',
+    'i': 'iìỉĩíị', 'o': 'oòỏõóọ', 'ô': 'ôồổỗốộ', 'ơ': 'ơờởỡớợ', 'u': 'uùủũúụ',
+    'ư': 'ưừửữứự', 'y': 'yỳỷỹýỵ',
+}
+# Khóa chính: mỗi chữ cái thành một ký tự theo thứ tự bảng chữ cái (lớn hơn chữ số, dấu cách),
+# nguyên âm có dấu thanh cùng khóa với nguyên âm không dấu
+COLLATION_TABLE = str.maketrans({char: chr(0x100 + rank) for rank, char in enumerate(VIETNAMESE_ALPHABET)})
+COLLATION_TABLE.update({ord(toned): COLLATION_TABLE[ord(base)]
+                        for base, chars in VIETNAMESE_VOWELS.items() for toned in chars})
+# Khóa phụ: mỗi nguyên âm thành số thứ tự dấu thanh, dùng khi khóa chính bằng nhau
+TONE_TABLE = str.maketrans({toned: chr(tone) for chars in VIETNAMESE_VOWELS.values()
+                            for tone, toned in enumerate(chars)})
+
+# Các trường được tìm kiếm, ghép lại bằng ký tự phân cách để từ khóa không khớp vắt qua hai trường
+SEARCH_FIELDS = ("name", "email", "phone", "address")
+FIELD_SEPARATOR = "\x1f"
+
+# Độ dài n-gram của chỉ mục đảo, từ khóa ngắn hơn sẽ được tìm bằng cách quét
+NGRAM_SIZE = 3
+
+def normalize_text(text):
+    """
+    Chuẩn hóa chuỗi để tìm kiếm không phân biệt hoa thường và dấu tiếng Việt
+    """
+    if not text:
+        return ""
+    return text.lower().translate(FOLD_TABLE)
+
+def vietnamese_sort_key(text):
+    """
+    Khóa sắp xếp theo thứ tự từ điển tiếng Việt: so sánh chữ cái trước (a < ă < â < b ... đ sau d),
+    nếu giống nhau thì so sánh dấu thanh; không phân biệt hoa thường
+    """
+    text = (text or "").lower()
+    return text.translate(COLLATION_TABLE) + "\x00" + text.translate(TONE_TABLE)
+
+def build_search_text(customer):
+    """
+    Ghép các trường được tìm kiếm và ID thành một chuỗi đã chuẩn hóa
+    """
+    fields = [normalize_text(str(customer.get(field) or "")) for field in SEARCH_FIELDS]
+    fields.append(str(customer.get("id", "")).lower())
+    return FIELD_SEPARATOR.join(fields)
+
+def text_ngrams(text, size=NGRAM_SIZE):
+    """
+    Lấy tập n-gram của chuỗi tìm kiếm, bỏ qua n-gram vắt qua ký tự phân cách
+    """
+    return {field[i:i + size]
+            for field in text.split(FIELD_SEPARATOR)
+            for i in range(len(field) - size + 1)}
+
+def build_postings(texts):
+    """
+    Dựng chỉ mục đảo trigram -> tập ID từ dict ID -> chuỗi đã chuẩn hóa
+    """
+    postings = {}
+    for customer_id, text in texts.items():
+        for ngram in text_ngrams(text):
+            posting = postings.get(ngram)
+            if posting is None:
+                postings[ngram] = {customer_id}
+            else:
+                posting.add(customer_id)
+    return postings
+
+class SearchIndex:
+    def __init__(self):
+        """
+        Khởi tạo chỉ mục tìm kiếm lưu sẵn chuỗi đã chuẩn hóa của từng khách hàng
+        Chỉ mục đảo trigram -> tập ID chỉ được dựng ở lần tìm kiếm đầu tiên cần đến nó
+        """
+        self.texts = {}
+        self.lower_ids = {}
+        # Thứ tự thêm vào, dùng để trả kết quả theo thứ tự ổn định
+        self.sequence = {}
+        self.next_sequence = 0
+        self.postings = None
+
+    def build(self, customers, texts=None):
+        """
+        Dựng lại chỉ mục từ danh sách khách hàng
+        Nếu có texts (chuỗi đã chuẩn hóa lấy từ cache) thì không phải chuẩn hóa lại
+        """
+        self.texts = {}
+        self.lower_ids = {}
+        self.sequence = {}
+        self.next_sequence = 0
+        self.postings = None
+        if texts is None:
+            for customer in customers:
+                self.add(customer)
+            return
+
+        self.texts = texts
+        for customer in customers:
+            customer_id = str(customer.get("id", ""))
+            self.lower_ids[customer_id.lower()] = customer_id
+            self.sequence[customer_id] = self.next_sequence
+            self.next_sequence += 1
+
+    def build_postings(self):
+        """
+        Dựng chỉ mục đảo trigram từ các chuỗi đã chuẩn hóa
+        """
+        self.postings = build_postings(self.texts)
+
+    def install_postings(self, postings, built_texts):
+        """
+        Gắn chỉ mục đảo đã dựng sẵn (ngoài khóa dữ liệu) từ bản sao built_texts của self.texts,
+        rồi áp dụng các thay đổi xảy ra trong lúc dựng (so sánh từng chuỗi với bản sao)
+        """
+        if self.postings is not None:
+            return
+        self.postings = postings
+        texts = self.texts
+        for customer_id, text in built_texts.items():
+            if texts.get(customer_id) is not text:
+                self.remove_postings(customer_id, text_ngrams(text))
+        for customer_id, text in texts.items():
+            if built_texts.get(customer_id) is not text:
+                for ngram in text_ngrams(text):
+                    postings.setdefault(ngram, set()).add(customer_id)
+
+    def add(self, customer):
+        """
+        Thêm hoặc cập nhật chuỗi tìm kiếm của một khách hàng
+        """
+        customer_id = str(customer.get("id", ""))
+        text = build_search_text(customer)
+        old_text = self.texts.get(customer_id)
+        if old_text == text:
+            return
+        self.texts[customer_id] = text
+        self.lower_ids[customer_id.lower()] = customer_id
+        if customer_id not in self.sequence:
+            self.sequence[customer_id] = self.next_sequence
+            self.next_sequence += 1
+
+        if self.postings is not None:
+            old_ngrams = text_ngrams(old_text) if old_text is not None else set()
+            new_ngrams = text_ngrams(text)
+            self.remove_postings(customer_id, old_ngrams - new_ngrams)
+            for ngram in new_ngrams - old_ngrams:
+                self.postings.setdefault(ngram, set()).add(customer_id)
+
+    def remove_postings(self, customer_id, ngrams):
+        """
+        Xóa ID khỏi danh sách posting của các n-gram
+        """
+        for ngram in ngrams:
+            posting = self.postings.get(ngram)
+            if posting is not None:
+                posting.discard(customer_id)
+                if not posting:
+                    del self.postings[ngram]
+
+    def remove(self, customer_id):
+        """
+        Xóa khách hàng khỏi chỉ mục
+        """
+        customer_id = str(customer_id)
+        text = self.texts.pop(customer_id, None)
+        if text is None:
+            return
+        self.lower_ids.pop(customer_id.lower(), None)
+        self.sequence.pop(customer_id, None)
+        if self.postings is not None:
+            self.remove_postings(customer_id, text_ngrams(text))
+
+    def find_id(self, keyword):
+        """
+        Tìm ID trùng khớp chính xác (không phân biệt hoa thường)
+        """
+        return self.lower_ids.get(keyword.lower().strip())
+
+    def candidates(self, normalized_keyword):
+        """
+        Lấy tập ID có thể khớp bằng cách giao các danh sách posting của từ khóa
+        Trả về None nếu từ khóa quá ngắn để dùng chỉ mục
+        """
+        if len(normalized_keyword) < NGRAM_SIZE:
+            return None
+        if self.postings is None:
+            self.build_postings()
+
+        postings = []
+        for ngram in text_ngrams(normalized_keyword):
+            posting = self.postings.get(ngram)
+            if not posting:
+                return set()
+            postings.append(posting)
+
+        # Giao từ danh sách ngắn nhất để tập trung gian luôn nhỏ
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+    def estimate(self, normalized_keyword):
+        """
+        Ước lượng nhanh số ứng viên (cận trên: độ dài danh sách posting ngắn nhất)
+        mà không phải giao các danh sách, None nếu từ khóa quá ngắn để dùng chỉ mục
+        """
+        if len(normalized_keyword) < NGRAM_SIZE:
+            return None
+        if self.postings is None:
+            self.build_postings()
+        return min(len(self.postings.get(ngram, ())) for ngram in text_ngrams(normalized_keyword))
+
+    def search(self, keyword, candidate_ids=None):
+        """
+        Trả về danh sách ID có chuỗi tìm kiếm chứa từ khóa, theo thứ tự thêm vào
+        Nếu có candidate_ids thì chỉ kiểm tra trong các ID đó
+        """
+        normalized_keyword = normalize_text(keyword.strip())
+        if not normalized_keyword:
+            return []
+
+        texts = self.texts
+        if candidate_ids is None:
+            candidate_ids = self.candidates(normalized_keyword)
+            if candidate_ids is None:
+                # Từ khóa ngắn hơn một trigram: quét toàn bộ chuỗi đã chuẩn hóa
+                return [customer_id for customer_id, text in texts.items() if normalized_keyword in text]
+            candidate_ids = sorted(candidate_ids, key=self.sequence.__getitem__)
+
+        # Kiểm tra lại từng ứng viên vì giao các trigram chưa chắc đã khớp cả chuỗi
+        return [customer_id for customer_id in candidate_ids
+                if normalized_keyword in texts.get(customer_id, "")]
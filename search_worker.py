@@ -0,0 +1,38 @@
+import threading
+
+class SearchWorker:
+    def __init__(self, name="search"):
+        """
+        Một luồng tìm kiếm chạy nền dùng suốt phiên làm việc
+        Chỉ giữ một việc đang chờ: việc mới gửi tới thay thế việc cũ chưa kịp chạy,
+        nên khi gõ nhanh chỉ từ khóa mới nhất được tìm
+        """
+        self.name = name
+        self.condition = threading.Condition()
+        self.pending = None
+        self.thread = None
+
+    def submit(self, task):
+        """
+        Gửi việc cần chạy (hàm không tham số), thay thế việc đang chờ nếu có
+        """
+        with self.condition:
+            self.pending = task
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def run(self):
+        """
+        Vòng lặp của luồng tìm kiếm: chờ việc mới nhất rồi chạy
+        """
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                task, self.pending = self.pending, None
+            try:
+                task()
+            except Exception as e:
+                print(f"Lỗi khi tìm kiếm ({self.name}): {e}")
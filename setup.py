@@ -3,7 +3,7 @@ from cx_Freeze import setup, Executable
 
 # Các thư viện phụ thuộc
 build_exe_options = {
-    "packages": ["tkinter", "PIL", "json", "requests", "os", "threading", "datetime", "hashlib"],
+    "packages": ["tkinter", "PIL", "json", "requests", "os", "threading", "datetime", "hashlib", "numpy"],
     "excludes": [],
     "include_files": ["customers.json", "users.json"],
 }
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import pickle
+import config
+from safe_writer import atomic_write
+
+# Tăng số phiên bản khi thay đổi định dạng file cache để bỏ qua cache cũ
+SNAPSHOT_VERSION = 1
+
+def snapshot_path(source_file):
+    """
+    Đường dẫn file cache nhị phân đặt cạnh file dữ liệu
+    """
+    return f"{source_file}.cache"
+
+def file_hash(path):
+    """
+    Tính mã băm BLAKE2b của nội dung file (đọc theo từng khối 1 MB)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_snapshot(source_file):
+    """
+    Đọc dữ liệu từ file cache nếu cache còn khớp với file nguồn, ngược lại trả về None
+    Cache khớp khi cùng kích thước và cùng mtime; nếu chỉ khác mtime (file bị chạm
+    hoặc sao chép lại) thì so thêm mã băm nội dung
+    File cache do chính ứng dụng ghi ra nên được đọc bằng pickle
+    """
+    if not config.SNAPSHOT_CACHE:
+        return None
+    cache_file = snapshot_path(source_file)
+    try:
+        if not os.path.exists(cache_file) or not os.path.exists(source_file):
+            return None
+        stat = os.stat(source_file)
+        with open(cache_file, 'rb') as file:
+            header = pickle.load(file)
+            if header.get("version") != SNAPSHOT_VERSION or header.get("size") != stat.st_size:
+                return None
+            if header.get("mtime_ns") != stat.st_mtime_ns and header.get("hash") != file_hash(source_file):
+                return None
+            data = pickle.load(file)
+        print(f"Đã tải dữ liệu từ cache {cache_file}")
+        return data
+    except Exception as e:
+        print(f"Bỏ qua cache {cache_file}: {e}")
+        return None
+
+def save_snapshot(source_file, data):
+    """
+    Ghi dữ liệu ra file cache nhị phân (pickle protocol 5) kèm kích thước, mtime và mã băm file nguồn
+    """
+    if not config.SNAPSHOT_CACHE:
+        return False
+    cache_file = snapshot_path(source_file)
+    try:
+        stat = os.stat(source_file)
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": file_hash(source_file),
+        }
+
+        def write(file):
+            pickle.dump(header, file, protocol=5)
+            pickle.dump(data, file, protocol=5)
+
+        atomic_write(cache_file, write, binary=True)
+        return True
+    except Exception as e:
+        print(f"Lỗi khi ghi cache {cache_file}: {e}")
+        return False
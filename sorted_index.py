@@ -0,0 +1,147 @@
+from bisect import bisect_left, bisect_right
+
+# Số thay đổi tối đa được chèn/xóa từng phần tử bằng bisect, nhiều hơn thì gộp một lần
+# (chèn vào giữa danh sách lớn tốn O(N) mỗi lần)
+INCREMENTAL_LIMIT = 256
+
+class SortedIndex:
+    def __init__(self, key_func):
+        """
+        Chỉ mục sắp xếp theo một khóa: hai danh sách song song keys (đã sắp xếp) và ids
+        Tìm theo khoảng giá trị bằng bisect, thêm/xóa một phần tử không phải sắp xếp lại
+        key_func(customer) trả về khóa so sánh được, None nếu khách hàng không có giá trị
+        (khách hàng đó được giữ riêng trong unkeyed, theo thứ tự thêm vào)
+        """
+        self.key_func = key_func
+        self.keys = []
+        self.ids = []
+        # id -> khóa hiện tại, dùng để tìm lại vị trí khi xóa
+        self.key_of = {}
+        # Các ID không có khóa (dict dùng như tập hợp có thứ tự)
+        self.unkeyed = {}
+
+    def __len__(self):
+        """
+        Số khách hàng có khóa trong chỉ mục
+        """
+        return len(self.ids)
+
+    def build(self, customers):
+        """
+        Dựng lại chỉ mục từ danh sách khách hàng (các khóa bằng nhau giữ thứ tự trong danh sách)
+        """
+        key_of = {}
+        unkeyed = {}
+        for customer in customers:
+            key = self.key_func(customer)
+            if key is not None:
+                key_of[str(customer.get("id", ""))] = key
+            else:
+                unkeyed[str(customer.get("id", ""))] = None
+        self.key_of = key_of
+        self.unkeyed = unkeyed
+        self.ids = sorted(key_of, key=key_of.__getitem__)
+        self.keys = [key_of[customer_id] for customer_id in self.ids]
+
+    def add(self, customer):
+        """
+        Thêm hoặc cập nhật vị trí của một khách hàng
+        """
+        customer_id = str(customer.get("id", ""))
+        key = self.key_func(customer)
+        old_key = self.key_of.get(customer_id)
+        if old_key is not None and old_key == key:
+            return
+        self.remove(customer_id)
+        if key is None:
+            self.unkeyed[customer_id] = None
+            return
+        position = bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.ids.insert(position, customer_id)
+        self.key_of[customer_id] = key
+
+    def remove(self, customer_id):
+        """
+        Xóa khách hàng khỏi chỉ mục
+        """
+        customer_id = str(customer_id)
+        self.unkeyed.pop(customer_id, None)
+        key = self.key_of.pop(customer_id, None)
+        if key is None:
+            return
+        start = bisect_left(self.keys, key)
+        end = bisect_right(self.keys, key, start)
+        position = self.ids.index(customer_id, start, end)
+        del self.keys[position]
+        del self.ids[position]
+
+    def update_many(self, changes):
+        """
+        Áp dụng nhiều thay đổi: changes là dict id -> khách hàng (None nếu đã bị xóa)
+        Ít thay đổi thì chèn/xóa từng phần tử, nhiều thì lọc bỏ các ID thay đổi trong một lượt
+        rồi trộn các khóa mới (đã sắp xếp) vào danh sách cũ: O(N + k log k) thay vì sắp xếp lại
+        """
+        if len(changes) <= INCREMENTAL_LIMIT:
+            for customer_id, customer in changes.items():
+                if customer is None:
+                    self.remove(customer_id)
+                else:
+                    self.add(customer)
+            return
+
+        for customer_id in changes:
+            self.unkeyed.pop(customer_id, None)
+            self.key_of.pop(customer_id, None)
+        keep = [position for position, customer_id in enumerate(self.ids) if customer_id not in changes]
+        keys = [self.keys[position] for position in keep]
+        ids = [self.ids[position] for position in keep]
+        for customer_id, customer in changes.items():
+            if customer is None:
+                continue
+            key = self.key_func(customer)
+            if key is None:
+                self.unkeyed[customer_id] = None
+                continue
+            self.key_of[customer_id] = key
+            keys.append(key)
+            ids.append(customer_id)
+        # Danh sách gồm hai đoạn đã sắp xếp (đoạn cũ, đoạn mới chưa sắp xếp được sắp riêng),
+        # sắp xếp ổn định của Python nhận ra đoạn cũ nên chi phí gần như chỉ là trộn
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[position] for position in order]
+        self.ids = [ids[position] for position in order]
+
+    def bounds(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """
+        Vị trí [start, end) của các khóa nằm trong khoảng (None là không giới hạn)
+        """
+        start = 0
+        end = len(self.keys)
+        if low is not None:
+            start = bisect_left(self.keys, low) if low_inclusive else bisect_right(self.keys, low)
+        if high is not None:
+            end = bisect_right(self.keys, high) if high_inclusive else bisect_left(self.keys, high)
+        return start, max(start, end)
+
+    def count(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """
+        Số khách hàng có khóa nằm trong khoảng (chỉ cần bisect, không duyệt)
+        """
+        start, end = self.bounds(low, high, low_inclusive, high_inclusive)
+        return end - start
+
+    def range_ids(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """
+        Danh sách ID có khóa nằm trong khoảng, theo thứ tự tăng dần của khóa
+        """
+        start, end = self.bounds(low, high, low_inclusive, high_inclusive)
+        return self.ids[start:end]
+
+    def ordered_ids(self, descending=False):
+        """
+        Toàn bộ ID theo thứ tự khóa (tăng hoặc giảm dần), các ID không có khóa luôn nằm cuối
+        """
+        ids = self.ids[::-1] if descending else list(self.ids)
+        ids.extend(self.unkeyed)
+        return ids
@@ -0,0 +1,401 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from customer_manager import BaseCustomerManager, CustomerManager
+from search_index import normalize_text, build_search_text, vietnamese_sort_key
+from customer_query import parse_query, SORT_KEYS
+
+# Các cột được lưu riêng, các trường khác được lưu trong cột extra dạng JSON
+CUSTOMER_COLUMNS = ("id", "name", "email", "phone", "address", "gender", "age",
+                    "picture", "created_at", "updated_at")
+
+class SQLiteCustomerManager(BaseCustomerManager):
+    def __init__(self, db_file="customers.db"):
+        """
+        Khởi tạo CustomerManager lưu trữ trên SQLite
+        Dữ liệu không được nạp hết vào bộ nhớ, mọi truy vấn đi qua chỉ mục của SQLite
+        """
+        self.db_file = db_file
+        self.connection = None
+        # Kết nối chính chỉ dùng trên luồng đã mở nó (luồng giao diện); các luồng tìm kiếm
+        # chạy nền dùng kết nối chỉ đọc riêng nên chỉ thấy dữ liệu đã xác nhận
+        self.owner_thread = None
+        self.thread_connections = threading.local()
+        # Giá trị PRAGMA data_version lần gần nhất, đổi khi kết nối khác ghi vào CSDL
+        self.data_version = None
+        super().__init__(db_file)
+        self.load_data()
+
+    def load_data(self):
+        """
+        Mở kết nối tới cơ sở dữ liệu và tạo bảng, chỉ mục nếu chưa có
+        """
+        try:
+            if self.connection is None:
+                self.connection = self.open_connection()
+                self.owner_thread = threading.get_ident()
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute("PRAGMA synchronous=NORMAL")
+                create_schema(self.connection)
+                self.id_allocator.reset(high_water=self.max_customer_number())
+            data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self.data_version:
+                self.data_version = data_version
+                self.generation += 1
+            print(f"Đã mở cơ sở dữ liệu {self.db_file}, số lượng khách hàng: {self.count_customers()}")
+            return True
+        except Exception as e:
+            print(f"Lỗi khi mở cơ sở dữ liệu: {e}")
+            return False
+
+    def open_connection(self, read_only=False):
+        """
+        Mở một kết nối tới cơ sở dữ liệu kèm các hàm và thứ tự so sánh dùng trong truy vấn
+        """
+        if read_only:
+            uri = "file:" + os.path.abspath(self.db_file).replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+            connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            connection = sqlite3.connect(self.db_file, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        # Hàm bỏ dấu dùng trong điều kiện của truy vấn có cấu trúc
+        connection.create_function("normalize_text", 1, normalize_text, deterministic=True)
+        # Thứ tự từ điển tiếng Việt khi sắp xếp theo tên
+        connection.create_collation("vietnamese", compare_vietnamese)
+        return connection
+
+    def read_connection(self):
+        """
+        Kết nối dùng để đọc: kết nối chính nếu đang ở luồng đã mở nó,
+        ngược lại là kết nối chỉ đọc riêng của luồng hiện tại (mở khi cần)
+        Kết nối chỉ đọc không thấy thay đổi chưa xác nhận (ví dụ đang trong batch())
+        và không dùng chung con trỏ với các lệnh ghi của luồng giao diện
+        """
+        if threading.get_ident() == self.owner_thread:
+            return self.connection
+        connection = getattr(self.thread_connections, "connection", None)
+        if connection is None:
+            connection = self.open_connection(read_only=True)
+            self.thread_connections.connection = connection
+        return connection
+
+    def reload_if_changed(self, force=False):
+        """
+        SQLite luôn đọc dữ liệu mới nhất nên không cần tải lại,
+        chỉ kiểm tra data_version để biết có tiến trình khác vừa ghi hay không
+        """
+        return self.load_data()
+
+    def save_data(self):
+        """
+        Xác nhận các thay đổi đang chờ vào cơ sở dữ liệu
+        """
+        try:
+            self.connection.commit()
+            self.generation += 1
+            return True
+        except Exception as e:
+            print(f"Lỗi khi lưu dữ liệu: {e}")
+            return False
+
+    def compact(self):
+        """
+        SQLite tự quản lý việc ghi nên chỉ cần xác nhận thay đổi
+        """
+        return self.save_data()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Thực hiện thay đổi trong giao dịch: tự xác nhận khi xong, hoàn tác khi lỗi
+        Nếu đang trong batch() thì việc xác nhận được để tới cuối batch
+        """
+        if self.batch_depth:
+            yield self.connection
+        else:
+            with self.connection:
+                yield self.connection
+            self.id_allocator.save_state()
+        self.generation += 1
+
+    def begin_batch(self):
+        """
+        Giao dịch batch() dùng chính giao dịch của SQLite nên không cần sao lưu
+        """
+        self.batch_entries = []
+
+    def commit_batch(self):
+        """
+        Xác nhận mọi thay đổi trong batch() một lần
+        """
+        if not self.save_data():
+            return False
+        return self.id_allocator.save_state()
+
+    def rollback_batch(self):
+        """
+        Hoàn tác mọi thay đổi trong batch()
+        Các ID đã cấp trong giao dịch không được cấp lại
+        """
+        self.connection.rollback()
+        self.id_allocator.reset(high_water=max(self.id_allocator.high_water, self.max_customer_number()))
+        self.id_allocator.save_state()
+        self.generation += 1
+        print("Đã hoàn tác các thay đổi trong giao dịch")
+
+    def count_customers(self):
+        """
+        Đếm số lượng khách hàng
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+    def max_customer_number(self):
+        """
+        Lấy phần số lớn nhất trong các ID dạng KHxxxx
+        """
+        row = self.connection.execute(
+            "SELECT MAX(CAST(substr(id, 3) AS INTEGER)) FROM customers WHERE id GLOB 'KH[0-9]*'").fetchone()
+        return row[0] or 0
+
+    def customer_id_exists(self, customer_id):
+        """
+        Kiểm tra ID khách hàng đã tồn tại chưa (dùng khóa chính)
+        """
+        row = self.connection.execute("SELECT 1 FROM customers WHERE id = ?", (customer_id,)).fetchone()
+        return row is not None
+
+    def add_customer(self, customer_data):
+        """
+        Thêm một khách hàng mới
+        """
+        self.prepare_customer_data(customer_data)
+
+        customer_id = self.generate_customer_id()
+        customer_data["id"] = customer_id
+        customer_data["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        with self.transaction() as connection:
+            connection.execute(INSERT_SQL, customer_to_row(customer_data))
+        return customer_id
+
+    def import_customers(self, customers):
+        """
+        Thêm danh sách khách hàng đã được định dạng sẵn trong một giao dịch
+        """
+        try:
+            with self.transaction() as connection:
+                connection.executemany(INSERT_SQL, (customer_to_row(c) for c in customers))
+            return True
+        except Exception as e:
+            print(f"Lỗi khi thêm khách hàng vào cơ sở dữ liệu: {e}")
+            return False
+
+    def get_all_customers(self):
+        """
+        Lấy toàn bộ danh sách khách hàng
+        """
+        rows = self.connection.execute("SELECT * FROM customers ORDER BY rowid")
+        return [row_to_customer(row) for row in rows]
+
+    def get_sorted_customers(self, field="name", descending=False):
+        """
+        Lấy danh sách khách hàng sắp xếp theo trường, SQLite dùng chỉ mục của cột nếu có
+        Khách hàng không có giá trị ở trường đó nằm cuối danh sách
+        """
+        if field not in SORT_KEYS:
+            raise ValueError(f"Không thể sắp xếp theo trường {field}")
+        direction = "DESC" if descending else "ASC"
+        # ID so sánh theo độ dài trước để phần số được so theo giá trị (KH9999 < KH10000)
+        order_columns = SORT_COLUMNS.get(field, (field,))
+        order = ", ".join(f"{column} {direction}" for column in order_columns)
+        rows = self.connection.execute(
+            f"SELECT * FROM customers ORDER BY NULLIF({field}, '') IS NULL, {order}, rowid")
+        return [row_to_customer(row) for row in rows]
+
+    def get_customer_by_id(self, customer_id):
+        """
+        Tìm khách hàng theo ID
+        """
+        row = self.connection.execute("SELECT * FROM customers WHERE id = ?", (str(customer_id),)).fetchone()
+        return row_to_customer(row) if row else None
+
+    def update_customer(self, customer_id, updated_data):
+        """
+        Cập nhật thông tin khách hàng
+        """
+        customer = self.get_customer_by_id(customer_id)
+        if not customer:
+            return False
+
+        self.prepare_customer_data(updated_data)
+
+        # Giữ lại ID và thời gian tạo
+        updated_data["id"] = customer_id
+        updated_data["created_at"] = customer.get("created_at")
+        updated_data["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        with self.transaction() as connection:
+            connection.execute(UPDATE_SQL, customer_to_row(updated_data)[1:] + (customer_id,))
+        return True
+
+    def delete_customer(self, customer_id):
+        """
+        Xóa một khách hàng theo ID
+        """
+        with self.transaction() as connection:
+            cursor = connection.execute("DELETE FROM customers WHERE id = ?", (customer_id,))
+        return cursor.rowcount > 0
+
+    def add_customers(self, customers_data):
+        """
+        Thêm nhiều khách hàng trong một giao dịch
+        Trả về (danh sách ID đã thêm, danh sách lỗi (vị trí dòng, thông báo))
+        """
+        records, errors = self.prepare_new_customers(customers_data)
+        with self.transaction() as connection:
+            connection.executemany(INSERT_SQL, (customer_to_row(record) for record in records))
+        return [record["id"] for record in records], errors
+
+    def update_customers(self, updates):
+        """
+        Cập nhật nhiều khách hàng trong một giao dịch, updates có dạng {id: các trường cần đổi}
+        Trả về (danh sách ID đã cập nhật, danh sách lỗi (ID, thông báo))
+        """
+        records, errors = self.prepare_updates(updates)
+        with self.transaction() as connection:
+            connection.executemany(UPDATE_SQL, (customer_to_row(record)[1:] + (record["id"],)
+                                                for record in records))
+        return [record["id"] for record in records], errors
+
+    def delete_customers(self, customer_ids):
+        """
+        Xóa nhiều khách hàng theo ID trong một giao dịch
+        Trả về (danh sách ID đã xóa, danh sách lỗi (ID, thông báo))
+        """
+        deleted = []
+        errors = []
+        for customer_id in customer_ids:
+            if self.customer_id_exists(customer_id):
+                deleted.append(customer_id)
+            else:
+                errors.append((customer_id, "Không tìm thấy khách hàng!"))
+        with self.transaction() as connection:
+            connection.executemany("DELETE FROM customers WHERE id = ?", ((customer_id,) for customer_id in deleted))
+        return deleted, errors
+
+    def search_customers(self, keyword, candidates=None):
+        """
+        Tìm kiếm khách hàng theo từ khóa hoặc ID
+        Nếu có candidates (kết quả của lần tìm trước) thì chỉ lọc lại trong danh sách đó
+        Từ khóa rỗng hoặc chỉ có khoảng trắng trả về danh sách rỗng (giống bản lưu JSON)
+        """
+        keyword = (keyword or "").lower().strip()
+        if not keyword:
+            return []
+
+        connection = self.read_connection()
+
+        # Tìm theo ID chính xác trước
+        row = connection.execute("SELECT * FROM customers WHERE id IN (?, ?)",
+                                      (keyword, keyword.upper())).fetchone()
+        if row:
+            return [row_to_customer(row)]
+
+        if candidates is not None:
+            normalized_keyword = normalize_text(keyword)
+            return [customer for customer in candidates if normalized_keyword in build_search_text(customer)]
+
+        # Tìm trong cột đã chuẩn hóa sẵn (không dấu, chữ thường)
+        pattern = "%" + normalize_text(keyword).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = connection.execute(
+            "SELECT * FROM customers WHERE search_text LIKE ? ESCAPE '\\' ORDER BY rowid", (pattern,))
+        return [row_to_customer(row) for row in rows]
+
+    def query_customers(self, query):
+        """
+        Tìm khách hàng bằng truy vấn có cấu trúc: cây điều kiện được chuyển thành câu lệnh SQL,
+        SQLite tự chọn chỉ mục; kết quả được đọc dần từ con trỏ
+        (gọi từ luồng chạy nền thì con trỏ thuộc kết nối chỉ đọc của luồng đó)
+        """
+        where, params = parse_query(query).to_sql()
+        cursor = self.read_connection().execute(f"SELECT * FROM customers WHERE {where} ORDER BY rowid", params)
+        return (row_to_customer(row) for row in cursor)
+
+    def close(self):
+        """
+        Đóng kết nối cơ sở dữ liệu
+        """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+INSERT_SQL = ("INSERT OR REPLACE INTO customers (id, name, email, phone, address, gender, age, picture, "
+              "created_at, updated_at, extra, search_text) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+UPDATE_SQL = ("UPDATE customers SET name = ?, email = ?, phone = ?, address = ?, gender = ?, age = ?, "
+              "picture = ?, created_at = ?, updated_at = ?, extra = ?, search_text = ? WHERE id = ?")
+
+# Biểu thức sắp xếp của các trường cần xử lý riêng
+SORT_COLUMNS = {"name": ("name COLLATE vietnamese",), "id": ("length(id)", "id")}
+
+def create_schema(connection):
+    """
+    Tạo bảng customers và các chỉ mục trên id, phone, email, age, created_at
+    """
+    with connection:
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS customers ("
+            "id TEXT PRIMARY KEY, name TEXT, email TEXT, phone TEXT, address TEXT, gender TEXT, "
+            "age INTEGER, picture TEXT, created_at TEXT, updated_at TEXT, extra TEXT, search_text TEXT)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers (phone)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_customers_email ON customers (email)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_customers_age ON customers (age)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_customers_created_at ON customers (created_at)")
+
+def compare_vietnamese(first, second):
+    """
+    So sánh hai chuỗi theo thứ tự từ điển tiếng Việt (dùng làm collation của SQLite)
+    """
+    first = vietnamese_sort_key(first)
+    second = vietnamese_sort_key(second)
+    return (first > second) - (first < second)
+
+def customer_to_row(customer):
+    """
+    Chuyển dict khách hàng thành bộ giá trị để ghi vào bảng
+    """
+    extra = {key: value for key, value in customer.items() if key not in CUSTOMER_COLUMNS}
+    return tuple(customer.get(column) for column in CUSTOMER_COLUMNS) + (
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+        build_search_text(customer),
+    )
+
+def row_to_customer(row):
+    """
+    Chuyển một dòng của bảng thành dict khách hàng như định dạng JSON
+    """
+    customer = {column: row[column] for column in CUSTOMER_COLUMNS if row[column] is not None}
+    if row["extra"]:
+        customer.update(json.loads(row["extra"]))
+    return customer
+
+def migrate_json_to_sqlite(json_file="customers.json", db_file="customers.db"):
+    """
+    Chuyển toàn bộ dữ liệu khách hàng từ file JSON (kèm nhật ký) sang SQLite
+    """
+    source = CustomerManager(json_file)
+    connection = sqlite3.connect(db_file)
+    try:
+        create_schema(connection)
+        with connection:
+            connection.executemany(INSERT_SQL, (customer_to_row(c) for c in source.get_all_customers()))
+        print(f"Đã chuyển {len(source.get_all_customers())} khách hàng từ {json_file} sang {db_file}")
+        return True
+    except Exception as e:
+        print(f"Lỗi khi chuyển dữ liệu sang SQLite: {e}")
+        return False
+    finally:
+        connection.close()
@@ -0,0 +1,28 @@
+import os
+import sys
+import pytest
+
+# Các module nằm ở thư mục gốc của dự án
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+@pytest.fixture(autouse=True)
+def sync_writes(monkeypatch, tmp_path):
+    """
+    Ghi đồng bộ (không gộp ghi trên luồng nền) và chạy trong thư mục tạm
+    """
+    monkeypatch.setattr(config, "SAVE_ASYNC", False)
+    monkeypatch.chdir(tmp_path)
+
+@pytest.fixture
+def new_customer():
+    """
+    Hàm tạo dữ liệu một khách hàng hợp lệ, có thể đổi từng trường qua tham số
+    """
+    def create(name, **fields):
+        customer = {"name": name, "email": "test@gmail.com", "phone": "0912345678",
+                    "address": "1 Le Loi", "gender": "Nam", "age": 30}
+        customer.update(fields)
+        return customer
+    return create
@@ -0,0 +1,49 @@
+import os
+from PIL import Image
+from avatar_store import AvatarStore
+from user_manager import UserManager
+
+def make_image(path, color, size=(200, 100)):
+    """
+    Ảnh chữ nhật: phần giữa màu color, hai mép trái/phải màu xanh lá
+    """
+    image = Image.new("RGB", size, color)
+    width, height = size
+    image.paste((0, 255, 0), (0, 0, width // 4, height))
+    image.paste((0, 255, 0), (width - width // 4, 0, width, height))
+    image.save(path)
+    return str(path)
+
+def test_thumbnails_are_center_cropped(tmp_path):
+    store = AvatarStore(str(tmp_path / "avatars"), max_size=(400, 400), thumbnail_sizes=[(50, 50)])
+    os.makedirs(store.directory)
+    avatar = store.save(make_image(tmp_path / "wide.png", (255, 0, 0)))
+    with Image.open(avatar["picture_thumbnails"]["50x50"]) as thumbnail:
+        assert thumbnail.size == (50, 50)
+        # Ảnh bị kéo méo thì mép trái sẽ là màu xanh lá
+        red, green, blue = thumbnail.convert("RGB").getpixel((1, 25))
+        assert red > 200 and green < 50
+
+def test_replaced_avatars_are_removed_when_unreferenced(tmp_path):
+    directory = str(tmp_path / "user_images")
+    os.makedirs(directory)
+    store = AvatarStore(directory, max_size=(100, 100), thumbnail_sizes=[(50, 50)])
+    manager = UserManager(str(tmp_path / "users.json"))
+    manager.login("admin", "admin123")
+    manager.register("binh", "secret", "Binh")
+    admin_id = manager.current_user["id"]
+    other_id = next(user["id"] for user in manager.users if user["username"] == "binh")
+
+    shared = store.save(make_image(tmp_path / "a.png", (255, 0, 0)))
+    manager.update_user(admin_id, shared)
+    manager.update_user(other_id, dict(shared))
+    shared_files = [shared["picture"]] + list(shared["picture_thumbnails"].values())
+
+    # Người dùng thứ hai vẫn dùng ảnh cũ nên file chưa bị xóa
+    manager.update_user(admin_id, store.save(make_image(tmp_path / "b.png", (0, 0, 255))))
+    assert all(os.path.exists(path) for path in shared_files)
+
+    manager.delete_user(other_id)
+    assert not any(os.path.exists(path) for path in shared_files)
+    assert all(os.path.exists(path) for path in
+               [manager.current_user["picture"]] + list(manager.current_user["picture_thumbnails"].values()))
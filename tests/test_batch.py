@@ -0,0 +1,45 @@
+import pytest
+from customer_manager import CustomerManager
+from sqlite_customer_manager import SQLiteCustomerManager
+
+@pytest.fixture(params=["json", "sqlite"])
+def manager_factory(request, tmp_path):
+    """
+    Tạo CustomerManager theo từng kiểu lưu trữ (gọi lại để mô phỏng khởi động lại)
+    """
+    if request.param == "sqlite":
+        managers = []
+
+        def create():
+            for manager in managers:
+                manager.close()
+            managers.append(SQLiteCustomerManager(str(tmp_path / "customers.db")))
+            return managers[-1]
+        yield create
+        for manager in managers:
+            manager.close()
+    else:
+        yield lambda: CustomerManager(str(tmp_path / "customers.json"))
+
+def test_ids_from_rolled_back_batch_are_not_reissued(manager_factory, new_customer):
+    manager = manager_factory()
+    first_id = manager.add_customer(new_customer("An"))
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            rolled_back_id = manager.add_customer(new_customer("Binh"))
+            raise RuntimeError("hủy giao dịch")
+
+    assert manager.get_customer_by_id(rolled_back_id) is None
+    next_id = manager.add_customer(new_customer("Chi"))
+    assert next_id not in (first_id, rolled_back_id)
+    manager.flush()
+
+    # Sau khi khởi động lại, ID đã cấp trong giao dịch bị hoàn tác vẫn không được cấp lại
+    manager = manager_factory()
+    assert manager.add_customer(new_customer("Dung")) not in (first_id, rolled_back_id, next_id)
+
+def test_blank_keyword_returns_no_results(manager_factory, new_customer):
+    manager = manager_factory()
+    manager.add_customer(new_customer("Nguyen Van A"))
+    assert manager.search_customers("") == []
+    assert manager.search_customers("   ") == []
@@ -0,0 +1,55 @@
+import pytest
+from customer_analytics import CustomerAnalytics
+from customer_manager import CustomerManager
+
+def imported_customer(number, age, gender, created_at):
+    """
+    Khách hàng đã định dạng sẵn như dữ liệu nhập từ DataCrawler
+    """
+    return {"id": f"KH{number:04d}", "name": f"Khach {number}", "email": "test@gmail.com",
+            "phone": "0912345678", "address": "1 Le Loi", "gender": gender, "age": age,
+            "created_at": created_at}
+
+@pytest.fixture
+def manager(tmp_path):
+    """
+    CustomerManager có sẵn năm khách hàng
+    """
+    manager = CustomerManager(str(tmp_path / "customers.json"))
+    manager.import_customers([
+        imported_customer(1, 15, "Nam", "2025-06-01 08:00:00"),
+        imported_customer(2, 25, "Nữ", "2025-06-01 09:30:00"),
+        imported_customer(3, 35, "Nữ", "2025-06-02 10:00:00"),
+        imported_customer(4, 45, "Khác", "2025-07-15 12:00:00"),
+        imported_customer(5, "", "Nam", ""),
+    ])
+    return manager
+
+def test_statistics_values(manager):
+    analytics = CustomerAnalytics(manager)
+    assert analytics.gender_counts() == {"Nam": 2, "Nữ": 2, "Khác": 1}
+    histogram = analytics.age_histogram()
+    assert histogram[1] == (10, 20, 1) and histogram[4] == (40, 50, 1)
+    assert sum(count for _, _, count in histogram) == 4
+    assert analytics.age_percentiles((50,)) == {50: 30.0}
+    assert analytics.signups_per_day() == [("2025-06-01", 2), ("2025-06-02", 1), ("2025-07-15", 1)]
+    assert analytics.signups_per_month() == [("2025-06", 3), ("2025-07", 1)]
+
+def test_listener_keeps_columns_in_sync_after_swap_remove(manager, monkeypatch, new_customer):
+    analytics = CustomerAnalytics(manager)
+    analytics.refresh()
+    rebuilds = []
+    rebuild = analytics.rebuild
+    monkeypatch.setattr(analytics, "rebuild", lambda: rebuilds.append(1) or rebuild())
+
+    manager.delete_customer("KH0002")
+    manager.update_customer("KH0001", new_customer("Khach 1", age=55, gender="Nữ"))
+    manager.add_customer(new_customer("Khach moi", age=65))
+    assert analytics.synced_generation == manager.generation
+    assert analytics.positions == {customer_id: position for position, customer_id in enumerate(analytics.ids)}
+
+    fresh = CustomerAnalytics(manager)
+    assert analytics.summary() == fresh.summary()
+    assert analytics.gender_counts() == {"Nam": 2, "Nữ": 2, "Khác": 1}
+    # Các cột được cập nhật theo từng thay đổi, không phải dựng lại toàn bộ
+    assert rebuilds == []
@@ -0,0 +1,46 @@
+from customer_manager import CustomerManager
+
+def assert_index_consistent(manager):
+    """
+    Chỉ mục theo ID và vị trí phải khớp với danh sách khách hàng
+    """
+    assert len(manager.customer_index) == len(manager.customers) == len(manager.customer_positions)
+    for position, customer in enumerate(manager.customers):
+        customer_id = customer["id"]
+        assert manager.customer_index[customer_id] is customer
+        assert manager.customer_positions[customer_id] == position
+
+def test_lookup_uses_index(tmp_path, new_customer):
+    manager = CustomerManager(str(tmp_path / "customers.json"))
+    ids = [manager.add_customer(new_customer(f"Khach {number}")) for number in range(5)]
+    # Tra cứu qua dict, không quét danh sách
+    manager.customers.reverse()
+    assert manager.get_customer_by_id(ids[3])["name"] == "Khach 3"
+    assert manager.customer_id_exists(ids[4])
+    assert manager.get_customer_by_id("KH9999") is None
+
+def test_delete_swaps_last_customer_into_place(tmp_path, new_customer):
+    manager = CustomerManager(str(tmp_path / "customers.json"))
+    ids = [manager.add_customer(new_customer(f"Khach {number}")) for number in range(5)]
+    assert manager.delete_customer(ids[1])
+    assert [customer["id"] for customer in manager.customers] == [ids[0], ids[4], ids[2], ids[3]]
+    assert not manager.delete_customer(ids[1])
+    assert manager.delete_customer(ids[3])
+    assert [customer["id"] for customer in manager.customers] == [ids[0], ids[4], ids[2]]
+    assert_index_consistent(manager)
+
+def test_index_consistent_after_update_and_replay(tmp_path, new_customer):
+    data_file = str(tmp_path / "customers.json")
+    manager = CustomerManager(data_file)
+    ids = [manager.add_customer(new_customer(f"Khach {number}")) for number in range(6)]
+    manager.delete_customers([ids[0], ids[2]])
+    assert manager.update_customer(ids[5], new_customer("Khach moi"))
+    assert_index_consistent(manager)
+    assert manager.get_customer_by_id(ids[5])["name"] == "Khach moi"
+    manager.flush()
+
+    # Khởi động lại: danh sách được dựng từ file chính và nhật ký
+    reopened = CustomerManager(data_file)
+    assert_index_consistent(reopened)
+    assert sorted(reopened.customer_index) == sorted([ids[1], ids[3], ids[4], ids[5]])
+    assert reopened.get_customer_by_id(ids[5])["name"] == "Khach moi"
@@ -0,0 +1,18 @@
+from customer_manager import CustomerManager
+from customer_query import is_structured_query
+
+def test_negated_condition_is_structured_query():
+    assert is_structured_query("-gender:Nam")
+    assert is_structured_query("(-gender:Nam)")
+    assert is_structured_query("age:>30 -gender:Nam")
+    assert not is_structured_query("nguyen-van")
+
+def test_negated_condition_excludes_matches(tmp_path, new_customer):
+    manager = CustomerManager(str(tmp_path / "customers.json"))
+    ids = {}
+    for name, gender in (("An", "Nam"), ("Binh", "Nữ"), ("Chi", "Nữ")):
+        ids[name] = manager.add_customer(new_customer(name, gender=gender))
+
+    results = [customer["id"] for customer in manager.query_customers("-gender:Nam")]
+
+    assert results == [ids["Binh"], ids["Chi"]]
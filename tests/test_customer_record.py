@@ -0,0 +1,30 @@
+import json
+import pickle
+from customer_record import CustomerRecord, MISSING
+
+def test_pickle_round_trip_keeps_fields_and_extra_keys():
+    data = {"id": "KH0001", "name": "An", "age": 30, "note": "VIP", "tags": ["a"]}
+    record = CustomerRecord(data)
+    restored = pickle.loads(pickle.dumps(record, protocol=5))
+    assert isinstance(restored, CustomerRecord)
+    assert restored == data
+    assert "email" not in restored
+    assert restored.email is MISSING
+    assert restored["note"] == "VIP"
+
+def test_record_behaves_like_dict():
+    data = {"id": "KH0001", "name": "An", "picture": None, "note": "VIP"}
+    record = CustomerRecord(data)
+    assert record == data and data == record
+    assert record != dict(data, name="Binh")
+    # None khác với trường không có
+    assert "picture" in record and record.get("picture", "x") is None
+    assert record.get("email", "") == ""
+    assert list(record) == ["id", "name", "picture", "note"]
+    assert len(record) == 4
+    assert json.loads(json.dumps(dict(record))) == data
+
+    record["email"] = "an@gmail.com"
+    del record["note"]
+    assert dict(record) == {"id": "KH0001", "name": "An", "email": "an@gmail.com", "picture": None}
+    assert CustomerRecord.from_mapping(record) is record
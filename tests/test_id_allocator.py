@@ -0,0 +1,42 @@
+import os
+from unittest import mock
+from id_allocator import IdAllocator
+from customer_manager import CustomerManager
+
+def test_failed_state_write_keeps_previous_file(tmp_path):
+    state_file = str(tmp_path / "customers.json.ids")
+    allocator = IdAllocator("KH", state_file=state_file)
+    allocator.allocate_many(5)
+    assert allocator.save_state()
+
+    allocator.allocate_many(5)
+    # Sự cố giữa chừng khi đang ghi: file trạng thái cũ phải còn nguyên
+    with mock.patch("os.replace", side_effect=OSError("mất điện")):
+        assert not allocator.save_state()
+
+    assert IdAllocator("KH", state_file=state_file).high_water == 5
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+    assert allocator.save_state()
+    assert IdAllocator("KH", state_file=state_file).high_water == 10
+
+def test_deleted_highest_id_is_not_reissued_after_restart(tmp_path, new_customer):
+    data_file = str(tmp_path / "customers.json")
+    manager = CustomerManager(data_file)
+    ids = [manager.add_customer(new_customer(f"Khach {number}")) for number in range(3)]
+    assert ids == ["KH0001", "KH0002", "KH0003"]
+    manager.delete_customer(ids[-1])
+    manager.flush()
+
+    manager = CustomerManager(data_file)
+    assert manager.id_allocator.high_water == 3
+    assert manager.add_customer(new_customer("Khach moi")) == "KH0004"
+
+def test_allocation_skips_used_ids_and_widens_past_width():
+    allocator = IdAllocator("KH")
+    allocator.reset(["KH0002", "legacy"])
+    # Không cấp lại các số nhỏ hơn mốc cao nhất
+    assert allocator.allocate_many(2) == ["KH0003", "KH0004"]
+    allocator.restore({"KH0003"}, high_water=1)
+    assert allocator.allocate_many(2) == ["KH0002", "KH0004"]
+    allocator.reset(["KH9999"])
+    assert allocator.allocate() == "KH10000"
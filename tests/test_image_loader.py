@@ -0,0 +1,79 @@
+from image_loader import ImageLoader
+
+class FakeRoot:
+    def __init__(self):
+        """
+        Thay cho cửa sổ Tk: chỉ ghi lại các lần lên lịch root.after
+        """
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        """
+        Ghi lại lịch kiểm tra kết quả và trả về ID giả
+        """
+        self.scheduled.append(callback)
+        return len(self.scheduled)
+
+    def after_cancel(self, after_id):
+        """
+        Hủy lịch (không cần làm gì)
+        """
+
+def make_loader():
+    """
+    Tạo ImageLoader không có luồng tải để kiểm tra hàng đợi trực tiếp
+    """
+    return ImageLoader(FakeRoot(), workers=0, timeout=60, poll_ms=10)
+
+def test_same_url_and_size_share_one_download():
+    loader = make_loader()
+    first = loader.load("http://example.com/a.png", lambda photo, error: None, (50, 50))
+    second = loader.load("http://example.com/a.png", lambda photo, error: None, (50, 50))
+    other_size = loader.load("http://example.com/a.png", lambda photo, error: None, (100, 100))
+
+    assert loader.work_queue.qsize() == 2
+    assert loader.jobs[first.key] == [first, second]
+    assert loader.jobs[other_size.key] == [other_size]
+    # Chỉ lên lịch kiểm tra kết quả một lần dù có nhiều yêu cầu
+    assert len(loader.root.scheduled) == 1
+
+def test_cancelled_job_is_dropped_before_download():
+    loader = make_loader()
+    first = loader.load("http://example.com/a.png", lambda photo, error: None)
+    second = loader.load("http://example.com/a.png", lambda photo, error: None)
+
+    loader.cancel(first)
+    assert loader.has_waiting_requests(first.key)
+    loader.cancel(second)
+    assert not loader.has_waiting_requests(first.key)
+    assert first.key not in loader.jobs
+
+def test_cancel_owner_only_cancels_that_window():
+    loader = make_loader()
+    window, other_window = object(), object()
+    mine = loader.load("http://example.com/a.png", lambda photo, error: None, owner=window)
+    theirs = loader.load("http://example.com/b.png", lambda photo, error: None, owner=other_window)
+
+    loader.cancel_owner(window)
+    assert mine.cancelled and not theirs.cancelled
+    assert not loader.has_waiting_requests(mine.key)
+    assert loader.has_waiting_requests(theirs.key)
+
+def test_cancelled_request_is_not_delivered():
+    loader = make_loader()
+    delivered = []
+    request = loader.load("http://example.com/a.png", lambda photo, error: delivered.append(error))
+    loader.cancel(request)
+    loader.deliver(request, None, "lỗi")
+    assert delivered == []
+
+def test_cached_photo_is_returned_without_queueing():
+    loader = make_loader()
+    key = ("http://example.com/a.png", (150, 150))
+    photo = object()
+    loader.cache.size_func = lambda value: 0
+    loader.cache.put(key, photo)
+    delivered = []
+    assert loader.load(key[0], lambda photo, error: delivered.append(photo)) is None
+    assert delivered == [photo]
+    assert loader.work_queue.qsize() == 0
@@ -0,0 +1,50 @@
+from customer_manager import CustomerManager
+from journal import ChangeJournal
+
+def test_replay_truncates_partial_last_line(tmp_path):
+    path = tmp_path / "customers.json.journal"
+    journal = ChangeJournal(str(path))
+    journal.append({"op": "delete", "id": "KH0001"})
+    # Sự cố khi đang ghi: dòng cuối chỉ được ghi một phần
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('{"op":"delete","id":"KH')
+
+    assert [entry["id"] for entry in ChangeJournal(str(path)).replay()] == ["KH0001"]
+    journal = ChangeJournal(str(path))
+    list(journal.replay())
+    journal.append({"op": "delete", "id": "KH0002"})
+
+    assert [entry["id"] for entry in ChangeJournal(str(path)).replay()] == ["KH0001", "KH0002"]
+
+def test_customer_added_after_crash_survives_restart(tmp_path, new_customer):
+    data_file = str(tmp_path / "customers.json")
+    manager = CustomerManager(data_file)
+    first_id = manager.add_customer(new_customer("An"))
+    manager.flush()
+    with open(manager.journal.journal_file, 'a', encoding='utf-8') as file:
+        file.write('{"op":"add","record":{"id":"KH')
+
+    manager = CustomerManager(data_file)
+    second_id = manager.add_customer(new_customer("Binh"))
+    manager.flush()
+
+    manager = CustomerManager(data_file)
+    assert manager.get_customer_by_id(first_id) is not None
+    assert manager.get_customer_by_id(second_id) is not None
+
+def test_failed_journal_append_requests_snapshot(tmp_path, new_customer):
+    data_file = str(tmp_path / "customers.json")
+    manager = CustomerManager(data_file)
+    append_many = manager.journal.append_many
+    manager.journal.append_many = lambda entries: False
+    customer_id = manager.add_customer(new_customer("An"))
+    # Luồng ghi không tự chụp danh sách mà để luồng sửa dữ liệu lưu toàn bộ
+    assert manager.snapshot_requested
+    assert manager.pending_entries
+
+    manager.journal.append_many = append_many
+    assert manager.flush()
+    assert not manager.snapshot_requested
+
+    manager = CustomerManager(data_file)
+    assert manager.get_customer_by_id(customer_id) is not None
@@ -0,0 +1,19 @@
+from customer_manager import CustomerManager
+
+def test_customer_appended_after_crash_survives_restart(tmp_path, new_customer):
+    data_file = str(tmp_path / "customers.jsonl")
+    manager = CustomerManager(data_file)
+    first_id = manager.add_customer(new_customer("An"))
+    manager.flush()
+    # Sự cố khi đang ghi thêm: dòng cuối của file chính chỉ được ghi một phần
+    with open(data_file, 'a', encoding='utf-8') as file:
+        file.write('{"id":"KH0002","name":"Bi')
+
+    manager = CustomerManager(data_file)
+    second_id = manager.add_customer(new_customer("Binh"))
+    manager.flush()
+
+    manager = CustomerManager(data_file)
+    assert manager.get_customer_by_id(first_id) is not None
+    assert manager.get_customer_by_id(second_id) is not None
+    assert len(manager.get_all_customers()) == 2
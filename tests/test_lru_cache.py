@@ -0,0 +1,49 @@
+from lru_cache import LRUCache
+
+def test_entry_limit_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # Dùng "a" để "b" trở thành mục lâu không dùng nhất
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+def test_byte_limit_evicts_until_under_limit():
+    cache = LRUCache(max_bytes=10, size_func=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("c", "xxxxxxxx")
+    # Phải bỏ cả "a" và "b" để tổng dung lượng không vượt 10
+    assert list(cache.entries) == ["c"]
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 2
+
+def test_replacing_value_updates_byte_total():
+    cache = LRUCache(max_bytes=10, size_func=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xx")
+    cache.put("a", "xxxxxxxx")
+    assert cache.stats()["bytes"] == 10
+    assert len(cache) == 2
+    assert cache.pop("b") == "xx"
+    assert cache.stats()["bytes"] == 8
+
+def test_oversized_value_is_kept_alone():
+    cache = LRUCache(max_bytes=4, size_func=len)
+    cache.put("a", "xx")
+    cache.put("big", "xxxxxxxxxx")
+    assert list(cache.entries) == ["big"]
+    cache.put("b", "x")
+    assert list(cache.entries) == ["b"]
+
+def test_stats_count_hits_and_misses():
+    cache = LRUCache(max_entries=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    assert cache.get("missing", "default") == "default"
+    cache.clear()
+    assert cache.stats() == {"entries": 0, "bytes": 0, "hits": 2, "misses": 1, "evictions": 0}
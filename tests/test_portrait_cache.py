@@ -0,0 +1,58 @@
+import io
+import pytest
+from PIL import Image
+import safe_writer
+from portrait_cache import PortraitCache, load_thumbnail
+
+def test_cache_hits_do_not_rewrite_index(tmp_path):
+    cache = PortraitCache(str(tmp_path / "cache"))
+    cache.put("http://example.com/a.jpg", b"a" * 10)
+    cache.put("http://example.com/b.jpg", b"b" * 10)
+    cache.flush()
+
+    saves = []
+    save_index = cache.writer.commit_func
+    cache.writer.commit_func = lambda: saves.append(1) or save_index()
+    for _ in range(100):
+        assert cache.get("http://example.com/a.jpg") == b"a" * 10
+    assert saves == []
+
+    # Thứ tự LRU mới được ghi khi flush (đóng ứng dụng)
+    cache.flush()
+    assert saves == [1]
+    reopened = PortraitCache(str(tmp_path / "cache"))
+    assert [entry["url"] for entry in reopened.entries.values()] == [
+        "http://example.com/b.jpg", "http://example.com/a.jpg"]
+
+def test_writer_exit_hook_saves_access_order(tmp_path, monkeypatch):
+    hooks = []
+    monkeypatch.setattr(safe_writer.atexit, "register", hooks.append)
+    cache = PortraitCache(str(tmp_path / "cache"))
+    # Chỉ một hàm chạy khi thoát: flush của bộ ghi
+    assert hooks == [cache.writer.flush]
+
+    cache.put("http://example.com/a.jpg", b"a" * 10)
+    cache.put("http://example.com/b.jpg", b"b" * 10)
+    cache.flush()
+    cache.get("http://example.com/a.jpg")
+    hooks[0]()
+    reopened = PortraitCache(str(tmp_path / "cache"))
+    assert [entry["url"] for entry in reopened.entries.values()] == [
+        "http://example.com/b.jpg", "http://example.com/a.jpg"]
+
+@pytest.mark.parametrize("mode, image_format", [("CMYK", "JPEG"), ("P", "PNG"), ("LA", "PNG"), ("I;16", "PNG")])
+def test_thumbnails_of_any_color_mode_are_cached(tmp_path, mode, image_format):
+    cache = PortraitCache(str(tmp_path / "cache"))
+    image = Image.new(mode, (40, 30))
+    if mode == "P":
+        image.info["transparency"] = 0
+    buffer = io.BytesIO()
+    image.save(buffer, image_format)
+    url = f"http://example.com/{mode}.img"
+    cache.put(url, buffer.getvalue())
+
+    thumbnail = load_thumbnail(url, (20, 20), cache)
+    assert thumbnail.size == (20, 20)
+    assert thumbnail.mode in ("RGB", "RGBA", "L")
+    assert load_thumbnail(url, (20, 20), cache).size == (20, 20)
+    assert cache.contains(url, (20, 20))
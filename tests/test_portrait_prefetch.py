@@ -0,0 +1,127 @@
+import io
+import threading
+import time
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+from portrait_cache import PortraitCache
+from portrait_prefetch import prefetch_portraits
+from data_crawler import DataCrawler
+
+def jpeg_bytes():
+    """
+    Nội dung một ảnh JPEG nhỏ
+    """
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 300), (200, 10, 10)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+class StubServer:
+    def __init__(self):
+        """
+        Máy chủ HTTP cục bộ trả ảnh JPEG, đếm số lần gọi mỗi đường dẫn và số yêu cầu đồng thời
+        /flaky: lỗi 500 ở lần gọi đầu tiên, /dead: luôn lỗi 500
+        """
+        self.image = jpeg_bytes()
+        self.hits = {}
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                """
+                Không in nhật ký truy cập
+                """
+
+            def do_GET(self):
+                """
+                Trả ảnh hoặc lỗi theo đường dẫn
+                """
+                with stub.lock:
+                    stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                    attempt = stub.hits[self.path]
+                    stub.active += 1
+                    stub.peak = max(stub.peak, stub.active)
+                time.sleep(0.02)
+                with stub.lock:
+                    stub.active -= 1
+                if self.path.startswith("/dead") or (self.path.startswith("/flaky") and attempt < 2):
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(stub.image)))
+                self.end_headers()
+                self.wfile.write(stub.image)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        """
+        URL đầy đủ của một đường dẫn trên máy chủ
+        """
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def total_hits(self):
+        """
+        Tổng số yêu cầu đã nhận
+        """
+        with self.lock:
+            return sum(self.hits.values())
+
+    def close(self):
+        """
+        Dừng máy chủ
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+def test_prefetch_caches_thumbnails_with_bounded_parallelism(stub, tmp_path):
+    cache = PortraitCache(str(tmp_path / "cache"))
+    urls = [stub.url(f"/p{index}.jpg") for index in range(20)]
+
+    loaded, failed = prefetch_portraits(urls + [urls[0], ""], cache, workers=4, retries=0)
+
+    assert (loaded, failed) == (20, {})
+    assert stub.peak <= 4
+    assert all(cache.contains(url, (150, 150)) and cache.contains(url) for url in urls)
+
+    # Lần tải trước thứ hai không gọi mạng, ảnh vẫn có sau khi mở lại cache
+    hits = stub.total_hits()
+    assert prefetch_portraits(urls, cache) == (0, {})
+    assert stub.total_hits() == hits
+    cache.flush()
+    assert PortraitCache(str(tmp_path / "cache")).contains(urls[5], (150, 150))
+
+def test_prefetch_retries_failed_downloads(stub, tmp_path):
+    cache = PortraitCache(str(tmp_path / "cache"))
+    flaky, dead = stub.url("/flaky.jpg"), stub.url("/dead.jpg")
+
+    loaded, failed = prefetch_portraits([flaky, dead], cache, retries=2, backoff=0.01)
+
+    assert loaded == 1
+    assert list(failed) == [dead]
+    assert stub.hits["/flaky.jpg"] == 2
+    assert stub.hits["/dead.jpg"] == 3
+    assert cache.contains(flaky, (150, 150)) and not cache.contains(dead, (150, 150))
+
+def test_crawler_prefetch_runs_in_background(stub, tmp_path):
+    cache = PortraitCache(str(tmp_path / "cache"))
+    crawler = DataCrawler(customer_manager=object(), portrait_cache=cache)
+    customers = [{"picture": stub.url(f"/c{index}.jpg")} for index in range(5)]
+
+    thread = crawler.start_prefetch(customers)
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert all(cache.contains(customer["picture"], (150, 150)) for customer in customers)
@@ -0,0 +1,34 @@
+import json
+from customer_manager import CustomerManager
+
+def test_reload_skipped_when_files_unchanged(tmp_path, monkeypatch, new_customer):
+    manager = CustomerManager(str(tmp_path / "customers.json"))
+    manager.add_customer(new_customer("An"))
+    loads = []
+    monkeypatch.setattr(manager, "load_data", lambda: loads.append(1) or True)
+
+    # Các thay đổi do chính ứng dụng ghi không làm đọc lại file
+    assert manager.reload_if_changed()
+    manager.add_customer(new_customer("Binh"))
+    assert manager.reload_if_changed()
+    assert loads == []
+    assert manager.reload_if_changed(force=True)
+    assert loads == [1]
+
+def test_reload_after_external_edit(tmp_path, new_customer):
+    data_file = tmp_path / "customers.json"
+    manager = CustomerManager(str(data_file))
+    manager.add_customer(new_customer("An"))
+    manager.compact()
+    generation = manager.generation
+
+    # Tiến trình khác ghi đè file dữ liệu
+    customers = json.loads(data_file.read_text(encoding="utf-8"))
+    customers.append(dict(new_customer("Binh"), id="KH0002"))
+    data_file.write_text(json.dumps(customers), encoding="utf-8")
+
+    assert manager.has_file_changed()
+    assert manager.reload_if_changed()
+    assert manager.generation > generation
+    assert manager.get_customer_by_id("KH0002")["name"] == "Binh"
+    assert not manager.has_file_changed()
@@ -0,0 +1,75 @@
+import customer_manager
+from customer_manager import CustomerManager
+from search_index import SearchIndex, build_postings, build_search_text, normalize_text
+
+def test_postings_built_outside_lock_include_concurrent_changes(tmp_path, monkeypatch, new_customer):
+    manager = CustomerManager(str(tmp_path / "customers.json"))
+    first = manager.add_customer(new_customer("Nguyen Van An"))
+    second = manager.add_customer(new_customer("Tran Thi Binh"))
+
+    def build_while_editing(texts):
+        # Dữ liệu thay đổi trong lúc chỉ mục đang được dựng (ngoài khóa)
+        postings = build_postings(texts)
+        manager.update_customer(first, new_customer("Le Van Cuong"))
+        manager.delete_customer(second)
+        manager.add_customer(new_customer("Pham Thi Dung"))
+        return postings
+
+    monkeypatch.setattr(customer_manager, "build_postings", build_while_editing)
+    manager.prepare_search_index("cuong")
+    assert manager.search_index.postings == build_postings(manager.search_index.texts)
+    assert [customer["name"] for customer in manager.search_customers("cuong")] == ["Le Van Cuong"]
+    assert manager.search_customers("binh") == []
+
+def test_short_keywords_do_not_build_postings(tmp_path, new_customer):
+    manager = CustomerManager(str(tmp_path / "customers.json"))
+    manager.add_customer(new_customer("Nguyen Van An"))
+    manager.prepare_search_index("an")
+    manager.prepare_search_index("age:20..40")
+    assert manager.search_index.postings is None
+    manager.prepare_search_index("name:nguyen age:20..40")
+    assert manager.search_index.postings is not None
+
+def test_normalize_text_folds_vietnamese_accents():
+    assert normalize_text("Nguyễn Thị Ánh ĐÀO") == "nguyen thi anh dao"
+    assert normalize_text("") == ""
+    assert normalize_text(None) == ""
+
+def test_search_texts_follow_updates_and_deletes(tmp_path, new_customer):
+    manager = CustomerManager(str(tmp_path / "customers.json"))
+    customer_id = manager.add_customer(new_customer("Trần Văn Đức"))
+    assert [customer["id"] for customer in manager.search_customers("tran van duc")] == [customer_id]
+    assert [customer["id"] for customer in manager.search_customers("ĐỨC")] == [customer_id]
+
+    manager.update_customer(customer_id, new_customer("Lê Thị Hoa"))
+    assert manager.search_index.texts[customer_id] == build_search_text(manager.get_customer_by_id(customer_id))
+    assert manager.search_customers("duc") == []
+    assert [customer["id"] for customer in manager.search_customers("hoa")] == [customer_id]
+
+    manager.delete_customer(customer_id)
+    assert customer_id not in manager.search_index.texts
+    assert manager.search_customers("hoa") == []
+
+def test_postings_follow_add_update_delete():
+    index = SearchIndex()
+    index.build([{"id": "KH0001", "name": "Nguyen An"}, {"id": "KH0002", "name": "Tran Binh"}])
+    assert index.search("nguyen") == ["KH0001"]
+    assert index.postings == build_postings(index.texts)
+
+    index.add({"id": "KH0003", "name": "Nguyen Cuong"})
+    index.add({"id": "KH0001", "name": "Le An"})
+    index.remove("KH0002")
+    # Cập nhật từng phần phải cho cùng kết quả với dựng lại từ đầu
+    assert index.postings == build_postings(index.texts)
+    assert index.search("nguyen") == ["KH0003"]
+    assert index.search("binh") == []
+
+def test_short_keywords_scan_without_postings():
+    index = SearchIndex()
+    index.build([{"id": "KH0001", "name": "An"}, {"id": "KH0002", "name": "Binh"}])
+    assert index.candidates("an") is None
+    assert index.search("an") == ["KH0001"]
+    assert index.search("b") == ["KH0002"]
+    assert index.postings is None
+    # Lọc lại trong danh sách ứng viên của lần tìm trước
+    assert index.search("bin", ["KH0001"]) == []
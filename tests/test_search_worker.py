@@ -0,0 +1,24 @@
+import threading
+from search_worker import SearchWorker
+
+def test_worker_runs_only_the_latest_pending_task():
+    worker = SearchWorker()
+    started = threading.Event()
+    release = threading.Event()
+    done = threading.Event()
+    ran = []
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        ran.append("first")
+
+    worker.submit(blocking)
+    assert started.wait(5)
+    # Các việc gửi tới khi luồng đang bận: chỉ việc mới nhất được chạy
+    worker.submit(lambda: ran.append("second"))
+    worker.submit(lambda: ran.append("third") or done.set())
+    release.set()
+    assert done.wait(5)
+    assert ran == ["first", "third"]
+    assert worker.thread.is_alive()
@@ -0,0 +1,35 @@
+import os
+from snapshot_cache import load_snapshot, save_snapshot, snapshot_path
+
+def write_source(path, text, mtime_ns):
+    """
+    Ghi file nguồn với mtime cho trước
+    """
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_cache_hit_for_unchanged_file(tmp_path):
+    source = tmp_path / "customers.json"
+    write_source(source, '[{"id": "KH0001"}]', 1_000_000_000)
+    assert save_snapshot(str(source), {"customers": [1]})
+    assert os.path.exists(snapshot_path(str(source)))
+    assert load_snapshot(str(source)) == {"customers": [1]}
+
+def test_cache_hit_after_mtime_change_with_same_content(tmp_path):
+    source = tmp_path / "customers.json"
+    write_source(source, '[{"id": "KH0001"}]', 1_000_000_000)
+    save_snapshot(str(source), {"customers": [1]})
+    # File được sao chép lại: mtime khác nhưng nội dung giống nên mã băm vẫn khớp
+    os.utime(source, ns=(2_000_000_000, 2_000_000_000))
+    assert load_snapshot(str(source)) == {"customers": [1]}
+
+def test_cache_ignored_when_content_changes(tmp_path):
+    source = tmp_path / "customers.json"
+    write_source(source, '[{"id": "KH0001"}]', 1_000_000_000)
+    save_snapshot(str(source), {"customers": [1]})
+    # Cùng kích thước, khác nội dung và mtime: mã băm không khớp
+    write_source(source, '[{"id": "KH0002"}]', 2_000_000_000)
+    assert load_snapshot(str(source)) is None
+    # Khác kích thước
+    write_source(source, '[]', 1_000_000_000)
+    assert load_snapshot(str(source)) is None
@@ -0,0 +1,53 @@
+import random
+import sorted_index
+from customer_query import SORT_KEYS
+from search_index import vietnamese_sort_key
+from sorted_index import SortedIndex
+
+def test_vietnamese_sort_key_order():
+    names = ["Đạt", "bình", "Ân", "Dũng", "An", "Ăn", "Bạ", "Bá", "Bã", "Bả", "Bà", "Ba", "Anh"]
+    assert sorted(names, key=vietnamese_sort_key) == [
+        "An", "Anh", "Ăn", "Ân", "Ba", "Bà", "Bả", "Bã", "Bá", "Bạ", "bình", "Dũng", "Đạt"]
+
+def random_customers(random_generator, ids):
+    """
+    Khách hàng với tuổi ngẫu nhiên (có cả tuổi không hợp lệ)
+    """
+    return {customer_id: {"id": customer_id, "age": random_generator.choice([None, 20, 30, 40, 50])}
+            for customer_id in ids}
+
+def test_update_many_bulk_matches_incremental(monkeypatch):
+    random_generator = random.Random(3)
+    customers = random_customers(random_generator, [f"KH{number:04d}" for number in range(2000)])
+    changes = random_customers(random_generator, random_generator.sample(sorted(customers), 400))
+    changes.update({customer_id: None for customer_id in random_generator.sample(sorted(customers), 200)})
+    changes.update(random_customers(random_generator, [f"KH{number:04d}" for number in range(2000, 2100)]))
+
+    bulk = SortedIndex(SORT_KEYS["age"])
+    bulk.build(customers.values())
+    assert len(changes) > sorted_index.INCREMENTAL_LIMIT
+    bulk.update_many(changes)
+
+    incremental = SortedIndex(SORT_KEYS["age"])
+    incremental.build(customers.values())
+    monkeypatch.setattr(sorted_index, "INCREMENTAL_LIMIT", len(changes))
+    incremental.update_many(changes)
+
+    # Thứ tự giữa các khách hàng cùng khóa có thể khác nhau
+    assert bulk.keys == incremental.keys == sorted(bulk.keys)
+    assert sorted(zip(bulk.keys, bulk.ids)) == sorted(zip(incremental.keys, incremental.ids))
+    assert bulk.key_of == incremental.key_of
+    assert set(bulk.unkeyed) == set(incremental.unkeyed)
+
+    # Cùng nội dung với chỉ mục dựng lại từ đầu
+    for customer_id, customer in changes.items():
+        if customer is None:
+            customers.pop(customer_id, None)
+        else:
+            customers[customer_id] = customer
+    rebuilt = SortedIndex(SORT_KEYS["age"])
+    rebuilt.build(customers.values())
+    assert bulk.keys == rebuilt.keys
+    assert set(bulk.ids) == set(rebuilt.ids)
+    assert set(bulk.unkeyed) == set(rebuilt.unkeyed)
+    assert bulk.count(30, 40) == sum(1 for customer in customers.values() if customer["age"] in (30, 40))
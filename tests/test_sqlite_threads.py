@@ -0,0 +1,52 @@
+import threading
+from sqlite_customer_manager import SQLiteCustomerManager
+
+def run_in_thread(func):
+    """
+    Chạy hàm trên một luồng khác (như luồng tìm kiếm của giao diện) và trả về kết quả
+    """
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+def test_worker_threads_do_not_see_uncommitted_batch(tmp_path, new_customer):
+    manager = SQLiteCustomerManager(str(tmp_path / "customers.db"))
+    try:
+        manager.add_customer(new_customer("Nguyen An"))
+        with manager.batch():
+            manager.add_customer(new_customer("Nguyen Binh"))
+            names = run_in_thread(lambda: [c["name"] for c in manager.search_customers("nguyen")])
+            assert names == ["Nguyen An"]
+            # Luồng giao diện vẫn thấy thay đổi của chính giao dịch đang mở
+            assert len(manager.search_customers("nguyen")) == 2
+        names = run_in_thread(lambda: [c["name"] for c in manager.search_customers("nguyen")])
+        assert names == ["Nguyen An", "Nguyen Binh"]
+    finally:
+        manager.close()
+
+def test_worker_query_cursor_survives_writes(tmp_path, new_customer):
+    manager = SQLiteCustomerManager(str(tmp_path / "customers.db"))
+    try:
+        manager.add_customers([new_customer(f"Khach {index}") for index in range(50)])
+        iterator = run_in_thread(lambda: manager.query_customers("gender:Nam"))
+        first = next(iterator)
+        # Ghi trên luồng giao diện trong khi con trỏ của luồng tìm kiếm vẫn đang mở
+        manager.add_customer(new_customer("Moi"))
+        manager.delete_customer(first["id"])
+        rest = list(iterator)
+        assert len(rest) == 49
+    finally:
+        manager.close()
+
+def test_sqlite_manager_skips_json_storage(tmp_path):
+    manager = SQLiteCustomerManager(str(tmp_path / "customers.db"))
+    try:
+        assert manager.writer is None
+        assert manager.flush()
+        assert not hasattr(manager, "journal")
+        assert not hasattr(manager, "query_planner")
+        assert not (tmp_path / "customers.db.journal").exists()
+    finally:
+        manager.close()
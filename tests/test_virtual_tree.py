@@ -0,0 +1,90 @@
+import random
+from virtual_tree import reconcile_tree, longest_increasing_subsequence
+
+class FakeTree:
+    def __init__(self):
+        """
+        Treeview giả (chỉ giữ thứ tự các item) để kiểm tra reconcile_tree không cần màn hình
+        """
+        self.children = []
+        self.values = {}
+        self.moves = 0
+
+    def get_children(self):
+        """
+        Các item đang gắn vào cây theo thứ tự
+        """
+        return tuple(self.children)
+
+    def delete(self, *keys):
+        """
+        Xóa item
+        """
+        for key in keys:
+            self.children.remove(key)
+            del self.values[key]
+
+    def detach(self, *keys):
+        """
+        Tách item khỏi cây (vẫn giữ item để gắn lại)
+        """
+        for key in keys:
+            self.children.remove(key)
+
+    def insert(self, parent, index, iid, values):
+        """
+        Thêm item mới ở vị trí index
+        """
+        assert iid not in self.values
+        self.children.insert(index, iid)
+        self.values[iid] = values
+
+    def item(self, key, values):
+        """
+        Đổi giá trị item
+        """
+        self.values[key] = values
+
+    def move(self, key, parent, index):
+        """
+        Gắn lại item đã tách vào vị trí index
+        """
+        assert key not in self.children
+        self.moves += 1
+        self.children.insert(index, key)
+
+def render(tree, rendered, rows):
+    """
+    Đồng bộ cây giả với danh sách dòng (khóa, giá trị)
+    """
+    return reconcile_tree(tree, rows, lambda row: row[0], lambda row: (row[1],), rendered)
+
+def test_longest_increasing_subsequence():
+    values = [3, 1, 4, 1, 5, 9, 2, 6]
+    positions = longest_increasing_subsequence(values)
+    assert len(positions) == 4
+    chosen = [values[position] for position in positions]
+    assert chosen == sorted(chosen) and len(set(chosen)) == len(chosen)
+    assert longest_increasing_subsequence([]) == []
+
+def test_reconcile_moves_only_items_outside_the_subsequence():
+    tree = FakeTree()
+    rendered = {}
+    render(tree, rendered, [(str(number), number) for number in range(100)])
+    # Đưa một item từ cuối lên đầu: chỉ item đó bị di chuyển
+    rows = [("99", 99)] + [(str(number), number) for number in range(99)]
+    render(tree, rendered, rows)
+    assert tree.children == [row[0] for row in rows]
+    assert tree.moves == 1
+
+def test_reconcile_matches_random_orders():
+    random_generator = random.Random(7)
+    tree = FakeTree()
+    rendered = {}
+    for _ in range(30):
+        keys = random_generator.sample(range(60), random_generator.randint(0, 40))
+        rows = [(str(key), random_generator.randint(0, 3)) for key in keys]
+        assert render(tree, rendered, rows) == [row[0] for row in rows]
+        assert tree.children == [row[0] for row in rows]
+        assert tree.values == {row[0]: (row[1],) for row in rows}
+        assert rendered == tree.values
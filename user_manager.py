@@ -3,6 +3,10 @@ import os
 import hashlib
 from datetime import datetime
 import random
+import threading
+from safe_writer import GroupCommitWriter, atomic_write_json, commit_delay
+from snapshot_cache import load_snapshot, save_snapshot
+from avatar_store import avatar_files, remove_unused_avatars
 
 class UserManager:
     def __init__(self, data_file="users.json"):
@@ -12,18 +16,31 @@ class UserManager:
         self.data_file = data_file
         self.users = []
         self.current_user = None
+        # Bản chụp danh sách người dùng đang chờ luồng ghi lưu xuống file
+        self.pending_lock = threading.Lock()
+        self.pending_users = None
+        self.writer = GroupCommitWriter(self.commit_pending_users,
+                                        delay=commit_delay(), name=f"writer:{data_file}")
         self.load_data()
     
     def load_data(self):
         """
         Đọc dữ liệu người dùng từ file JSON
         """
+        # Ghi nốt các thay đổi đang chờ trước khi đọc lại
+        self.writer.flush()
+        users = load_snapshot(self.data_file)
+        if users is not None:
+            self.users = users
+            print(f"Số lượng người dùng: {len(self.users)}")
+            return
         try:
             if os.path.exists(self.data_file):
                 with open(self.data_file, 'r', encoding='utf-8') as file:
                     content = file.read().strip()
                     if content:  # Kiểm tra nếu file không trống
                         self.users = json.loads(content)
+                        save_snapshot(self.data_file, self.users)
                     else:
                         self.users = []
                         # Tạo tài khoản admin mặc định
@@ -33,8 +50,7 @@ class UserManager:
                 self.users = []
                 print(f"File {self.data_file} không tồn tại. Tạo danh sách người dùng mới.")
                 # Tạo file trống nếu chưa tồn tại
-                with open(self.data_file, 'w', encoding='utf-8') as file:
-                    json.dump([], file, ensure_ascii=False, indent=4)
+                atomic_write_json(self.data_file, [])
                 # Tạo tài khoản admin mặc định
                 self.create_default_admin()
         except Exception as e:
@@ -63,19 +79,38 @@ class UserManager:
     def save_data(self):
         """
         Lưu dữ liệu người dùng ra file JSON
+        Bản chụp danh sách được đưa vào hàng chờ, các lần lưu liên tiếp được gộp thành một lần ghi
         """
+        with self.pending_lock:
+            self.pending_users = list(self.users)
+        return self.writer.request()
+    
+    def flush(self):
+        """
+        Ghi ngay dữ liệu đang chờ xuống đĩa (dùng khi thoát chương trình)
+        """
+        return self.writer.flush()
+    
+    def commit_pending_users(self):
+        """
+        Ghi bản chụp danh sách người dùng đang chờ (chạy trên luồng ghi)
+        File được ghi an toàn qua file tạm + đổi tên
+        """
+        with self.pending_lock:
+            users, self.pending_users = self.pending_users, None
+        if users is None:
+            return True
         try:
-            # Đảm bảo thư mục chứa file tồn tại
-            file_dir = os.path.dirname(os.path.abspath(self.data_file))
-            if not os.path.exists(file_dir):
-                os.makedirs(file_dir)
-                
-            with open(self.data_file, 'w', encoding='utf-8') as file:
-                json.dump(self.users, file, ensure_ascii=False, indent=4)
-            print(f"Đã lưu dữ liệu người dùng vào {self.data_file}, số lượng người dùng: {len(self.users)}")
+            atomic_write_json(self.data_file, users)
+            save_snapshot(self.data_file, users)
+            print(f"Đã lưu dữ liệu người dùng vào {self.data_file}, số lượng người dùng: {len(users)}")
             return True
         except Exception as e:
             print(f"Lỗi khi lưu dữ liệu người dùng: {e}")
+            # Giữ lại bản chụp để lần ghi sau thử lại nếu chưa có bản mới hơn
+            with self.pending_lock:
+                if self.pending_users is None:
+                    self.pending_users = users
             return False
     
     def hash_password(self, password):
@@ -146,9 +181,7 @@ class UserManager:
         """
         for user in self.users:
             if user.get("id") == user_id:
-                # Kiểm tra đường dẫn ảnh đại diện
-                if 'picture' in user and user['picture'] and not os.path.exists(user['picture']):
-                    print(f"Cảnh báo: Không tìm thấy ảnh đại diện tại {user['picture']}")
+                # Không kiểm tra file ảnh đại diện ở đây: giao diện tự xử lý khi không mở được ảnh
                 return user
         return None
     
@@ -166,11 +199,21 @@ class UserManager:
                     return False, "Không thể xóa tài khoản admin cuối cùng!"
                 
                 del self.users[i]
-                self.save_data()
+                if self.save_data():
+                    self.remove_replaced_avatars(user, {})
                 return True, "Xóa người dùng thành công!"
         
         return False, "Không tìm thấy người dùng!"
     
+    def remove_replaced_avatars(self, old_user, new_user):
+        """
+        Xóa các file ảnh đại diện cũ của người dùng không còn ai tham chiếu
+        Chỉ xóa sau khi danh sách người dùng mới đã được ghi xuống đĩa
+        """
+        paths = avatar_files(old_user) - avatar_files(new_user)
+        if paths and self.writer.flush():
+            remove_unused_avatars(paths, self.users)
+    
     def count_admins(self):
         """
         Đếm số lượng tài khoản admin
@@ -232,6 +275,11 @@ class UserManager:
                 # Cập nhật ảnh đại diện nếu có
                 if "picture" in updated_data:
                     updated_user["picture"] = updated_data["picture"]
+                    # Bản thu nhỏ tạo sẵn của ảnh mới (bỏ bản thu nhỏ của ảnh cũ nếu không có)
+                    if updated_data.get("picture_thumbnails"):
+                        updated_user["picture_thumbnails"] = updated_data["picture_thumbnails"]
+                    else:
+                        updated_user.pop("picture_thumbnails", None)
                 
                 # Lưu vào danh sách người dùng
                 self.users[i] = updated_user
@@ -242,6 +290,7 @@ class UserManager:
                 
                 # Lưu vào file
                 if self.save_data():
+                    self.remove_replaced_avatars(user, updated_user)
                     return True, "Cập nhật thông tin thành công!"
                 else:
                     return False, "Lỗi khi lưu dữ liệu!"
@@ -0,0 +1,326 @@
+import bisect
+import tkinter as tk
+from tkinter import ttk
+
+def longest_increasing_subsequence(values):
+    """
+    Vị trí (trong values) của một dãy con tăng dài nhất, tìm bằng bisect trong O(n log n)
+    """
+    tails = []
+    tail_positions = []
+    previous = [-1] * len(values)
+    for position, value in enumerate(values):
+        index = bisect.bisect_left(tails, value)
+        if index == len(tails):
+            tails.append(value)
+            tail_positions.append(position)
+        else:
+            tails[index] = value
+            tail_positions[index] = position
+        previous[position] = tail_positions[index - 1] if index else -1
+    result = []
+    position = tail_positions[-1] if tail_positions else -1
+    while position != -1:
+        result.append(position)
+        position = previous[position]
+    result.reverse()
+    return result
+
+def reconcile_tree(tree, rows, key_func, values_func, rendered_values):
+    """
+    Đồng bộ các item của Treeview với danh sách rows bằng số thao tác ít nhất
+    Item được định danh bằng khóa (iid = key_func(row)); chỉ xóa item không còn,
+    thêm item mới, cập nhật item đổi giá trị và di chuyển item sai vị trí
+    Các item nằm trong dãy con tăng dài nhất (theo vị trí cũ) giữ nguyên chỗ,
+    chỉ các item còn lại được di chuyển
+    rendered_values là dict khóa -> giá trị đã hiển thị, được cập nhật tại chỗ
+    Trả về danh sách khóa theo thứ tự mới
+    """
+    keys = [key_func(row) for row in rows]
+    new_keys = set(keys)
+
+    # Xóa các item không còn trong danh sách mới
+    current = list(tree.get_children())
+    removed = [key for key in current if key not in new_keys]
+    if removed:
+        tree.delete(*removed)
+        for key in removed:
+            rendered_values.pop(key, None)
+        current = [key for key in current if key in new_keys]
+
+    # Các item đã có và thứ tự tương đối của chúng vẫn đúng thì không cần di chuyển,
+    # các item còn lại được tách ra trước rồi đặt lại vào đúng vị trí
+    old_positions = {key: position for position, key in enumerate(current)}
+    kept = [key for key in keys if key in old_positions]
+    stable = {kept[position] for position in
+              longest_increasing_subsequence([old_positions[key] for key in kept])}
+    moved = [key for key in kept if key not in stable]
+    if moved:
+        tree.detach(*moved)
+
+    # Sau mỗi bước, các item đầu tiên của Treeview là keys[:index + 1] theo đúng thứ tự
+    for index, (key, row) in enumerate(zip(keys, rows)):
+        values = tuple(values_func(row))
+        if key not in old_positions:
+            # Item mới
+            tree.insert("", index, iid=key, values=values)
+            rendered_values[key] = values
+            continue
+
+        if rendered_values.get(key) != values:
+            tree.item(key, values=values)
+            rendered_values[key] = values
+
+        if key not in stable:
+            tree.move(key, "", index)
+    return keys
+
+class VirtualTreeview:
+    def __init__(self, parent, columns, key_func, values_func, virtual=True, overscan=2, **tree_options):
+        """
+        Treeview ảo: chỉ tạo item cho các dòng đang hiển thị (cộng thêm vài dòng dự phòng)
+        Toàn bộ dữ liệu nằm trong mảng rows, thanh cuộn ánh xạ tới vị trí trong mảng
+        key_func(row) trả về khóa duy nhất (dùng làm iid), values_func(row) trả về giá trị các cột
+        Nếu virtual=False thì mọi dòng đều được tạo item như Treeview thông thường
+        """
+        self.key_func = key_func
+        self.values_func = values_func
+        self.virtual = virtual
+        self.overscan = overscan
+
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", **tree_options)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL)
+
+        self.rows = []
+        self.positions = {}
+        self.offset = 0
+        self.row_height = 20
+        self.header_height = 25
+        self.selected_keys = set()
+        # Dòng mốc khi mở rộng vùng chọn bằng Shift (dòng được chọn gần nhất không kèm Shift)
+        self.anchor_key = None
+        # Giá trị đã hiển thị của từng item, dùng để chỉ cập nhật dòng thay đổi
+        self.rendered_values = {}
+
+        if self.virtual:
+            self.scrollbar.configure(command=self.on_scrollbar)
+            self.tree.bind("<Configure>", lambda event: self.render())
+            self.tree.bind("<MouseWheel>", self.on_mousewheel)
+            self.tree.bind("<Button-4>", lambda event: self.scroll_units(-3))
+            self.tree.bind("<Button-5>", lambda event: self.scroll_units(3))
+            self.tree.bind("<Up>", lambda event: self.move_focus(-1))
+            self.tree.bind("<Down>", lambda event: self.move_focus(1))
+            self.tree.bind("<Prior>", lambda event: self.move_focus(-self.page_size()))
+            self.tree.bind("<Next>", lambda event: self.move_focus(self.page_size()))
+            self.tree.bind("<Home>", lambda event: self.move_focus(-len(self.rows)))
+            self.tree.bind("<End>", lambda event: self.move_focus(len(self.rows)))
+            self.tree.bind("<Shift-Up>", lambda event: self.extend_focus(-1))
+            self.tree.bind("<Shift-Down>", lambda event: self.extend_focus(1))
+            self.tree.bind("<Shift-Prior>", lambda event: self.extend_focus(-self.page_size()))
+            self.tree.bind("<Shift-Next>", lambda event: self.extend_focus(self.page_size()))
+            self.tree.bind("<Shift-Home>", lambda event: self.extend_focus(-len(self.rows)))
+            self.tree.bind("<Shift-End>", lambda event: self.extend_focus(len(self.rows)))
+            self.tree.bind("<ButtonPress-1>", self.on_click, add="+")
+        else:
+            self.scrollbar.configure(command=self.tree.yview)
+            self.tree.configure(yscrollcommand=self.scrollbar.set)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+
+    def set_rows(self, rows):
+        """
+        Thay toàn bộ dữ liệu hiển thị, giữ lại các dòng đang chọn nếu vẫn còn
+        """
+        self.rows = list(rows)
+        self.positions = {self.key_func(row): index for index, row in enumerate(self.rows)}
+        self.selected_keys = {key for key in self.selected_keys if key in self.positions}
+        self.offset = self.clamp_offset(self.offset)
+        self.render()
+
+    def page_size(self):
+        """
+        Số dòng nhìn thấy được trong vùng hiển thị của Treeview
+        """
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # Widget chưa được vẽ, dùng chiều cao khai báo
+            return int(self.tree.cget("height"))
+        return max(1, (height - self.header_height) // self.row_height)
+
+    def clamp_offset(self, offset):
+        """
+        Giới hạn vị trí bắt đầu trong khoảng hợp lệ
+        """
+        return max(0, min(offset, len(self.rows) - self.page_size()))
+
+    def visible_rows(self):
+        """
+        Lấy các dòng cần tạo item: cửa sổ đang nhìn thấy cộng phần dự phòng
+        """
+        if not self.virtual:
+            return self.rows
+        return self.rows[self.offset:self.offset + self.page_size() + self.overscan]
+
+    def render(self):
+        """
+        Đồng bộ các item của Treeview với cửa sổ hiện tại
+        """
+        keys = reconcile_tree(self.tree, self.visible_rows(), self.key_func, self.values_func,
+                              self.rendered_values)
+        selected = [key for key in keys if key in self.selected_keys]
+        if set(selected) != set(self.tree.selection()):
+            self.tree.selection_set(selected)
+
+        if self.virtual:
+            self.tree.yview_moveto(0)
+            self.measure_rows(keys)
+            self.update_scrollbar()
+
+    def measure_rows(self, keys):
+        """
+        Đo chiều cao dòng và tiêu đề thực tế từ item đầu tiên
+        """
+        if not keys:
+            return
+        bbox = self.tree.bbox(keys[0])
+        if bbox:
+            self.header_height = bbox[1]
+            self.row_height = max(1, bbox[3])
+
+    def update_scrollbar(self):
+        """
+        Cập nhật thanh cuộn theo vị trí cửa sổ trong toàn bộ dữ liệu
+        """
+        total = len(self.rows)
+        if total == 0:
+            self.scrollbar.set(0, 1)
+            return
+        first = self.offset / total
+        last = min(1.0, (self.offset + self.page_size()) / total)
+        self.scrollbar.set(first, last)
+
+    def scroll_to(self, offset):
+        """
+        Cuộn tới vị trí cho trước trong mảng dữ liệu
+        """
+        offset = self.clamp_offset(offset)
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll_units(self, count):
+        """
+        Cuộn lên/xuống một số dòng
+        """
+        self.scroll_to(self.offset + count)
+        return "break"
+
+    def on_scrollbar(self, action, amount, unit=None):
+        """
+        Xử lý lệnh từ thanh cuộn (kéo thanh cuộn hoặc bấm mũi tên)
+        """
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        elif action == "scroll":
+            step = self.page_size() if unit == "pages" else 1
+            self.scroll_to(self.offset + int(amount) * step)
+
+    def on_mousewheel(self, event):
+        """
+        Cuộn bằng con lăn chuột (Windows/macOS)
+        """
+        return self.scroll_units(-3 if event.delta > 0 else 3)
+
+    def see(self, key):
+        """
+        Cuộn để dòng có khóa cho trước nằm trong vùng nhìn thấy
+        """
+        index = self.positions.get(key)
+        if index is None:
+            return
+        if index < self.offset:
+            self.scroll_to(index)
+        elif index >= self.offset + self.page_size():
+            self.scroll_to(index - self.page_size() + 1)
+
+    def focus_target(self, step):
+        """
+        Khóa của dòng cách dòng đang focus step dòng (giới hạn trong danh sách)
+        """
+        index = self.positions.get(self.tree.focus(), self.offset)
+        index = max(0, min(len(self.rows) - 1, index + step))
+        return self.key_func(self.rows[index])
+
+    def move_focus(self, step):
+        """
+        Di chuyển dòng được chọn bằng bàn phím, tự cuộn khi ra ngoài cửa sổ
+        """
+        if not self.rows:
+            return "break"
+        key = self.focus_target(step)
+        self.see(key)
+        self.selection_set([key])
+        self.tree.focus(key)
+        self.anchor_key = key
+        return "break"
+
+    def extend_focus(self, step):
+        """
+        Shift + phím di chuyển: chọn liên tục từ dòng mốc tới dòng mới (kể cả các dòng
+        nằm ngoài cửa sổ), tự cuộn khi ra ngoài cửa sổ
+        """
+        if str(self.tree.cget("selectmode")) != "extended":
+            return self.move_focus(step)
+        if not self.rows:
+            return "break"
+        if self.anchor_key not in self.positions:
+            self.anchor_key = self.tree.focus() if self.tree.focus() in self.positions else None
+        key = self.focus_target(step)
+        if self.anchor_key is None:
+            self.anchor_key = key
+        first, last = sorted((self.positions[self.anchor_key], self.positions[key]))
+        self.see(key)
+        self.selection_set([self.key_func(row) for row in self.rows[first:last + 1]])
+        self.tree.focus(key)
+        return "break"
+
+    def on_click(self, event):
+        """
+        Click không kèm Shift/Ctrl sẽ bỏ chọn cả các dòng đã cuộn ra khỏi cửa sổ,
+        click không kèm Shift đặt lại dòng mốc cho việc chọn bằng Shift + phím di chuyển
+        """
+        if not event.state & 0x0005:
+            self.selected_keys = set()
+        if not event.state & 0x0001:
+            self.anchor_key = self.tree.identify_row(event.y) or self.anchor_key
+
+    def on_select(self, event=None):
+        """
+        Ghi nhận các dòng được chọn, kể cả các dòng đã cuộn ra khỏi cửa sổ
+        """
+        visible_keys = set(self.tree.get_children())
+        selected = set(self.tree.selection())
+        if str(self.tree.cget("selectmode")) == "browse":
+            if selected or not (self.selected_keys - visible_keys):
+                self.selected_keys = selected
+        else:
+            self.selected_keys = (self.selected_keys - visible_keys) | selected
+
+    def selection(self):
+        """
+        Lấy danh sách khóa của các dòng đang chọn theo thứ tự hiển thị
+        """
+        return sorted(self.selected_keys, key=lambda key: self.positions.get(key, 0))
+
+    def select_all(self):
+        """
+        Chọn toàn bộ các dòng, kể cả các dòng chưa được tạo item
+        """
+        self.selection_set(list(self.positions))
+        return "break"
+
+    def selection_set(self, keys):
+        """
+        Chọn các dòng theo khóa
+        """
+        self.selected_keys = {key for key in keys if key in self.positions}
+        self.tree.selection_set([key for key in self.tree.get_children() if key in self.selected_keys])